@@ -2,7 +2,8 @@ from ninja import NinjaAPI
 from ninja.pagination import RouterPaginated
 
 from movie_database.api import router as movie_db_router
+from movie_database.api.renderers import FastJSONRenderer
 
-api = NinjaAPI(default_router=RouterPaginated())
+api = NinjaAPI(default_router=RouterPaginated(), renderer=FastJSONRenderer())
 
 api.add_router("/movie_database/", movie_db_router)
@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "django_structlog",
 ]
 
@@ -73,6 +74,25 @@ TEMPLATES = [
 
 ASGI_APPLICATION = "core.asgi.application"
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Per process by default. With several workers, set a backend shared between them with an atomic incr, e.g.
+# CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and CACHE_LOCATION=redis://redis:6379
+
+CACHE_BACKEND = getenv("CACHE_BACKEND") or "django.core.cache.backends.locmem.LocMemCache"
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": getenv("CACHE_LOCATION", ""),
+    },
+}
+
+# API responses are only cached in a cache shared by every worker, so a write through one worker invalidates the
+# responses cached by the others. Set RESPONSE_CACHE=true to cache in a per-process one anyway, e.g. with one worker
+PROCESS_LOCAL_CACHES = ("django.core.cache.backends.locmem.LocMemCache", "django.core.cache.backends.dummy.DummyCache")
+RESPONSE_CACHE = (getenv("RESPONSE_CACHE") or str(CACHE_BACKEND not in PROCESS_LOCAL_CACHES)).lower() == "true"
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -14,6 +14,15 @@ DATABASES: dict[str, dict[str, str | Path]] = {
     },
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+
+# The tests run in one process
+RESPONSE_CACHE = True
+
 SECRET_KEY = uuid.uuid4()
 
 LOGGING = {
@@ -0,0 +1,33 @@
+"""Fetching many objects by id in one query, for `?ids=` on list endpoints."""
+
+from collections.abc import Iterable
+from typing import Any
+
+from django.db.models import F, QuerySet
+from django.db.models.query import ModelIterable
+
+
+class Batch(list):
+    """Objects fetched by id, in the order the ids were asked for, along with the ids that weren't found.
+
+    Returned by list views in place of a queryset. `KeysetPagination` pages through it as it is, and reports `missing_ids`.
+    """
+
+    def __init__(self, items: Iterable[Any], missing_ids: list[int]) -> None:
+        """Initialise with the objects found, in order, and the ids that weren't."""
+        super().__init__(items)
+        self.missing_ids = missing_ids
+
+
+async def fetch_by_ids(queryset: QuerySet, ids: Iterable[int]) -> Batch:
+    """Fetch the objects with the given ids with a single `IN` query, in the order given, skipping repeated ids.
+
+    Model querysets use `ain_bulk`. That can't take `.values()` querysets, so their rows are keyed by an annotated id
+    instead, which works even if `id` itself isn't among the selected fields.
+    """
+    ids = list(dict.fromkeys(ids))
+    if issubclass(queryset._iterable_class, ModelIterable):  # noqa: SLF001
+        found = await queryset.ain_bulk(ids)
+    else:
+        found = {row["batch_id"]: row async for row in queryset.filter(id__in=ids).annotate(batch_id=F("id"))}
+    return Batch((found[i] for i in ids if i in found), missing_ids=[i for i in ids if i not in found])
@@ -1,39 +1,106 @@
-from django.http import HttpRequest
+from typing import Annotated, Any
+
+from asgiref.sync import sync_to_async
+from django.db.models import QuerySet
+from django.http import Http404, HttpRequest
 from django.shortcuts import aget_object_or_404
-from ninja.pagination import RouterPaginated
+from ninja import Query
+from ninja.decorators import decorate_view
+from ninja.pagination import RouterPaginated, paginate
 
 import movie_database.schema as schemas
+from movie_database.api.batch import Batch, fetch_by_ids
+from movie_database.api.pagination import KeysetPagination
 from movie_database.api.responses import DefaultDeleteSuccessResponse, DefaultPostSuccessResponse
-from movie_database.models import Bookcase
+from movie_database.api.rows import schema_rows
+from movie_database.idempotency import idempotent
+from movie_database.models import Bookcase, Collection, MediaCaseDimension, Movie, PhysicalMedia, Shelf, ShelfDimension
+from movie_database.positioning import compact_positions
+from movie_database.response_cache import cache_response
 
 router = RouterPaginated(tags=["Bookcase"])
 
 
 @router.post("/")
+@decorate_view(idempotent)
 async def create_bookcase(request: HttpRequest, payload: schemas.BookcaseIn) -> DefaultPostSuccessResponse:  # noqa: ARG001, D103
     bookcase = await Bookcase.objects.acreate(**payload.dict())
     return {"id": bookcase.id}
 
 
-@router.get("/", response=list[schemas.BookcaseOut])
-async def list_bookcases(request: HttpRequest) -> list[schemas.BookcaseOut]:  # noqa: ARG001, D103
-    bookcase = Bookcase.objects.all()
-    return [schemas.BookcaseOut.from_orm(m) async for m in bookcase]
+@router.get("/", response=list[schemas.SparseBookcaseOut], exclude_unset=True)
+@decorate_view(cache_response(Bookcase))
+@paginate(KeysetPagination, ordering=("id",))
+async def list_bookcases(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    fieldset: Annotated[schemas.BookcaseFieldset, Query(...)],
+    batch: Annotated[schemas.BatchIds, Query(...)],
+) -> QuerySet[Bookcase, dict[str, Any]] | Batch:
+    rows = schema_rows(Bookcase.objects.all(), schemas.BookcaseOut, fieldset.fields)
+    return await fetch_by_ids(rows, batch.ids) if batch.ids else rows
+
+
+@router.get("/occupancy", response=list[schemas.ShelfOccupancyOut], tags=["Bookcase", "Shelf"])
+@decorate_view(cache_response(Shelf, ShelfDimension, PhysicalMedia, MediaCaseDimension))
+async def list_bookcases_occupancy(request: HttpRequest) -> list[schemas.ShelfOccupancyOut]:  # noqa: ARG001, D103
+    shelves = Shelf.objects.with_occupancy().order_by("bookcase_id", "position_from_top")
+    return [schemas.ShelfOccupancyOut.from_orm(shelf) async for shelf in shelves]
+
 
+@router.get("/{bookcase_id}", response=schemas.SparseBookcaseOut, exclude_unset=True)
+@decorate_view(cache_response(Bookcase))
+async def get_bookcase(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    bookcase_id: int,
+    fieldset: Annotated[schemas.BookcaseFieldset, Query(...)],
+) -> dict[str, Any]:
+    return await aget_object_or_404(schema_rows(Bookcase.objects.all(), schemas.BookcaseOut, fieldset.fields), id=bookcase_id)
 
-@router.get("/{bookcase_id}", response=schemas.BookcaseOut)
-async def get_bookcase(request: HttpRequest, bookcase_id: int) -> Bookcase:  # noqa: ARG001, D103
-    return await aget_object_or_404(Bookcase, id=bookcase_id)
+
+@router.get("/{bookcase_id}/tree", response=schemas.BookcaseTreeOut, tags=["Bookcase", "Shelf", "Physical Media", "Movie"])
+@decorate_view(cache_response(Bookcase, Shelf, ShelfDimension, PhysicalMedia, MediaCaseDimension, Collection, Movie))
+async def get_bookcase_tree(request: HttpRequest, bookcase_id: int) -> Bookcase:  # noqa: ARG001, D103
+    return await aget_object_or_404(Bookcase.objects.with_tree(), id=bookcase_id)
 
 
 @router.get("/{bookcase_id}/shelves", response=list[schemas.ShelfOut], tags=["Bookcase", "Shelf"])
+@decorate_view(cache_response(Bookcase, Shelf))
 async def get_bookcase_shelves(request: HttpRequest, bookcase_id: int) -> list[schemas.ShelfOut]:  # noqa: ARG001, D103
     bookcase = await aget_object_or_404(Bookcase, id=bookcase_id)
     return [schemas.ShelfOut.from_orm(shelf) async for shelf in bookcase.shelves.all()]
 
 
+@router.get("/{bookcase_id}/occupancy", response=list[schemas.ShelfOccupancyOut], tags=["Bookcase", "Shelf"])
+@decorate_view(cache_response(Bookcase, Shelf, ShelfDimension, PhysicalMedia, MediaCaseDimension))
+async def get_bookcase_occupancy(request: HttpRequest, bookcase_id: int) -> list[schemas.ShelfOccupancyOut]:  # noqa: ARG001, D103
+    bookcase = await aget_object_or_404(Bookcase, id=bookcase_id)
+    shelves = Shelf.objects.with_occupancy().filter(bookcase=bookcase).order_by("position_from_top")
+    return [schemas.ShelfOccupancyOut.from_orm(shelf) async for shelf in shelves]
+
+
+@router.get("/{bookcase_id}/capacity", response=list[schemas.MediaCaseCapacityOut], tags=["Bookcase", "Shelf", "Dimension"])
+@decorate_view(cache_response(Bookcase, Shelf, ShelfDimension, MediaCaseDimension))
+async def get_bookcase_capacity(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    bookcase_id: int,
+    filters: Annotated[schemas.MediaCaseCapacityFilter, Query(...)],
+) -> list[schemas.MediaCaseCapacityOut]:
+    bookcase = await aget_object_or_404(Bookcase, id=bookcase_id)
+    dimensions = filters.filter(MediaCaseDimension.objects.with_spare_capacity(Shelf.objects.filter(bookcase=bookcase))).order_by("id")
+    return [schemas.MediaCaseCapacityOut.from_orm(d) async for d in dimensions]
+
+
+@router.post("/{bookcase_id}/compact", response=schemas.CompactPositionsOut, tags=["Bookcase", "Physical Media"])
+@decorate_view(idempotent)
+async def compact_bookcase(request: HttpRequest, bookcase_id: int) -> schemas.CompactPositionsOut:  # noqa: ARG001
+    """Renumber the physical media on every shelf of a bookcase 1, 2, 3... in their current order."""
+    bookcase = await aget_object_or_404(Bookcase, id=bookcase_id)
+    renumbered = await sync_to_async(compact_positions)(Shelf.objects.filter(bookcase=bookcase))
+    return schemas.CompactPositionsOut(renumbered=renumbered)
+
+
 @router.delete("/{bookcase_id}")
 async def delete_bookcase(request: HttpRequest, bookcase_id: int) -> DefaultDeleteSuccessResponse:  # noqa: ARG001, D103
-    bookcase = await aget_object_or_404(Bookcase, id=bookcase_id)
-    await bookcase.adelete()
+    if not await Bookcase.objects.filter(id=bookcase_id).adelete_returning():
+        raise Http404
     return {"success": True}
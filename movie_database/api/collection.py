@@ -1,38 +1,62 @@
-from django.http import HttpRequest
+from typing import Annotated, Any
+
+from django.db.models import QuerySet
+from django.http import Http404, HttpRequest
 from django.shortcuts import aget_object_or_404
-from ninja.pagination import RouterPaginated
+from ninja import Query
+from ninja.decorators import decorate_view
+from ninja.pagination import RouterPaginated, paginate
 
 import movie_database.schema as schemas
+from movie_database.api.batch import Batch, fetch_by_ids
+from movie_database.api.pagination import KeysetPagination
 from movie_database.api.responses import DefaultDeleteSuccessResponse, DefaultPostSuccessResponse
-from movie_database.models import Collection, PhysicalMedia
+from movie_database.api.rows import schema_rows
+from movie_database.idempotency import idempotent
+from movie_database.models import Collection, MediaCaseDimension, Movie, PhysicalMedia, Shelf
+from movie_database.response_cache import cache_response
 
 router = RouterPaginated(tags=["Collection"])
 
 
 @router.post("/")
+@decorate_view(idempotent)
 async def create_collection(request: HttpRequest, payload: schemas.CollectionIn) -> DefaultPostSuccessResponse:  # noqa: ARG001, D103
     collection = await Collection.objects.acreate(**payload.dict())
     return {"id": collection.id}
 
 
-@router.get("/", response=list[schemas.CollectionOut])
-async def list_collections(request: HttpRequest) -> list[schemas.CollectionOut]:  # noqa: ARG001, D103
-    collection = Collection.objects.all()
-    return [schemas.CollectionOut.from_orm(m) async for m in collection]
+@router.get("/", response=list[schemas.SparseCollectionOut], exclude_unset=True)
+@decorate_view(cache_response(Collection))
+@paginate(KeysetPagination, ordering=("id",))
+async def list_collections(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    fieldset: Annotated[schemas.CollectionFieldset, Query(...)],
+    batch: Annotated[schemas.BatchIds, Query(...)],
+) -> QuerySet[Collection, dict[str, Any]] | Batch:
+    rows = schema_rows(Collection.objects.all(), schemas.CollectionOut, fieldset.fields)
+    return await fetch_by_ids(rows, batch.ids) if batch.ids else rows
 
 
-@router.get("/{collection_id}", response=schemas.CollectionOut)
-async def get_collection(request: HttpRequest, collection_id: int) -> Collection:  # noqa: ARG001, D103
-    return await aget_object_or_404(Collection, id=collection_id)
+@router.get("/{collection_id}", response=schemas.SparseCollectionOut, exclude_unset=True)
+@decorate_view(cache_response(Collection))
+async def get_collection(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    collection_id: int,
+    fieldset: Annotated[schemas.CollectionFieldset, Query(...)],
+) -> dict[str, Any]:
+    return await aget_object_or_404(schema_rows(Collection.objects.all(), schemas.CollectionOut, fieldset.fields), id=collection_id)
 
 
 @router.get("/{collection_id}/media", response=list[schemas.PhysicalMediaOut], tags=["Collection", "Physical Media"])
+@decorate_view(cache_response(PhysicalMedia, Movie, MediaCaseDimension, Shelf, Collection))
 async def get_collection_media_list(request: HttpRequest, collection_id: int) -> list[schemas.PhysicalMediaOut]:  # noqa: ARG001, D103
     collection = await aget_object_or_404(Collection, id=collection_id)
     return [schemas.PhysicalMediaOut.from_orm(shelf) async for shelf in collection.physical_media_set.all()]
 
 
 @router.get("/{collection_id}/media/{media_id}", response=schemas.PhysicalMediaOut, tags=["Collection", "Physical Media"])
+@decorate_view(cache_response(PhysicalMedia, Movie, MediaCaseDimension, Shelf, Collection))
 async def get_collection_media(request: HttpRequest, collection_id: int, media_id: int) -> PhysicalMedia:  # noqa: ARG001, D103
     collection: Collection = await aget_object_or_404(Collection, id=collection_id)
     return await collection.physical_media_set.aget(id=media_id)
@@ -40,6 +64,6 @@ async def get_collection_media(request: HttpRequest, collection_id: int, media_i
 
 @router.delete("/{collection_id}")
 async def delete_collection(request: HttpRequest, collection_id: int) -> DefaultDeleteSuccessResponse:  # noqa: ARG001, D103
-    collection = await aget_object_or_404(Collection, id=collection_id)
-    await collection.adelete()
+    if not await Collection.objects.filter(id=collection_id).adelete_returning():
+        raise Http404
     return {"success": True}
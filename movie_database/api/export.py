@@ -0,0 +1,61 @@
+"""Streaming exports of whole tables, written out row by row so memory use doesn't grow with the number of rows."""
+
+import csv
+from collections.abc import AsyncIterator
+from typing import Literal
+
+from django.db.models import Model, QuerySet
+from django.http import StreamingHttpResponse
+from ninja import Schema
+
+from movie_database.api.rows import row_adapter, schema_rows
+
+type ExportFormat = Literal["ndjson", "csv"]
+
+CONTENT_TYPES: dict[ExportFormat, str] = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+# Rows fetched per round trip. On PostgreSQL they come from a server-side cursor, so only one chunk is held at a time
+CHUNK_SIZE = 2000
+
+
+class _Line:
+    """File-like object for `csv.writer`, handing back each formatted row rather than buffering it."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+async def _lines(queryset: QuerySet, schema: type[Schema], export_format: ExportFormat) -> AsyncIterator[str]:
+    adapter = row_adapter(schema)
+    writer = csv.DictWriter(_Line(), fieldnames=list(schema.model_fields))
+    if export_format == "csv":
+        yield writer.writeheader()
+
+    async for row in schema_rows(queryset, schema).aiterator(chunk_size=CHUNK_SIZE):
+        obj = adapter.validate_python(row)
+        yield writer.writerow(adapter.dump_python(obj, mode="json")) if export_format == "csv" else adapter.dump_json(obj).decode() + "\n"
+
+
+def stream_export[M: Model](
+    queryset: QuerySet[M],
+    schema: type[Schema],
+    export_format: ExportFormat,
+    filename: str,
+) -> StreamingHttpResponse:
+    """Stream every object in the queryset as NDJSON or CSV, serialised by the schema, starting as soon as the first rows arrive.
+
+    Args:
+        queryset: The objects to export, in the order to export them.
+        schema: The schema to serialise each object with, from its `.values()` row. Its fields are the CSV columns.
+        export_format: Either `ndjson` for one JSON object per line, or `csv` for a header and one row per object.
+        filename: The name to download the export as, without an extension.
+
+    Returns:
+        StreamingHttpResponse: The export, as an attachment.
+
+    """
+    return StreamingHttpResponse(
+        _lines(queryset, schema, export_format),
+        content_type=CONTENT_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'},
+    )
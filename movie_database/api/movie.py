@@ -1,36 +1,99 @@
-from typing import Annotated
+from typing import Annotated, Any
 
-from django.http import HttpRequest
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from django.db.models import QuerySet
+from django.http import HttpRequest, StreamingHttpResponse
 from django.shortcuts import aget_object_or_404
 from ninja import Query
-from ninja.pagination import RouterPaginated
+from ninja.decorators import decorate_view
+from ninja.errors import HttpError
+from ninja.pagination import RouterPaginated, paginate
 
 import movie_database.schema as schemas
-from movie_database.api.responses import DefaultPostSuccessResponse
-from movie_database.models import Movie
+from movie_database.api.batch import Batch, fetch_by_ids
+from movie_database.api.export import stream_export
+from movie_database.api.pagination import KeysetPagination
+from movie_database.api.responses import BulkPostSuccessResponse, DefaultPostSuccessResponse
+from movie_database.api.rows import schema_rows
+from movie_database.idempotency import idempotent
+from movie_database.models import Collection, MediaCaseDimension, Movie, PhysicalMedia, Shelf
+from movie_database.response_cache import cache_response
 
 router = RouterPaginated(tags=["Movie"])
 
 
 @router.post("/")
+@decorate_view(idempotent)
 async def create_movie(request: HttpRequest, payload: schemas.MovieIn) -> DefaultPostSuccessResponse:  # noqa: ARG001, D103
     movie = await Movie.objects.acreate(**payload.dict())
     return {"id": movie.id}
 
 
-@router.get("/", response=list[schemas.MovieOut])
-async def list_movies(request: HttpRequest, filters: Annotated[schemas.MovieFilter, Query(...)]) -> list[schemas.MovieOut]:  # noqa: ARG001, D103
-    movies = Movie.objects.all()
-    movies = filters.filter(movies)
-    return [schemas.MovieOut.from_orm(movie) async for movie in movies]
+@router.post("/bulk", response=BulkPostSuccessResponse)
+@decorate_view(idempotent)
+async def create_movies(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    payload: list[schemas.MovieIn],
+    options: Annotated[schemas.BulkOptions, Query(...)],
+) -> BulkPostSuccessResponse:
+    try:
+        movies = await Movie.objects.abulk_create([Movie(**movie.dict()) for movie in payload], batch_size=options.batch_size)
+    except IntegrityError as e:
+        raise HttpError(409, "A movie with the same title, release year and Letterboxd URI already exists") from e
+    return {"ids": [movie.id for movie in movies]}
 
 
-@router.get("/{movie_id}", response=schemas.MovieOut)
-async def get_movie(request: HttpRequest, movie_id: int) -> Movie:  # noqa: ARG001, D103
-    return await aget_object_or_404(Movie, id=movie_id)
+@router.put("/upsert", response=schemas.UpsertOut)
+async def upsert_movies(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    payload: schemas.MovieIn | list[schemas.MovieIn],
+    options: Annotated[schemas.UpsertOptions, Query(...)],
+) -> schemas.UpsertOut:
+    movies = [Movie(**movie.dict()) for movie in (payload if isinstance(payload, list) else [payload])]
+    written = await sync_to_async(Movie.objects.upsert)(movies, options.update)
+    # Movies given more than once are only written, and counted, once
+    created = {pk for pk, was_created in written if was_created}
+    return schemas.UpsertOut(ids=[pk for pk, _ in written], created=len(created), updated=len({pk for pk, _ in written} - created))
+
+
+@router.get("/", response=list[schemas.SparseMovieOut], exclude_unset=True)
+@decorate_view(cache_response(Movie))
+@paginate(KeysetPagination, ordering=("release_year", "title", "id"))
+async def list_movies(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    filters: Annotated[schemas.MovieFilter, Query(...)],
+    fieldset: Annotated[schemas.MovieFieldset, Query(...)],
+    batch: Annotated[schemas.BatchIds, Query(...)],
+    search: str | None = None,
+) -> QuerySet[Movie, dict[str, Any]] | Batch:
+    movies = Movie.objects.search(search) if search else Movie.objects.all()
+    rows = schema_rows(filters.filter(movies), schemas.MovieOut, fieldset.fields)
+    return await fetch_by_ids(rows, batch.ids) if batch.ids else rows
+
+
+@router.get("/export")
+async def export_movies(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    filters: Annotated[schemas.MovieFilter, Query(...)],
+    options: Annotated[schemas.ExportOptions, Query(...)],
+) -> StreamingHttpResponse:
+    movies = filters.filter(Movie.objects.order_by("id"))
+    return stream_export(movies, schemas.MovieOut, options.format, "movies")
+
+
+@router.get("/{movie_id}", response=schemas.SparseMovieOut, exclude_unset=True)
+@decorate_view(cache_response(Movie))
+async def get_movie(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    movie_id: int,
+    fieldset: Annotated[schemas.MovieFieldset, Query(...)],
+) -> dict[str, Any]:
+    return await aget_object_or_404(schema_rows(Movie.objects.all(), schemas.MovieOut, fieldset.fields), id=movie_id)
 
 
 @router.get("/{movie_id}/physical_media", response=list[schemas.PhysicalMediaOut], tags=["Movie", "Physical Media"])
+@decorate_view(cache_response(PhysicalMedia, Movie, MediaCaseDimension, Shelf, Collection))
 async def get_movie_physical_media(request: HttpRequest, movie_id: int) -> list[schemas.PhysicalMediaOut]:  # noqa: ARG001, D103
     movie: Movie = await aget_object_or_404(Movie, id=movie_id)
     return [schemas.PhysicalMediaOut.from_orm(medium) async for medium in movie.physical_media_set.all()]
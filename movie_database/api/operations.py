@@ -0,0 +1,204 @@
+"""Running many creates, updates and deletes in one request and one transaction, with later operations referring to earlier creates."""
+
+from collections.abc import Iterator, Sequence
+from copy import copy
+from functools import cache
+from typing import Any
+
+import structlog
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, models, transaction
+from django.http import HttpRequest
+from ninja import Schema
+from ninja.decorators import decorate_view
+from ninja.errors import HttpError
+from ninja.pagination import RouterPaginated
+from pydantic import ValidationError
+
+import movie_database.schema as schemas
+from movie_database.api.physical_media import check_shelf_space
+from movie_database.idempotency import idempotent
+from movie_database.models import Bookcase, Collection, Movie, PhysicalMedia, PhysicalMediaQuerySet
+from movie_database.response_cache import bump_versions
+
+logger = structlog.get_logger()
+
+router = RouterPaginated(tags=["Batch"])
+
+RESOURCES: dict[str, tuple[type[models.Model], type[Schema]]] = {
+    "bookcase": (Bookcase, schemas.BookcaseIn),
+    "collection": (Collection, schemas.CollectionIn),
+    "movie": (Movie, schemas.MovieIn),
+    "physical_media": (PhysicalMedia, schemas.PhysicalMediaIn),
+}
+
+type Run = list[tuple[int, schemas.BatchOperationIn]]
+
+# Input schemas with every field optional, validating only the fields an update sets
+partial = cache(schemas.partial)
+
+
+# Only ids can be references, so other strings starting with "$", e.g. a title, are left as they are
+ID_FIELDS = ("_id", "_ids")
+
+
+def _references(operation: schemas.BatchOperationIn) -> set[str]:
+    values = [operation.id, *(value for field, value in operation.data.items() if field.endswith(ID_FIELDS))]
+    flattened = [v for value in values for v in (value if isinstance(value, list) else [value])]
+    return {v[1:] for v in flattened if isinstance(v, str) and v.startswith("$")}
+
+
+def _runs(operations: Sequence[schemas.BatchOperationIn]) -> Iterator[Run]:
+    """Split operations into runs of consecutive alike operations, each of which can be written with shared statements.
+
+    Operations are alike if they do the same thing to the same resource, and set the same fields if they are updates.
+    An operation referring to an object created earlier in the same run starts a new run, so the object exists first.
+    """
+    run: Run = []
+    for index, operation in enumerate(operations):
+        if run:
+            first = run[-1][1]
+            alike = (first.op, first.resource, first.data.keys()) == (operation.op, operation.resource, operation.data.keys())
+            if not alike or _references(operation) & {o.ref for _, o in run}:
+                yield run
+                run = []
+        run.append((index, operation))
+    if run:
+        yield run
+
+
+def _resolve(value: Any, refs: dict[str, int], index: int) -> Any:  # noqa: ANN401
+    """Replace `"$<ref>"` with the id of the object created under that ref, including inside lists."""
+    if isinstance(value, list):
+        return [_resolve(v, refs, index) for v in value]
+    if isinstance(value, str) and value.startswith("$"):
+        try:
+            return refs[value[1:]]
+        except KeyError:
+            raise HttpError(422, f"Operation {index}: unknown reference {value}") from None
+    return value
+
+
+def _validate(schema: type[Schema], index: int, operation: schemas.BatchOperationIn, refs: dict[str, int]) -> Schema:
+    try:
+        data = {field: _resolve(value, refs, index) if field.endswith(ID_FIELDS) else value for field, value in operation.data.items()}
+        return schema.model_validate(data)
+    except ValidationError as e:
+        errors = "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+        raise HttpError(422, f"Operation {index}: {errors}") from e
+
+
+def _create(run: Run, refs: dict[str, int]) -> list[int]:
+    model, schema = RESOURCES[run[0][1].resource]
+    rows = [_validate(schema, index, operation, refs).model_dump() for index, operation in run]
+    _check_references(model, rows)
+
+    if model is PhysicalMedia:
+        media = [(PhysicalMedia(**{f: v for f, v in row.items() if f != "movie_ids"}), row["movie_ids"]) for row in rows]
+        check_shelf_space([m for m, _ in media])
+        created = PhysicalMedia.objects.bulk_create_with_movies(media)
+    else:
+        created = model.objects.bulk_create([model(**row) for row in rows])
+
+    for (_, operation), obj in zip(run, created, strict=True):
+        if operation.ref is not None:
+            refs[operation.ref] = obj.pk
+    return [obj.pk for obj in created]
+
+
+def _check_found(model: type[models.Model], ids: list[int], found: set[int]) -> None:
+    if missing := [i for i in ids if i not in found]:
+        raise HttpError(404, f"{str(model._meta.verbose_name_plural).capitalize()} not found: {missing}")  # noqa: SLF001
+
+
+def _check_references(model: type[models.Model], rows: list[dict[str, Any]]) -> None:
+    """Check every object the rows refer to by id exists, so a missing one is a 404 as on the other endpoints, rather than a foreign key error."""
+    for field in dict.fromkeys(field for row in rows for field in row if field.endswith(ID_FIELDS)):
+        # e.g. `shelf_id` refers to a shelf by the `shelf` foreign key, and `movie_ids` to movies by `movies`
+        related = model._meta.get_field(field.removesuffix("_id") if field.endswith("_id") else f"{field.removesuffix('_ids')}s").related_model  # noqa: SLF001
+        values = [row.get(field) for row in rows]
+        ids = list(dict.fromkeys(i for value in values for i in (value if isinstance(value, list) else [value]) if i is not None))
+        _check_found(related, ids, set(related.objects.filter(id__in=ids).values_list("id", flat=True)))
+
+
+def _existing_ids(run: Run, refs: dict[str, int]) -> list[int]:
+    model, _ = RESOURCES[run[0][1].resource]
+    ids = [_resolve(operation.id, refs, index) for index, operation in run]
+    _check_found(model, ids, set(model.objects.filter(id__in=ids).values_list("id", flat=True)))
+    return ids
+
+
+def _check_moves(ids: list[int], rows: list[dict[str, Any]]) -> None:
+    """Check physical media being moved or resized fit on their shelves, as they will be after the update."""
+    previous = PhysicalMedia.objects.in_bulk(ids)
+    # The last update of a media in the run is the one that sticks
+    changes = dict(zip(ids, rows, strict=True))
+    moved = [copy(previous[i]) for i in changes]
+    for media in moved:
+        for field, value in changes[media.id].items():
+            if field != "movie_ids":
+                setattr(media, field, value)
+    check_shelf_space(moved, previous.values())
+
+
+def _update(run: Run, refs: dict[str, int]) -> list[int]:
+    model, schema = RESOURCES[run[0][1].resource]
+    ids = _existing_ids(run, refs)
+    rows = [_validate(partial(schema), index, operation, refs).model_dump(exclude_unset=True) for index, operation in run]
+    _check_references(model, rows)
+
+    if model is PhysicalMedia and not PhysicalMediaQuerySet.SPACE_FIELDS.isdisjoint(rows[0]):
+        _check_moves(ids, rows)
+    if fields := [field for field in rows[0] if field != "movie_ids"]:
+        model.objects.bulk_update([model(id=i, **{f: row[f] for f in fields}) for i, row in zip(ids, rows, strict=True)], fields)
+    if "movie_ids" in rows[0]:
+        through = PhysicalMedia.movies.through
+        through.objects.filter(physicalmedia_id__in=ids).delete()
+        through.objects.bulk_create(
+            through(physicalmedia_id=i, movie_id=movie_id) for i, row in zip(ids, rows, strict=True) for movie_id in dict.fromkeys(row["movie_ids"])
+        )
+    return ids
+
+
+def _delete(run: Run, refs: dict[str, int]) -> list[int]:
+    model, _ = RESOURCES[run[0][1].resource]
+    ids = [_resolve(operation.id, refs, index) for index, operation in run]
+    _check_found(model, ids, {pk for (pk,) in model.objects.filter(id__in=ids).delete_returning()})
+    return ids
+
+
+def execute_batch(operations: Sequence[schemas.BatchOperationIn]) -> schemas.BatchOut:
+    """Run the operations in order in a single transaction, writing each run of alike operations with shared statements.
+
+    Creates are inserted with one `bulk_create` per run, updates setting the same fields with one `bulk_update`, and
+    deletes with one DELETE ... RETURNING. If any operation fails, the transaction is rolled back and none of them take effect.
+
+    Returns:
+        BatchOut: The id of the object each operation wrote, and of each object created with a ref.
+
+    """
+    refs: dict[str, int] = {}
+    ids: list[int] = []
+    execute = {"create": _create, "update": _update, "delete": _delete}
+
+    try:
+        with transaction.atomic():
+            for run in _runs(operations):
+                ids += execute[run[0][1].op](run, refs)
+            # Not every write sends signals, e.g. bulk creates of bookcases and collections
+            bump_versions(*(RESOURCES[operation.resource][0] for operation in operations), PhysicalMedia.movies.through)
+    except IntegrityError as e:
+        logger.warning("Batch conflicts with existing data.", exc_info=e)
+        raise HttpError(409, "Batch conflicts with existing data, e.g. a duplicate movie or shelf position") from e
+
+    return schemas.BatchOut(
+        results=[schemas.BatchOperationOut(op=o.op, resource=o.resource, id=i) for o, i in zip(operations, ids, strict=True)],
+        refs=refs,
+    )
+
+
+@router.post("/", response=schemas.BatchOut)
+@decorate_view(idempotent)
+async def run_batch(request: HttpRequest, payload: schemas.BatchIn) -> schemas.BatchOut:  # noqa: ARG001
+    """Run creates, updates and deletes across bookcases, collections, movies and physical media atomically, in order."""
+    return await sync_to_async(execute_batch)(payload.operations)
@@ -0,0 +1,123 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import Sequence
+from typing import Any
+
+from django.db.models import F, Q, QuerySet
+from django.http import HttpRequest
+from ninja.errors import HttpError
+from ninja.pagination import LimitOffsetPagination
+
+from movie_database.api.batch import Batch
+
+Key = list[int | float | str | None]
+
+
+class KeysetPagination(LimitOffsetPagination):
+    """Limit/offset pagination that also hands out an opaque `next_cursor`, for opting in to keyset pagination.
+
+    Passing `cursor` back resumes straight after the last item of the previous page by filtering on the ordering key,
+    instead of skipping rows with OFFSET, so every page costs the same as the first and pages don't shift as items
+    are added. The ordering must end in a unique field, and should be backed by a matching index. NULLs sort last.
+    Pages fetched by cursor leave `count` out, rather than counting every row again.
+
+    A view can also return a `Batch` of objects fetched by id, which is paged by offset as it is and reports the ids
+    that weren't found as `missing_ids`.
+    """
+
+    class Input(LimitOffsetPagination.Input):  # noqa: D106
+        cursor: str | None = None
+
+    class Output(LimitOffsetPagination.Output):  # noqa: D106
+        count: int | None  # pyright: ignore[reportIncompatibleVariableOverride]
+        next_cursor: str | None = None
+        missing_ids: list[int] | None = None
+
+    def __init__(self, *, ordering: Sequence[str], **kwargs: Any) -> None:  # noqa: ANN401
+        """Initialise with the fields to order by and key cursors on, e.g. `("release_year", "title", "id")`.
+
+        A view can instead return a queryset with its own explicit `order_by()` of field or annotation names, e.g. to
+        page through search results by rank.
+        """
+        self.ordering = tuple(ordering)
+        super().__init__(**kwargs)
+
+    def _page(self, queryset: QuerySet, pagination: Input) -> tuple[QuerySet, list[tuple[str, bool]]]:
+        """Build the query for the page, with one extra item to tell whether there is a next page without a second query."""
+        ordering = tuple(queryset.query.order_by) or self.ordering
+        keys = [(f"keyset_{i}", field.startswith("-")) for i, field in enumerate(ordering)]
+
+        keyed = queryset.annotate(**{name: F(field.removeprefix("-")) for (name, _), field in zip(keys, ordering, strict=True)})
+        keyed = keyed.order_by(*(F(name).desc(nulls_last=True) if descending else F(name).asc(nulls_last=True) for name, descending in keys))
+
+        limit = min(pagination.limit, self.max_limit)
+        if pagination.cursor is None:
+            return keyed[pagination.offset : pagination.offset + limit + 1], keys
+        return keyed.filter(self._after(keys, self._decode(pagination.cursor, len(keys))))[: limit + 1], keys
+
+    def _output(self, items: list[Any], keys: list[tuple[str, bool]], pagination: Input, count: int | None) -> dict[str, Any]:
+        limit = min(pagination.limit, self.max_limit)
+        next_cursor = self._encode(self._key(items[limit - 1], keys)) if len(items) > limit else None
+        return {self.items_attribute: items[:limit], "count": count, "next_cursor": next_cursor}
+
+    def _batch_output(self, batch: Batch, pagination: Input) -> dict[str, Any]:
+        limit = min(pagination.limit, self.max_limit)
+        return {
+            self.items_attribute: batch[pagination.offset : pagination.offset + limit],
+            "count": len(batch),
+            "next_cursor": None,
+            "missing_ids": batch.missing_ids,
+        }
+
+    async def apaginate_queryset(self, queryset: QuerySet | Batch, pagination: Input, request: HttpRequest, **params: Any) -> dict[str, Any]:  # noqa: ANN401, ARG002, D102
+        if isinstance(queryset, Batch):
+            return self._batch_output(queryset, pagination)
+
+        page, keys = self._page(queryset, pagination)
+        items = [obj async for obj in page]
+        # Clients following cursors already know the total from the first page, so later pages skip the COUNT(*)
+        count = await self._aitems_count(queryset) if pagination.cursor is None else None
+        return self._output(items, keys, pagination, count)
+
+    def paginate_queryset(self, queryset: QuerySet | Batch, pagination: Input, request: HttpRequest, **params: Any) -> dict[str, Any]:  # noqa: ANN401, ARG002, D102
+        if isinstance(queryset, Batch):
+            return self._batch_output(queryset, pagination)
+
+        page, keys = self._page(queryset, pagination)
+        items = list(page)
+        count = self._items_count(queryset) if pagination.cursor is None else None
+        return self._output(items, keys, pagination, count)
+
+    @staticmethod
+    def _after(keys: list[tuple[str, bool]], key: Key) -> Q:
+        """Build a filter for the rows strictly after the given key, as `(a, b, c) > (x, y, z)` with NULLs last."""
+        after = Q(pk__in=[])
+        for (name, descending), value in reversed(list(zip(keys, key, strict=True))):
+            if value is None:
+                # Nothing sorts after NULL in this column, so only later columns can break the tie
+                after = Q(**{f"{name}__isnull": True}) & after
+            else:
+                beyond = Q(**{f"{name}__lt" if descending else f"{name}__gt": value})
+                after = beyond | Q(**{f"{name}__isnull": True}) | (Q(**{name: value}) & after)
+        return after
+
+    @staticmethod
+    def _key(item: object, keys: list[tuple[str, bool]]) -> Key:
+        """Read the ordering key of a model instance, or of a `.values()` row."""
+        if isinstance(item, dict):
+            return [item[name] for name, _ in keys]
+        return [getattr(item, name) for name, _ in keys]
+
+    @staticmethod
+    def _encode(key: Key) -> str:
+        return urlsafe_b64encode(json.dumps(key, separators=(",", ":")).encode()).decode()
+
+    @staticmethod
+    def _decode(cursor: str, length: int) -> Key:
+        try:
+            key = json.loads(urlsafe_b64decode(cursor.encode()))
+        except ValueError as e:
+            raise HttpError(400, "Invalid cursor") from e
+        if not isinstance(key, list) or len(key) != length or not all(v is None or isinstance(v, int | float | str) for v in key):
+            raise HttpError(400, "Invalid cursor")
+        return key
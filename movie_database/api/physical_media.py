@@ -1,39 +1,258 @@
-from django.http import HttpRequest
+from collections.abc import Iterable, Sequence
+from copy import copy
+from typing import Annotated
+
+import structlog
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import Model, QuerySet
+from django.http import Http404, HttpRequest, StreamingHttpResponse
 from django.shortcuts import aget_object_or_404
-from ninja.pagination import RouterPaginated
+from ninja import Query
+from ninja.decorators import decorate_view
+from ninja.errors import HttpError
+from ninja.pagination import RouterPaginated, paginate
 
 import movie_database.schema as schemas
-from movie_database.api.responses import DefaultDeleteSuccessResponse, DefaultPostSuccessResponse
-from movie_database.models import MediaCaseDimension, PhysicalMedia
+from movie_database.api.batch import Batch, fetch_by_ids
+from movie_database.api.export import stream_export
+from movie_database.api.pagination import KeysetPagination
+from movie_database.api.responses import BulkDeleteSuccessResponse, BulkPostSuccessResponse, DefaultDeleteSuccessResponse, DefaultPostSuccessResponse
+from movie_database.fit_matrix import FitMatrix
+from movie_database.idempotency import idempotent
+from movie_database.models import Collection, MediaCaseDimension, Movie, PhysicalMedia, Shelf, ShelfDimension
+from movie_database.organiser import MediaChange, NeighbourhoodOrganiser
+from movie_database.response_cache import bump_versions, cache_response
+
+logger = structlog.get_logger()
 
 router = RouterPaginated(tags=["Physical Media"])
 
+# Every other relation is checked up front, so the unique position on a shelf is what's left to conflict
+POSITION_TAKEN = "Position already taken on shelf"
+
+
+def _get_reference[M: Model](queryset: QuerySet[M], name: str, pk: int) -> M:
+    if (obj := queryset.filter(id=pk).first()) is None:
+        raise HttpError(404, f"{name} not found: [{pk}]")
+    return obj
+
+
+def check_shelf_space(media: Sequence[PhysicalMedia], replacing: Iterable[PhysicalMedia] = ()) -> None:
+    """Check media being placed together fit on their shelves alongside what is on them now.
+
+    Call inside the transaction writing the media: their shelves are locked until it ends, so concurrent placements
+    can't overfill them. A shelf or case dimensions that doesn't exist is left to fail the write's foreign key.
+
+    Args:
+        media: The media to place, with their relations set by id.
+        replacing: The media as stored before an update, whose space is given back.
+
+    """
+    placed = [m for m in media if m.shelf_id is not None]
+    if not placed:
+        return
+
+    replacing = list(replacing)
+    shelves = Shelf.objects.select_related("dimensions").select_for_update(of=("self",)).in_bulk({m.shelf_id for m in placed})
+    dimensions = MediaCaseDimension.objects.in_bulk({m.dimensions_id for m in [*placed, *replacing]})
+    for m in [*placed, *replacing]:
+        if m.dimensions_id in dimensions:
+            m.dimensions = dimensions[m.dimensions_id]
+
+    for shelf in shelves.values():
+        on_shelf = [m for m in placed if m.shelf_id == shelf.id]
+        if all(m.dimensions_id in dimensions for m in on_shelf) and not shelf.has_room_for_all(on_shelf, replacing):
+            raise HttpError(422, f"Physical media do not fit on shelf {shelf.id}")
+
+
+def create_physical_medias_with_movies(media: Sequence[tuple[PhysicalMedia, Iterable[int]]], batch_size: int | None = None) -> list[PhysicalMedia]:
+    """Create physical media with their movies in one transaction, if they fit on their shelves.
+
+    Returns:
+        list[PhysicalMedia]: The media created, in the order given, with their ids set.
+
+    """
+    try:
+        with transaction.atomic():
+            check_shelf_space([m for m, _ in media])
+            return PhysicalMedia.objects.bulk_create_with_movies(media, batch_size=batch_size)
+    except IntegrityError as e:
+        logger.warning("Physical media conflicts with existing data.", exc_info=e)
+        raise HttpError(409, POSITION_TAKEN) from e
+
+
+def save_physical_media(physical_media: PhysicalMedia, movie_ids: Sequence[int] | None, previous: PhysicalMedia | None = None) -> None:
+    """Save a physical media and replace its movies in one transaction, if it fits on its shelf.
+
+    Only the relations changed from `previous` are checked, and the shelf is locked while its space is checked and
+    taken, so concurrent placements can't overfill it. The media is written with one INSERT or UPDATE, and its movies
+    with one DELETE and one INSERT.
+
+    Args:
+        physical_media: The media to save, with its relations set by id.
+        movie_ids: The ids of its movies, or None to leave them as they are.
+        previous: The media as stored before the update, or None if it is being created.
+
+    """
+    placement = (physical_media.shelf_id, physical_media.dimensions_id)
+    placement_changed = previous is None or placement != (previous.shelf_id, previous.dimensions_id)
+
+    with transaction.atomic():
+        if previous is None or physical_media.dimensions_id != previous.dimensions_id:
+            physical_media.dimensions = _get_reference(MediaCaseDimension.objects.all(), "Media case dimensions", physical_media.dimensions_id)
+        if physical_media.shelf_id is not None and placement_changed:
+            shelf = _get_reference(Shelf.objects.select_related("dimensions").select_for_update(of=("self",)), "Shelves", physical_media.shelf_id)
+            if not shelf.has_room_for(physical_media, replacing=previous):
+                raise HttpError(422, "Physical media does not fit on the shelf")
+        if physical_media.collection_id is not None and (previous is None or physical_media.collection_id != previous.collection_id):
+            _get_reference(Collection.objects.all(), "Collections", physical_media.collection_id)
+        if movie_ids and (missing := sorted(set(movie_ids) - set(Movie.objects.filter(id__in=movie_ids).values_list("id", flat=True)))):
+            raise HttpError(404, f"Movies not found: {missing}")
+
+        try:
+            physical_media.save()
+        except IntegrityError as e:
+            logger.warning("Physical media conflicts with existing data.", exc_info=e)
+            raise HttpError(409, POSITION_TAKEN) from e
+
+        if movie_ids is not None:
+            through = PhysicalMedia.movies.through
+            if previous is not None:
+                through.objects.filter(physicalmedia_id=physical_media.id).delete()
+            through.objects.bulk_create(through(physicalmedia_id=physical_media.id, movie_id=movie_id) for movie_id in dict.fromkeys(movie_ids))
+            # Bulk inserted links don't send m2m_changed
+            bump_versions(through, Movie)
+
 
 @router.post("/")
-async def create_physical_media(request: HttpRequest, payload: schemas.PhysicalMediaIn) -> DefaultPostSuccessResponse:  # noqa: ARG001, D103
-    physical_media = await PhysicalMedia.objects.acreate(**payload.dict())
+@decorate_view(idempotent)
+async def create_physical_media(request: HttpRequest, payload: schemas.PhysicalMediaIn) -> DefaultPostSuccessResponse:  # noqa: ARG001
+    """Create a physical media with its movies, case dimensions, collection and place on a shelf, if it fits there."""
+    physical_media = PhysicalMedia(**payload.dict(exclude={"movie_ids"}))
+    await sync_to_async(save_physical_media)(physical_media, payload.movie_ids)
     return {"id": physical_media.id}
 
 
+@router.post("/bulk", response=BulkPostSuccessResponse)
+@decorate_view(idempotent)
+async def create_physical_medias(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    payload: list[schemas.PhysicalMediaIn],
+    options: Annotated[schemas.BulkOptions, Query(...)],
+) -> BulkPostSuccessResponse:
+    references = (
+        (MediaCaseDimension, "Media case dimensions", {m.dimensions_id for m in payload}),
+        (Shelf, "Shelves", {m.shelf_id for m in payload} - {None}),
+        (Collection, "Collections", {m.collection_id for m in payload} - {None}),
+        (Movie, "Movies", {movie_id for m in payload for movie_id in m.movie_ids}),
+    )
+    for model, name, ids in references:
+        found = {i async for i in model.objects.filter(id__in=ids).values_list("id", flat=True)}
+        if missing := sorted(ids - found):
+            raise HttpError(404, f"{name} not found: {missing}")
+
+    physical_media = [(PhysicalMedia(**m.dict(exclude={"movie_ids"})), m.movie_ids) for m in payload]
+    created = await sync_to_async(create_physical_medias_with_movies)(physical_media, batch_size=options.batch_size)
+    return {"ids": [m.id for m in created]}
+
+
 @router.get("/", response=list[schemas.PhysicalMediaOut])
-async def list_physical_medias(request: HttpRequest) -> list[schemas.PhysicalMediaOut]:  # noqa: ARG001, D103
-    physical_medias = PhysicalMedia.objects.all()
-    return [schemas.PhysicalMediaOut.from_orm(m) async for m in physical_medias]
+@decorate_view(cache_response(PhysicalMedia, Movie, MediaCaseDimension, Shelf, Collection))
+@paginate(KeysetPagination, ordering=("shelf__position_from_top", "position_on_shelf", "id"))
+async def list_physical_medias(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    expansions: Annotated[schemas.PhysicalMediaExpand, Query(...)],
+    batch: Annotated[schemas.BatchIds, Query(...)],
+) -> QuerySet[PhysicalMedia] | Batch:
+    physical_media = PhysicalMedia.objects.expand(expansions.expand)
+    return await fetch_by_ids(physical_media, batch.ids) if batch.ids else physical_media
+
+
+@router.get("/export")
+async def export_physical_medias(request: HttpRequest, options: Annotated[schemas.ExportOptions, Query(...)]) -> StreamingHttpResponse:  # noqa: ARG001, D103
+    return stream_export(PhysicalMedia.objects.order_by("id"), schemas.PhysicalMediaRow, options.format, "physical_media")
 
 
 @router.get("/{physical_media_id}", response=schemas.PhysicalMediaOut)
-async def get_physical_media(request: HttpRequest, physical_media_id: int) -> PhysicalMedia:  # noqa: ARG001, D103
-    return await aget_object_or_404(PhysicalMedia, id=physical_media_id)
+@decorate_view(cache_response(PhysicalMedia, Movie, MediaCaseDimension, Shelf, Collection))
+async def get_physical_media(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    physical_media_id: int,
+    expansions: Annotated[schemas.PhysicalMediaExpand, Query(...)],
+) -> PhysicalMedia:
+    return await aget_object_or_404(PhysicalMedia.objects.expand(expansions.expand), id=physical_media_id)
 
 
 @router.get("/{physical_media_id}/dimension", response=schemas.MediaCaseDimensionOut, tags=["Physical Media", "Dimension"])
+@decorate_view(cache_response(PhysicalMedia, MediaCaseDimension))
 async def get_physical_media_dimension(request: HttpRequest, physical_media_id: int) -> MediaCaseDimension:  # noqa: ARG001, D103
     physical_media = await aget_object_or_404(PhysicalMedia, id=physical_media_id)
     return physical_media.dimensions
 
 
+@router.get("/{physical_media_id}/candidate_shelves", response=list[schemas.CandidateShelfOut], tags=["Physical Media", "Shelf"])
+@decorate_view(cache_response(PhysicalMedia, MediaCaseDimension, Shelf, ShelfDimension))
+async def get_physical_media_candidate_shelves(request: HttpRequest, physical_media_id: int) -> list[schemas.CandidateShelfOut]:  # noqa: ARG001, D103
+    physical_media = await aget_object_or_404(PhysicalMedia.objects.select_related("dimensions"), id=physical_media_id)
+    shelves = [shelf async for shelf in Shelf.objects.select_related("dimensions")]
+    fit_matrix = FitMatrix([physical_media], shelves)
+    return [
+        schemas.CandidateShelfOut(
+            id=shelf.id,
+            bookcase_id=shelf.bookcase_id,
+            position_from_top=shelf.position_from_top,
+            orientation=shelf.orientation,
+            remaining_space=remaining_space,
+        )
+        for shelf, remaining_space in fit_matrix.candidate_shelves(physical_media.id)
+    ]
+
+
+@router.post("/{physical_media_id}/shelve", response=schemas.ShelvePhysicalMediaOut, tags=["Physical Media", "Shelf"])
+@decorate_view(idempotent)
+async def shelve_physical_media(request: HttpRequest, physical_media_id: int, payload: schemas.ShelvePhysicalMediaIn) -> schemas.ShelvePhysicalMediaOut:  # noqa: ARG001
+    """Add a physical media to the end of a shelf, moving as few media on it and its neighbouring shelves as possible to make room."""
+    physical_media = await aget_object_or_404(PhysicalMedia, id=physical_media_id)
+    shelf = await aget_object_or_404(Shelf, id=payload.shelf_id)
+
+    change = MediaChange(kind=MediaChange.Kind.ADDED, media_id=physical_media.id, shelf_id=shelf.id)
+    organiser = await sync_to_async(NeighbourhoodOrganiser.from_database)(change)
+    moves = organiser.plan()
+    if any(p.media_id == physical_media.id and p.shelf_id is None for p in moves):
+        raise HttpError(422, "Physical media does not fit on the shelf or its neighbours")
+
+    await sync_to_async(organiser.apply)(moves)
+    return schemas.ShelvePhysicalMediaOut(
+        moves=[schemas.PlacementOut(physical_media_id=p.media_id, shelf_id=p.shelf_id, position_on_shelf=p.position_on_shelf) for p in moves],
+    )
+
+
+@router.patch("/{physical_media_id}")
+async def update_physical_media(request: HttpRequest, physical_media_id: int, payload: schemas.PartialPhysicalMediaIn) -> DefaultPostSuccessResponse:  # noqa: ARG001
+    """Update the given fields and relations of a physical media, replacing its movies if `movie_ids` is given, checking it fits any new placement."""
+    physical_media = await aget_object_or_404(PhysicalMedia.objects.select_related("dimensions"), id=physical_media_id)
+    previous = copy(physical_media)
+    changes = payload.dict(exclude_unset=True)
+    movie_ids = changes.pop("movie_ids", None)
+    for field, value in changes.items():
+        setattr(physical_media, field, value)
+
+    await sync_to_async(save_physical_media)(physical_media, movie_ids, previous)
+    return {"id": physical_media.id}
+
+
+@router.delete("/", response=BulkDeleteSuccessResponse)
+async def delete_physical_medias(request: HttpRequest, filters: Annotated[schemas.PhysicalMediaFilter, Query(...)]) -> BulkDeleteSuccessResponse:  # noqa: ARG001
+    """Delete every physical media matching the filters, e.g. `?shelf=3`, with one DELETE."""
+    if not filters.model_dump(exclude_none=True):
+        raise HttpError(422, "At least one filter is required to delete physical media in bulk")
+    deleted = await filters.filter(PhysicalMedia.objects.all()).adelete_returning()
+    return {"deleted": len(deleted)}
+
+
 @router.delete("/{physical_media_id}")
 async def delete_physical_media(request: HttpRequest, physical_media_id: int) -> DefaultDeleteSuccessResponse:  # noqa: ARG001, D103
-    physical_media = await aget_object_or_404(PhysicalMedia, id=physical_media_id)
-    await physical_media.adelete()
+    if not await PhysicalMedia.objects.filter(id=physical_media_id).adelete_returning():
+        raise Http404
     return {"success": True}
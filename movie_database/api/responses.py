@@ -9,7 +9,19 @@ class DefaultPostSuccessResponse(BaseModel):
     id: int
 
 
+class BulkPostSuccessResponse(BaseModel):
+    """The success response body on a bulk POST request, with the ids of the objects created in the order given."""
+
+    ids: list[int]
+
+
 class DefaultDeleteSuccessResponse(BaseModel):
     """The default success response body on a DELETE request."""
 
     success: Literal[True] = True
+
+
+class BulkDeleteSuccessResponse(BaseModel):
+    """The success response body on a filtered bulk DELETE request, with how many objects were deleted."""
+
+    deleted: int
@@ -0,0 +1,23 @@
+"""Serialising straight from `.values()` rows, rather than instantiating a model per row only to read it back out."""
+
+from collections.abc import Iterable
+from functools import cache
+from typing import Any
+
+from django.db.models import QuerySet
+from ninja import Schema
+from pydantic import TypeAdapter
+
+
+def schema_rows(queryset: QuerySet, schema: type[Schema], fields: Iterable[str] = ()) -> QuerySet[Any, dict[str, Any]]:
+    """Fetch only the columns the schema serialises, or just the given subset of its fields, as dicts.
+
+    Every field of the schema must be a column or annotation of the queryset, so it can't have resolvers or relations.
+    """
+    return queryset.values(*(sorted(fields) or schema.model_fields))
+
+
+@cache
+def row_adapter[S: Schema](schema: type[S]) -> TypeAdapter[S]:
+    """Return a validator and serialiser for single rows of the schema, compiled once and reused on every request."""
+    return TypeAdapter(schema)
@@ -1,39 +1,126 @@
-from django.http import HttpRequest
+from typing import Annotated, Any
+
+from asgiref.sync import sync_to_async
+from django.db.models import QuerySet
+from django.http import Http404, HttpRequest
 from django.shortcuts import aget_object_or_404
-from ninja.pagination import RouterPaginated
+from ninja import Query
+from ninja.decorators import decorate_view
+from ninja.errors import HttpError
+from ninja.pagination import RouterPaginated, paginate
 
 import movie_database.schema as schemas
-from movie_database.api.responses import DefaultDeleteSuccessResponse, DefaultPostSuccessResponse
-from movie_database.models import Shelf, ShelfDimension
+from movie_database.api.batch import Batch, fetch_by_ids
+from movie_database.api.pagination import KeysetPagination
+from movie_database.api.responses import BulkDeleteSuccessResponse, DefaultDeleteSuccessResponse, DefaultPostSuccessResponse
+from movie_database.api.rows import schema_rows
+from movie_database.idempotency import idempotent
+from movie_database.models import MediaCaseDimension, PhysicalMedia, Shelf, ShelfDimension
+from movie_database.positioning import Placement, apply_placements, compact_positions
+from movie_database.response_cache import cache_response
 
 router = RouterPaginated(tags=["Shelf"])
 
 
 @router.post("/")
+@decorate_view(idempotent)
 async def create_shelf(request: HttpRequest, payload: schemas.ShelfIn) -> DefaultPostSuccessResponse:  # noqa: ARG001, D103
     shelf_dimension = await Shelf.objects.acreate(**payload.dict())
     return {"id": shelf_dimension.id}
 
 
-@router.get("/", response=list[schemas.ShelfOut])
-async def list_shelves(request: HttpRequest) -> list[schemas.ShelfOut]:  # noqa: ARG001, D103
-    shelf_dimensions = Shelf.objects.all()
-    return [schemas.ShelfOut.from_orm(m) async for m in shelf_dimensions]
+@router.get("/", response=list[schemas.SparseShelfOut], exclude_unset=True)
+@decorate_view(cache_response(Shelf))
+@paginate(KeysetPagination, ordering=("position_from_top", "id"))
+async def list_shelves(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    fieldset: Annotated[schemas.ShelfFieldset, Query(...)],
+    batch: Annotated[schemas.BatchIds, Query(...)],
+) -> QuerySet[Shelf, dict[str, Any]] | Batch:
+    rows = schema_rows(Shelf.objects.all(), schemas.ShelfOut, fieldset.fields)
+    return await fetch_by_ids(rows, batch.ids) if batch.ids else rows
+
+
+@router.get("/capacity", response=list[schemas.MediaCaseCapacityOut], tags=["Shelf", "Dimension"])
+@decorate_view(cache_response(Shelf, ShelfDimension, MediaCaseDimension))
+async def list_shelves_capacity(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    filters: Annotated[schemas.MediaCaseCapacityFilter, Query(...)],
+) -> list[schemas.MediaCaseCapacityOut]:
+    dimensions = filters.filter(MediaCaseDimension.objects.with_spare_capacity(Shelf.objects.all())).order_by("id")
+    return [schemas.MediaCaseCapacityOut.from_orm(d) async for d in dimensions]
+
 
+@router.get("/{shelf_id}", response=schemas.SparseShelfOut, exclude_unset=True)
+@decorate_view(cache_response(Shelf))
+async def get_shelf(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    shelf_id: int,
+    fieldset: Annotated[schemas.ShelfFieldset, Query(...)],
+) -> dict[str, Any]:
+    return await aget_object_or_404(schema_rows(Shelf.objects.all(), schemas.ShelfOut, fieldset.fields), id=shelf_id)
 
-@router.get("/{shelf_id}", response=schemas.ShelfOut)
-async def get_shelf(request: HttpRequest, shelf_id: int) -> Shelf:  # noqa: ARG001, D103
-    return await aget_object_or_404(Shelf, id=shelf_id)
+
+@router.get("/{shelf_id}/capacity", response=list[schemas.MediaCaseCapacityOut], tags=["Shelf", "Dimension"])
+@decorate_view(cache_response(Shelf, ShelfDimension, MediaCaseDimension))
+async def get_shelf_capacity(  # noqa: D103
+    request: HttpRequest,  # noqa: ARG001
+    shelf_id: int,
+    filters: Annotated[schemas.MediaCaseCapacityFilter, Query(...)],
+) -> list[schemas.MediaCaseCapacityOut]:
+    shelf = await aget_object_or_404(Shelf, id=shelf_id)
+    dimensions = filters.filter(MediaCaseDimension.objects.with_spare_capacity(Shelf.objects.filter(id=shelf.id))).order_by("id")
+    return [schemas.MediaCaseCapacityOut.from_orm(d) async for d in dimensions]
 
 
 @router.get("/{shelf_id}/dimensions", response=schemas.ShelfDimensionOut, tags=["Shelf", "Dimension"])
+@decorate_view(cache_response(Shelf, ShelfDimension))
 async def get_shelf_dimension(request: HttpRequest, shelf_id: int) -> ShelfDimension:  # noqa: ARG001, D103
     shelf = await aget_object_or_404(Shelf, id=shelf_id)
     return shelf.dimensions
 
 
+@router.post("/{shelf_id}/layout", response=schemas.ShelfLayoutOut, tags=["Shelf", "Physical Media"])
+@decorate_view(idempotent)
+async def set_shelf_layout(request: HttpRequest, shelf_id: int, payload: schemas.ShelfLayoutIn) -> schemas.ShelfLayoutOut:  # noqa: ARG001
+    """Store exactly the given physical media on a shelf, in order, moving any others off it."""
+    shelf = await aget_object_or_404(Shelf.objects.select_related("dimensions"), id=shelf_id)
+    media = {m.id: m async for m in PhysicalMedia.objects.select_related("dimensions").filter(id__in=payload.physical_media_ids)}
+
+    if missing := [media_id for media_id in payload.physical_media_ids if media_id not in media]:
+        raise HttpError(404, f"Physical media not found: {missing}")
+    if not shelf.can_fit_all_media(media.values()):
+        raise HttpError(422, "Physical media do not fit on the shelf")
+
+    removed = [media_id async for media_id in shelf.physical_media_set.exclude(id__in=media).values_list("id", flat=True)]
+    placements = [
+        *(Placement(media_id=media_id, shelf_id=shelf.id, position_on_shelf=position) for position, media_id in enumerate(payload.physical_media_ids, start=1)),
+        *(Placement(media_id=media_id, shelf_id=None, position_on_shelf=None) for media_id in removed),
+    ]
+    await sync_to_async(apply_placements)(placements)
+    return schemas.ShelfLayoutOut(physical_media_ids=payload.physical_media_ids, removed_physical_media_ids=removed)
+
+
+@router.post("/{shelf_id}/compact", response=schemas.CompactPositionsOut, tags=["Shelf", "Physical Media"])
+@decorate_view(idempotent)
+async def compact_shelf(request: HttpRequest, shelf_id: int) -> schemas.CompactPositionsOut:  # noqa: ARG001
+    """Renumber the physical media on a shelf 1, 2, 3... in their current order."""
+    shelf = await aget_object_or_404(Shelf, id=shelf_id)
+    renumbered = await sync_to_async(compact_positions)(Shelf.objects.filter(id=shelf.id))
+    return schemas.CompactPositionsOut(renumbered=renumbered)
+
+
+@router.delete("/", response=BulkDeleteSuccessResponse)
+async def delete_shelves(request: HttpRequest, filters: Annotated[schemas.ShelfFilter, Query(...)]) -> BulkDeleteSuccessResponse:  # noqa: ARG001
+    """Delete every shelf matching the filters, e.g. `?bookcase=2`, with one DELETE."""
+    if not filters.model_dump(exclude_none=True):
+        raise HttpError(422, "At least one filter is required to delete shelves in bulk")
+    deleted = await filters.filter(Shelf.objects.all()).adelete_returning()
+    return {"deleted": len(deleted)}
+
+
 @router.delete("/{shelf_id}")
 async def delete_shelf(request: HttpRequest, shelf_id: int) -> DefaultDeleteSuccessResponse:  # noqa: ARG001, D103
-    shelf_dimension = await aget_object_or_404(Shelf, id=shelf_id)
-    await shelf_dimension.adelete()
+    if not await Shelf.objects.filter(id=shelf_id).adelete_returning():
+        raise Http404
     return {"success": True}
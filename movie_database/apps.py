@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MovieDatabaseConfig(AppConfig):  # noqa: D101
     default_auto_field = "django.db.models.BigAutoField"
     name = "movie_database"
+
+    def ready(self) -> None:  # noqa: D102
+        from movie_database import signals  # noqa: F401, PLC0415
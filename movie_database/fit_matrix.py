@@ -0,0 +1,54 @@
+"""Vectorised feasibility of placing physical media on shelves, for every (media, shelf) pair at once."""
+
+from collections.abc import Iterable, Sequence
+from decimal import Decimal
+
+import numpy as np
+import numpy.typing as npt
+
+from movie_database.fixed_point import from_hundredths, to_hundredths
+from movie_database.models import PhysicalMedia, Shelf
+
+
+class FitMatrix:
+    """Which shelves can take which physical media, and how much room would be left, computed with NumPy.
+
+    Dimensions are held as integer hundredths of a mm so comparisons are exact. Rows are media and columns are
+    shelves. A media fits a shelf when its case is no deeper than the shelf and its size along the shelf's stacking
+    axis is no larger than the shelf's available space, as in `Shelf.can_accommodate`. Media already on a shelf do
+    not count against their own shelf's space.
+    """
+
+    def __init__(self, media: Sequence[PhysicalMedia], shelves: Sequence[Shelf]) -> None:
+        """Build the matrix from media and shelves that already have their `dimensions` loaded."""
+        self.media = list(media)
+        self.shelves = list(shelves)
+        self._media_index = {m.id: row for row, m in enumerate(self.media)}
+
+        vertical = np.array([s.orientation == Shelf.Orientation.VERTICAL for s in self.shelves], dtype=bool)
+        shelf_ids = np.array([s.id for s in self.shelves], dtype=np.int64)
+        shelf_depth = self._sizes(s.dimensions.depth for s in self.shelves)
+        shelf_available = self._sizes(s.dimensions.get_axis_size(s.stacking_axis) - getattr(s, f"used_{s.stacking_axis}") for s in self.shelves)
+
+        media_shelf_ids = np.array([-1 if m.shelf_id is None else m.shelf_id for m in self.media], dtype=np.int64)
+        media_depth = self._sizes(m.dimensions.depth for m in self.media)
+        media_height = self._sizes(m.dimensions.height for m in self.media)
+        media_width = self._sizes(m.dimensions.width for m in self.media)
+
+        # Size of each media along each shelf's stacking axis, shape (media, shelves)
+        size = np.where(vertical[np.newaxis, :], media_height[:, np.newaxis], media_width[:, np.newaxis])
+        already_on_shelf = media_shelf_ids[:, np.newaxis] == shelf_ids[np.newaxis, :]
+
+        self.remaining: npt.NDArray[np.int64] = shelf_available[np.newaxis, :] - size + np.where(already_on_shelf, size, 0)
+        self.fits: npt.NDArray[np.bool_] = (self.remaining >= 0) & (media_depth[:, np.newaxis] <= shelf_depth[np.newaxis, :])
+
+    @staticmethod
+    def _sizes(values: Iterable[Decimal]) -> npt.NDArray[np.int64]:
+        return np.fromiter((to_hundredths(v) for v in values), dtype=np.int64)
+
+    def candidate_shelves(self, media_id: int) -> list[tuple[Shelf, Decimal]]:
+        """Return every shelf that can take the given media, tightest fit first, with the space that would remain in mm."""
+        row = self._media_index[media_id]
+        columns = np.flatnonzero(self.fits[row])
+        best_first = columns[np.argsort(self.remaining[row, columns], kind="stable")]
+        return [(self.shelves[column], from_hundredths(int(self.remaining[row, column]))) for column in best_first]
@@ -0,0 +1,110 @@
+"""`Idempotency-Key` support for POST routes, so a retried request gets the original response instead of writing twice.
+
+The first request with a key claims it by inserting a row, runs, and stores its response in the row. Retries with the
+same key find the row in a single primary key lookup and replay the response without running the route again. A
+retry arriving while the first request is still running is rejected with `409 Conflict`, and a key reused for a
+different request body with `422 Unprocessable Entity`.
+
+Responses are only stored if they are not server errors, so a request that failed unexpectedly can be retried. Keys
+expire after `TTL`, and expired rows are deleted with `prune_expired_keys`, e.g. by the `prune_idempotency_keys` command.
+"""
+
+from collections.abc import Awaitable, Callable
+from datetime import timedelta
+from functools import wraps
+from hashlib import sha256
+from http import HTTPStatus
+from typing import Any
+
+from django.db import IntegrityError
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.http.response import HttpResponseBase
+from django.utils import timezone
+
+from movie_database.models import IdempotencyKey
+
+type Run = Callable[..., Awaitable[HttpResponseBase]]
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+TTL = timedelta(hours=24)
+
+
+def prune_expired_keys() -> int:
+    """Delete every key older than `TTL`, in a single DELETE using the `created_at` index.
+
+    Returns:
+        int: The number of keys deleted.
+
+    """
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=timezone.now() - TTL).delete()
+    return deleted
+
+
+# Responses are built here rather than raised as `HttpError`, as the wrapper runs outside Ninja's exception handling
+def _error(status: HTTPStatus, detail: str) -> JsonResponse:
+    return JsonResponse({"detail": detail}, status=status)
+
+
+def _replay(stored: IdempotencyKey, request_digest: str) -> HttpResponse:
+    if stored.request_digest != request_digest:
+        return _error(HTTPStatus.UNPROCESSABLE_ENTITY, f"{HEADER} has already been used for a different request")
+    if stored.status_code is None:
+        return _error(HTTPStatus.CONFLICT, f"A request with this {HEADER} is still being handled")
+
+    response = HttpResponse(bytes(stored.content), status=stored.status_code, content_type=stored.content_type)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(run: Run) -> Run:
+    """Replay the stored response when an operation is retried with the same `Idempotency-Key` header, instead of running it again.
+
+    Apply with `ninja.decorators.decorate_view`. Requests without the header are run as usual.
+
+    Returns:
+        Run: The wrapped operation.
+
+    """
+
+    @wraps(run)
+    async def idempotent_run(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponseBase:  # noqa: ANN401
+        if (key := request.headers.get(HEADER)) is None:
+            return await run(request, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return _error(HTTPStatus.BAD_REQUEST, f"{HEADER} must be between 1 and {MAX_KEY_LENGTH} characters")
+
+        digest = sha256(f"{request.path}\n{key}".encode()).hexdigest()
+        request_digest = sha256(request.body).hexdigest()
+        expired_before = timezone.now() - TTL
+        if (stored := await IdempotencyKey.objects.filter(digest=digest).afirst()) is not None:
+            if stored.created_at >= expired_before:
+                return _replay(stored, request_digest)
+            # The key has expired but not been pruned yet. Only an expired row is deleted, never another request's live claim
+            await IdempotencyKey.objects.filter(digest=digest, created_at__lt=expired_before).adelete()
+
+        try:
+            await IdempotencyKey.objects.acreate(digest=digest, request_digest=request_digest)
+        except IntegrityError:
+            # Another request with the key claimed it between the read and the insert
+            if (stored := await IdempotencyKey.objects.filter(digest=digest).afirst()) is None:
+                return _error(HTTPStatus.CONFLICT, f"A request with this {HEADER} is still being handled")
+            return _replay(stored, request_digest)
+
+        try:
+            response = await run(request, *args, **kwargs)
+        except BaseException:
+            await IdempotencyKey.objects.filter(digest=digest).adelete()
+            raise
+
+        if response.status_code < HTTPStatus.INTERNAL_SERVER_ERROR and isinstance(response, HttpResponse):
+            await IdempotencyKey.objects.filter(digest=digest).aupdate(
+                status_code=response.status_code,
+                content=response.content,
+                content_type=response["Content-Type"],
+            )
+        else:
+            await IdempotencyKey.objects.filter(digest=digest).adelete()
+        return response
+
+    return idempotent_run
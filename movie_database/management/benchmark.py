@@ -0,0 +1,14 @@
+"""Timing helpers shared by the benchmark management commands."""
+
+import time
+from collections.abc import Callable
+
+
+def best_time(run: Callable[[], object], repeat: int) -> float:
+    """Return the fastest of `repeat` runs in seconds, the least disturbed by anything else running at the time."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
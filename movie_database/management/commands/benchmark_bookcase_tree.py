@@ -0,0 +1,70 @@
+from argparse import ArgumentParser
+from decimal import Decimal
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+import movie_database.schema as schemas
+from movie_database.management.benchmark import best_time
+from movie_database.models import Bookcase, MediaCaseDimension, Movie, PhysicalMedia, Shelf, ShelfDimension
+
+
+class Command(BaseCommand):
+    """Command to compare loading a whole bookcase level by level with loading it as one prefetched tree."""
+
+    help = "Time and count the queries of serialising a whole bookcase, level by level and with Bookcase.objects.with_tree()"
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Add command line arguments to manage.py command."""
+        parser.add_argument("--discs", type=int, default=500, help="Number of physical media in the bookcase")
+        parser.add_argument("--shelves", type=int, default=10, help="Number of shelves the media are spread across")
+        parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs, of which the fastest is reported")
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: ANN401, ARG002
+        """Handle the command to benchmark the bookcase tree, against a temporary bookcase that is rolled back afterwards."""
+        with transaction.atomic():
+            bookcase = self._make_bookcase(options["discs"], options["shelves"])
+
+            def level_by_level() -> list[object]:
+                # What clients did before the tree endpoint: the bookcase, its shelves, each shelf's media, each media's movies
+                out: list[object] = [schemas.BookcaseOut.from_orm(Bookcase.objects.get(id=bookcase.id))]
+                for shelf in Shelf.objects.filter(bookcase=bookcase).order_by("position_from_top"):
+                    out.append(schemas.ShelfOut.from_orm(shelf))
+                    for media in PhysicalMedia.objects.filter(shelf=shelf).order_by("position_on_shelf"):
+                        out.append(schemas.PhysicalMediaOut.from_orm(media))
+                        out.extend(schemas.MovieOut.from_orm(movie) for movie in media.movies.all())
+                return out
+
+            def tree() -> schemas.BookcaseTreeOut:
+                return schemas.BookcaseTreeOut.from_orm(Bookcase.objects.with_tree().get(id=bookcase.id))
+
+            for name, run in (("level by level", level_by_level), ("with_tree", tree)):
+                with CaptureQueriesContext(connection) as queries:
+                    run()
+                seconds = best_time(run, options["repeat"])
+                self.stdout.write(f"{name:<16} {len(queries):6d} queries {seconds * 1000:9.2f} ms")
+
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _make_bookcase(discs: int, shelves: int) -> Bookcase:
+        bookcase = Bookcase.objects.create(name="Benchmark bookcase", description="", location="")
+        shelf_dimensions = ShelfDimension.objects.create(width=Decimal(900), height=Decimal(400), depth=Decimal(300))
+        case = MediaCaseDimension.objects.create(
+            media_format=MediaCaseDimension.Format.BLURAY,
+            description="Benchmark case",
+            width=Decimal("135.00"),
+            height=Decimal("171.00"),
+            depth=Decimal("12.00"),
+        )
+        shelf_objs = Shelf.objects.bulk_create(Shelf(bookcase=bookcase, position_from_top=i + 1, dimensions=shelf_dimensions) for i in range(shelves))
+        media = PhysicalMedia.objects.bulk_create(
+            PhysicalMedia(shelf=shelf_objs[i % shelves], position_on_shelf=i // shelves + 1, dimensions=case) for i in range(discs)
+        )
+        movies = Movie.objects.bulk_create(Movie(title=f"Benchmark movie {i}", release_year=1900 + i % 125) for i in range(discs))
+        PhysicalMedia.movies.through.objects.bulk_create(
+            PhysicalMedia.movies.through(physicalmedia_id=m.id, movie_id=movie.id) for m, movie in zip(media, movies, strict=True)
+        )
+        return bookcase
@@ -0,0 +1,29 @@
+from argparse import ArgumentParser
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from movie_database.models import Shelf
+from movie_database.positioning import compact_positions
+
+
+class Command(BaseCommand):
+    """Command to close the gaps in physical media positions on shelves."""
+
+    help = "Renumber physical media positions 1, 2, 3... on every shelf, or only those given, keeping their order"
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Add command line arguments to manage.py command."""
+        parser.add_argument("--bookcase", type=int, action="append", default=[], help="Only compact shelves in this bookcase (repeatable)")
+        parser.add_argument("--shelf", type=int, action="append", default=[], help="Only compact this shelf (repeatable)")
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: ANN401, ARG002
+        """Handle the command to compact shelf positions."""
+        shelves = Shelf.objects.all()
+        if options["bookcase"]:
+            shelves = shelves.filter(bookcase_id__in=options["bookcase"])
+        if options["shelf"]:
+            shelves = shelves.filter(id__in=options["shelf"])
+
+        renumbered = compact_positions(shelves)
+        self.stdout.write(self.style.SUCCESS(f"Renumbered {renumbered} physical media."))
@@ -0,0 +1,36 @@
+from argparse import ArgumentParser
+from typing import Any
+
+import structlog
+from django.core.management.base import BaseCommand
+
+from movie_database.organiser import ShelfOrganiser
+
+logger = structlog.get_logger()
+
+
+class Command(BaseCommand):
+    """Command to automatically organise physical media onto shelves based on shelf and case dimensions."""
+
+    help = "Organise all physical media onto shelves based on shelf and case dimensions"
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Add command line arguments to manage.py command."""
+        parser.add_argument("--dry-run", action="store_true", help="Plan the organisation without saving it")
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: ANN401, ARG002
+        """Handle the command to organise physical media."""
+        organiser = ShelfOrganiser.from_database()
+        placements = organiser.plan()
+        unplaced = sum(1 for p in placements if p.shelf_id is None)
+
+        if unplaced:
+            logger.warning("Physical media could not be placed on any shelf.", unplaced=unplaced)
+            self.stdout.write(self.style.WARNING(f"{unplaced} physical media could not be placed on any shelf."))
+
+        if options["dry_run"]:
+            self.stdout.write(f"Planned {len(placements) - unplaced} physical media across {len(organiser.shelves)} shelves.")
+            return
+
+        moved = organiser.apply(placements)
+        self.stdout.write(self.style.SUCCESS(f"Moved {len(moved)} physical media."))
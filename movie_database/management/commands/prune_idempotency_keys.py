@@ -0,0 +1,16 @@
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from movie_database.idempotency import TTL, prune_expired_keys
+
+
+class Command(BaseCommand):
+    """Command to delete idempotency keys, and the responses stored with them, once they have expired."""
+
+    help = f"Delete idempotency keys older than {TTL}, e.g. from a daily cron job"
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: ANN401, ARG002
+        """Handle the command to prune expired idempotency keys."""
+        deleted = prune_expired_keys()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency keys."))
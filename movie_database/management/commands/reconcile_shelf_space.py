@@ -0,0 +1,49 @@
+from argparse import ArgumentParser
+from typing import Any
+
+import structlog
+from django.core.management.base import BaseCommand
+
+from movie_database.models import Shelf
+
+logger = structlog.get_logger()
+
+
+class Command(BaseCommand):
+    """Command to recompute the maintained used space counters on every shelf, reporting any drift."""
+
+    help = "Recompute each shelf's used space counters from its physical media and report drift"
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Add command line arguments to manage.py command."""
+        parser.add_argument("--dry-run", action="store_true", help="Report drift without correcting it")
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: ANN401, ARG002
+        """Handle the command to reconcile shelf used space counters."""
+        shelves = Shelf.objects.with_actual_used_space().select_related("bookcase").order_by("bookcase_id", "position_from_top")
+        drifted = [s for s in shelves if (s.used_height, s.used_width) != (s.actual_used_height, s.actual_used_width)]
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("All shelf used space counters are correct."))
+            return
+
+        for shelf in drifted:
+            logger.warning(
+                "Shelf used space has drifted.",
+                shelf_id=shelf.id,
+                used_height=str(shelf.used_height),
+                actual_used_height=str(shelf.actual_used_height),
+                used_width=str(shelf.used_width),
+                actual_used_width=str(shelf.actual_used_width),
+            )
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{shelf}: height {shelf.used_height} -> {shelf.actual_used_height}, width {shelf.used_width} -> {shelf.actual_used_width}",
+                ),
+            )
+
+        if options["dry_run"]:
+            return
+
+        Shelf.objects.filter(id__in=[s.id for s in drifted]).refresh_used_space()
+        self.stdout.write(self.style.SUCCESS(f"Corrected {len(drifted)} shelves."))
@@ -0,0 +1,27 @@
+from argparse import ArgumentParser
+from typing import Any
+
+from django.core.management.base import BaseCommand
+
+from movie_database.response_cache import reset_response_cache_stats, response_cache_stats
+
+
+class Command(BaseCommand):
+    """Command to report how often cached API responses have been served, across every worker sharing the cache."""
+
+    help = "Report the API response cache's hits, misses, hit rate and 304 Not Modified responses"
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Add command line arguments to manage.py command."""
+        parser.add_argument("--reset", action="store_true", help="Reset the counts to zero after reporting them")
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: ANN401, ARG002
+        """Handle the command to report response cache statistics."""
+        stats = response_cache_stats()
+        requests = stats["hits"] + stats["misses"]
+        hit_rate = f"{stats['hits'] / requests:.1%}" if requests else "n/a"
+        self.stdout.write(f"Hits: {stats['hits']}, misses: {stats['misses']}, hit rate: {hit_rate}, not modified: {stats['not_modified']}")
+
+        if options["reset"]:
+            reset_response_cache_stats()
+            self.stdout.write(self.style.SUCCESS("Reset response cache statistics."))
@@ -0,0 +1,67 @@
+# Generated by Django 6.1.2 on 2026-10-17 02:06
+
+from decimal import Decimal
+
+from django.apps.registry import Apps
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+from django.db.models.functions import Coalesce
+
+
+def backfill_used_space(apps: Apps, schema_editor: BaseDatabaseSchemaEditor) -> None:  # noqa: ARG001
+    """Populate the used space counters from the media already on each shelf."""
+    Shelf = apps.get_model("movie_database", "Shelf")
+    PhysicalMedia = apps.get_model("movie_database", "PhysicalMedia")
+
+    def total(axis: str) -> Coalesce:
+        totals = (
+            PhysicalMedia.objects.filter(shelf=models.OuterRef("pk"))
+            .order_by()
+            .values("shelf")
+            .annotate(total=models.Sum(f"dimensions__{axis}"))
+            .values("total")
+        )
+        return Coalesce(models.Subquery(totals), models.Value(Decimal(0)), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+
+    Shelf.objects.update(used_height=total("height"), used_width=total("width"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("movie_database", "0022_rename_case_dimensions_physicalmedia_dimensions"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="physicalmedia",
+            options={
+                "base_manager_name": "objects",
+                "ordering": ("shelf__position_from_top", "position_on_shelf"),
+                "verbose_name": "Physical Media",
+                "verbose_name_plural": "Physical Media",
+            },
+        ),
+        migrations.AddField(
+            model_name="shelf",
+            name="used_height",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=Decimal(0),
+                editable=False,
+                help_text="Total height in mm of the media on this shelf, maintained on write",
+                max_digits=12,
+            ),
+        ),
+        migrations.AddField(
+            model_name="shelf",
+            name="used_width",
+            field=models.DecimalField(
+                decimal_places=2,
+                default=Decimal(0),
+                editable=False,
+                help_text="Total width in mm of the media on this shelf, maintained on write",
+                max_digits=12,
+            ),
+        ),
+        migrations.RunPython(backfill_used_space, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.1.2 on 2026-10-17 02:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("movie_database", "0023_shelf_used_space"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="movie",
+            index=models.Index(fields=["release_year", "title", "id"], name="movie_keyset_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="physicalmedia",
+            index=models.Index(fields=["shelf", "position_on_shelf", "id"], name="physical_media_keyset_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="shelf",
+            index=models.Index(fields=["position_from_top", "id"], name="shelf_keyset_idx"),
+        ),
+    ]
@@ -0,0 +1,73 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.apps.registry import Apps
+from django.contrib.postgres.search import SearchVectorField
+from django.db import migrations, models
+from django.db.backends.base.schema import BaseDatabaseSchemaEditor
+
+SEARCH_INDEXES = ("movie_search_vector_idx", "movie_title_trgm_idx")
+
+
+def add_search_columns(apps: Apps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    """Add the generated search vector and the GIN indexes on PostgreSQL, or a plain placeholder column elsewhere.
+
+    `to_tsvector` and `pg_trgm` only exist on PostgreSQL. Other databases, such as the SQLite test backend, still need
+    the column for Movie to be queryable, but `MovieQuerySet.search` never reads it there.
+    """
+    Movie = apps.get_model("movie_database", "Movie")
+    if schema_editor.connection.vendor != "postgresql":
+        placeholder = SearchVectorField(null=True)
+        placeholder.set_attributes_from_name("search_vector")
+        schema_editor.add_field(Movie, placeholder)
+        return
+
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.add_field(Movie, Movie._meta.get_field("search_vector"))  # noqa: SLF001
+    for index in Movie._meta.indexes:  # noqa: SLF001
+        if index.name in SEARCH_INDEXES:
+            schema_editor.add_index(Movie, index)
+
+
+def remove_search_columns(apps: Apps, schema_editor: BaseDatabaseSchemaEditor) -> None:
+    """Drop the search vector column and, on PostgreSQL, the GIN indexes. The `pg_trgm` extension is left installed."""
+    Movie = apps.get_model("movie_database", "Movie")
+    if schema_editor.connection.vendor == "postgresql":
+        for index in Movie._meta.indexes:  # noqa: SLF001
+            if index.name in SEARCH_INDEXES:
+                schema_editor.remove_index(Movie, index)
+    schema_editor.remove_field(Movie, Movie._meta.get_field("search_vector"))  # noqa: SLF001
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("movie_database", "0024_keyset_indexes"),
+    ]
+
+    operations = [
+        # The schema is created per database vendor below, so these only update the migration state
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name="movie",
+                    name="search_vector",
+                    field=models.GeneratedField(
+                        db_persist=True,
+                        expression=django.contrib.postgres.search.SearchVector("title", config="english"),
+                        output_field=django.contrib.postgres.search.SearchVectorField(null=True),
+                    ),
+                ),
+                migrations.AddIndex(
+                    model_name="movie",
+                    index=django.contrib.postgres.indexes.GinIndex(fields=["search_vector"], name="movie_search_vector_idx"),
+                ),
+                migrations.AddIndex(
+                    model_name="movie",
+                    index=django.contrib.postgres.indexes.GinIndex(
+                        django.contrib.postgres.indexes.OpClass("title", name="gin_trgm_ops"),
+                        name="movie_title_trgm_idx",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(add_search_columns, remove_search_columns),
+    ]
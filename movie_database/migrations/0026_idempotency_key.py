@@ -0,0 +1,26 @@
+# Generated by Django 6.1.2 on 2026-10-17 02:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("movie_database", "0025_movie_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IdempotencyKey",
+            fields=[
+                ("digest", models.CharField(help_text="SHA-256 of the route and the key", max_length=64, primary_key=True, serialize=False)),
+                (
+                    "request_digest",
+                    models.CharField(help_text="SHA-256 of the request body, so a key reused for a different request is rejected", max_length=64),
+                ),
+                ("status_code", models.PositiveSmallIntegerField(blank=True, help_text="Null while the request is still being handled", null=True)),
+                ("content", models.BinaryField(default=b"")),
+                ("content_type", models.CharField(blank=True, max_length=100)),
+                ("created_at", models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
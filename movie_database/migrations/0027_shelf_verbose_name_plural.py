@@ -0,0 +1,16 @@
+# Generated by Django 6.1.2 on 2026-10-17 03:15
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("movie_database", "0026_idempotency_key"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="shelf",
+            options={"ordering": ("position_from_top",), "verbose_name_plural": "shelves"},
+        ),
+    ]
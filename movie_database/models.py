@@ -1,13 +1,108 @@
+from collections.abc import Iterable, Sequence
 from decimal import Decimal
-from typing import TYPE_CHECKING, Literal
+from itertools import batched
+from typing import TYPE_CHECKING, Any, Literal
 
+from asgiref.sync import sync_to_async
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, SearchVectorField, TrigramSimilarity
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.db.models.functions import Cast, Coalesce, Round
+
+from movie_database.fixed_point import DECIMAL_PLACES, Size
+from movie_database.response_cache import bump_versions
 
 if TYPE_CHECKING:
     from django.db.models.manager import RelatedManager
 
 
+class VersionedQuerySet[M: models.Model](models.QuerySet[M]):
+    """QuerySet invalidating cached API responses on bulk writes, which bypass the signals that otherwise do so.
+
+    Each write runs in a transaction with the bump after it, so even in autocommit the version only changes once the
+    rows have. Otherwise a read in between could cache the old rows under the new version.
+    """
+
+    def update(self, **kwargs: Any) -> int:  # noqa: ANN401, D102
+        with transaction.atomic(using=self.db):
+            rows = super().update(**kwargs)
+            bump_versions(self.model)
+        return rows
+
+    def bulk_update(self, objs: Iterable[M], fields: Sequence[str], batch_size: int | None = None) -> int:  # noqa: D102
+        with transaction.atomic(using=self.db):
+            rows = super().bulk_update(objs, fields, batch_size=batch_size)
+            bump_versions(self.model)
+        return rows
+
+    def bulk_create(self, objs: Iterable[M], *args: Any, **kwargs: Any) -> list[M]:  # noqa: ANN401, D102
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            bump_versions(self.model)
+        return created
+
+    def delete_returning(self, *fields: str) -> list[tuple[Any, ...]]:
+        """Delete the rows with a single DELETE ... RETURNING, rather than loading them into Django's cascade collector.
+
+        Rows referring to them are first cascaded or set null by `on_delete` with one statement per relation, without
+        loading them or sending delete signals. Relations with any other `on_delete`, e.g. `models.PROTECT`, need the
+        collector, and are refused with a ValueError.
+
+        Args:
+            fields: The fields to return of each deleted row, by default its primary key.
+
+        Returns:
+            list[tuple]: The fields of each deleted row, e.g. to tell a delete that matched nothing (a 404) from a successful one.
+
+        """
+        connection = connections[self.db]
+        opts = self.model._meta  # noqa: SLF001
+        columns = ", ".join(connection.ops.quote_name(opts.get_field(field).column) for field in fields or (opts.pk.name,))
+        ids_sql, params = self.order_by().values("pk").query.get_compiler(self.db).as_sql()
+
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            written = delete_dependants(self)
+            cursor.execute(
+                f"DELETE FROM {connection.ops.quote_name(opts.db_table)} WHERE {connection.ops.quote_name(opts.pk.column)} IN ({ids_sql}) "  # noqa: S608
+                f"RETURNING {columns}",
+                params,
+            )
+            rows = cursor.fetchall()
+            bump_versions(self.model, *written)
+            return rows
+
+    async def adelete_returning(self, *fields: str) -> list[tuple[Any, ...]]:  # noqa: D102
+        return await sync_to_async(self.delete_returning)(*fields)
+
+
+def delete_dependants(queryset: models.QuerySet) -> set[type[models.Model]]:
+    """Apply `on_delete` to every row referring to the queryset's rows, as Django's collector would, but with one statement per relation.
+
+    Returns:
+        set[type[models.Model]]: Every model whose rows may have been written, and so whose cached responses are stale.
+
+    """
+    ids = queryset.order_by().values("pk")
+    written: set[type[models.Model]] = set()
+    for relation in get_candidate_relations_to_delete(queryset.model._meta):  # noqa: SLF001
+        # Plain querysets, so custom `update()`s don't do work for rows that are about to be deleted
+        dependants = models.QuerySet(relation.related_model, using=queryset.db).filter(**{f"{relation.field.name}__in": ids})
+        if relation.on_delete is models.CASCADE:
+            written |= delete_dependants(dependants)
+            dependants._raw_delete(queryset.db)  # noqa: SLF001
+            # Deleted rows drop out of whatever they referred to, e.g. movie links out of their movies
+            written |= {field.related_model for field in relation.related_model._meta.concrete_fields if field.is_relation}  # noqa: SLF001
+        elif relation.on_delete is models.SET_NULL:
+            dependants.update(**{relation.field.name: None})
+        elif relation.on_delete is not models.DO_NOTHING:
+            msg = f"Can't delete {queryset.model.__name__} without the collector, as {relation.field} is {relation.on_delete.__name__}"
+            raise ValueError(msg)
+        written.add(relation.related_model)
+    return written
+
+
 class Dimension(models.Model):
     """Abstract model representing anything with a width, height and depth."""
 
@@ -56,6 +151,52 @@ class ShelfDimension(Dimension):
         return f"{self.width:.2f} x {self.height:.2f} x {self.depth:.2f}"
 
 
+class MediaCaseDimensionQuerySet(VersionedQuerySet["MediaCaseDimension"]):
+    """QuerySet with set-based shelf capacity forecasts for media case dimensions."""
+
+    def with_spare_capacity(self, shelves: models.QuerySet["Shelf"]) -> "MediaCaseDimensionQuerySet":
+        """Annotate each case dimension with `spare_capacity`, how many more cases of it would fit across the given shelves.
+
+        A case fits a shelf as in `Shelf.can_accommodate`: it must be no deeper than the shelf, and as many fit as there
+        is available space along the shelf's stacking axis, read from the maintained used space counters. Every
+        (dimension, shelf) pair is counted in one correlated subquery, so the whole forecast is a single query. Sizes
+        are compared as integer hundredths of a mm, so the integer division counting cases is exact.
+
+        Args:
+            shelves: The shelves to count spare capacity across.
+
+        Returns:
+            MediaCaseDimensionQuerySet: The annotated queryset.
+
+        """
+        vertical = models.Q(orientation=Shelf.Orientation.VERTICAL)
+        counts = (
+            shelves.order_by()
+            .annotate(
+                case_size=in_hundredths(models.Case(models.When(vertical, then=models.OuterRef("height")), default=models.OuterRef("width"))),
+                available=in_hundredths(
+                    models.Case(
+                        models.When(vertical, then=models.F("dimensions__height") - models.F("used_height")),
+                        default=models.F("dimensions__width") - models.F("used_width"),
+                        output_field=SPACE_FIELD,
+                    ),
+                ),
+                fits=models.Case(
+                    models.When(
+                        dimensions__depth__gte=models.OuterRef("depth"),
+                        case_size__gt=0,
+                        available__gte=models.F("case_size"),
+                        then=models.F("available") / models.F("case_size"),
+                    ),
+                    default=0,
+                ),
+            )
+            .annotate(total=models.Func(models.F("fits"), function="SUM", output_field=models.IntegerField()))
+            .values("total")
+        )
+        return self.annotate(spare_capacity=Coalesce(models.Subquery(counts), 0))
+
+
 class MediaCaseDimension(Dimension):
     """Represents the dimensions of a media case."""
 
@@ -72,6 +213,8 @@ class MediaCaseDimension(Dimension):
     description = models.CharField(max_length=255, blank=False)
     physical_media_set: "RelatedManager['PhysicalMedia']"
 
+    objects = MediaCaseDimensionQuerySet.as_manager()
+
     class Meta:  # pyright: ignore[reportIncompatibleVariableOverride] # noqa: D106
         verbose_name = "Media Case Dimensions"
         verbose_name_plural = "Media Case Dimensions"
@@ -83,6 +226,79 @@ class MediaCaseDimension(Dimension):
         return f"{self.width:.2f}W x {self.height:.2f}H x {self.depth:.2f}D"
 
 
+# Sums of media dimensions can exceed the 5 digits allowed for a single Dimension, so aggregates get a wider field.
+SPACE_FIELD = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+def stacking_axis_size(dimensions_path: str) -> models.Case:
+    """Build a SQL expression selecting a dimension's size along the stacking axis of the shelf being queried.
+
+    The stacking axis is chosen per row from `Shelf.orientation` so capacity maths can run set-based in the database
+    instead of calling `Shelf.stacking_axis` for every shelf in Python.
+
+    Args:
+        dimensions_path: The lookup path from Shelf to the Dimension to measure, e.g. "dimensions" or "physical_media_set__dimensions".
+
+    Returns:
+        models.Case: An expression evaluating to the height of the dimension for vertical shelves, and its width otherwise.
+
+    """
+    return models.Case(
+        models.When(orientation=Shelf.Orientation.VERTICAL, then=models.F(f"{dimensions_path}__height")),
+        default=models.F(f"{dimensions_path}__width"),
+        output_field=SPACE_FIELD,
+    )
+
+
+def media_total_size(axis: Literal["height", "width"]) -> Coalesce:
+    """Build a subquery summing the given axis of every physical media on the shelf being queried.
+
+    Args:
+        axis: The media case axis to sum ("height" or "width").
+
+    Returns:
+        Coalesce: An expression evaluating to the total size in mm, or 0 for an empty shelf.
+
+    """
+    totals = (
+        PhysicalMedia.objects.filter(shelf=models.OuterRef("pk")).order_by().values("shelf").annotate(total=models.Sum(f"dimensions__{axis}")).values("total")
+    )
+    return Coalesce(models.Subquery(totals), models.Value(Decimal(0)), output_field=SPACE_FIELD)
+
+
+def in_hundredths(expression: models.Expression | models.F) -> Cast:
+    """Build a SQL expression converting a size in mm to an integer number of hundredths of a mm, as `fixed_point.to_hundredths` does."""
+    return Cast(Round(expression * models.Value(10**DECIMAL_PLACES)), output_field=models.IntegerField())
+
+
+class ShelfQuerySet(VersionedQuerySet["Shelf"]):
+    """QuerySet with set-based capacity annotations for shelves."""
+
+    def with_actual_used_space(self) -> "ShelfQuerySet":
+        """Annotate each shelf with `actual_used_height` and `actual_used_width`, summed from its media rather than read from the counters."""
+        return self.annotate(actual_used_height=media_total_size("height"), actual_used_width=media_total_size("width"))
+
+    def refresh_used_space(self) -> int:
+        """Recompute the maintained `used_height` and `used_width` counters from scratch, in a single UPDATE.
+
+        Returns:
+            int: The number of shelves updated.
+
+        """
+        return self.update(used_height=media_total_size("height"), used_width=media_total_size("width"))
+
+    def with_occupancy(self) -> "ShelfQuerySet":
+        """Annotate each shelf with the `capacity`, `used_space` and `available_space` along its stacking axis.
+
+        All shelves are aggregated in a single grouped query, rather than one `Shelf.used_space()` call per shelf.
+        """
+        return self.annotate(
+            capacity=stacking_axis_size("dimensions"),
+            used_space=models.Sum(stacking_axis_size("physical_media_set__dimensions"), default=Decimal(0), output_field=SPACE_FIELD),
+            available_space=models.ExpressionWrapper(models.F("capacity") - models.F("used_space"), output_field=SPACE_FIELD),
+        )
+
+
 class Shelf(models.Model):
     """Represents a shelf in a bookcase."""
 
@@ -111,9 +327,28 @@ class Shelf(models.Model):
         choices=Orientation.choices,
         default=Orientation.VERTICAL,
     )
+    used_height = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal(0),
+        editable=False,
+        help_text="Total height in mm of the media on this shelf, maintained on write",
+    )
+    used_width = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal(0),
+        editable=False,
+        help_text="Total width in mm of the media on this shelf, maintained on write",
+    )
     physical_media_set: "RelatedManager['PhysicalMedia']"
 
+    objects = ShelfQuerySet.as_manager()
+
+    COUNTER_FIELDS = frozenset({"used_height", "used_width"})
+
     class Meta:  # noqa: D106
+        verbose_name_plural = "shelves"
         ordering = ("position_from_top",)
         constraints = (
             models.UniqueConstraint(
@@ -121,6 +356,7 @@ class Shelf(models.Model):
                 name="unique_shelf_position_from_top",
             ),
         )
+        indexes = (models.Index(fields=["position_from_top", "id"], name="shelf_keyset_idx"),)
 
     def __repr__(self) -> str:  # noqa: D105
         return f"<Shelf: {self.bookcase.name} - Shelf {self.position_from_top}>"
@@ -128,6 +364,16 @@ class Shelf(models.Model):
     def __str__(self) -> str:  # noqa: D105
         return f"{self.bookcase.name} - Shelf {self.position_from_top}"
 
+    def save(self, *, update_fields: Iterable[str] | None = None, **kwargs: Any) -> None:  # noqa: ANN401
+        """Save the shelf, leaving the used space counters alone unless they are named in `update_fields`.
+
+        The counters are maintained by queries as media are written, so this instance's copy of them may be stale, and
+        writing it back on a full save would undo updates made since the shelf was loaded.
+        """
+        if update_fields is None and not self._state.adding:
+            update_fields = [f.name for f in self._meta.concrete_fields if not f.primary_key and f.name not in self.COUNTER_FIELDS]
+        super().save(update_fields=update_fields, **kwargs)
+
     @property
     def stacking_axis(self) -> Literal["height", "width"]:
         """Get the dimension axis for stacking media based on shelf orientation."""
@@ -141,15 +387,18 @@ class Shelf(models.Model):
         media_depth = media.dimensions.depth
         return media_axis_size <= shelf_axis_size and media_depth <= shelf_depth
 
+    def can_fit_all_media(self, media: Iterable["PhysicalMedia"]) -> bool:
+        """Check if all the given media fit on this shelf together, ignoring whatever is on it now."""
+        axis = self.stacking_axis
+        shelf_size = Size.of(self.dimensions)
+        capacity = shelf_size.get_axis_size(axis)
+        media_sizes = [Size.of(m.dimensions) for m in media]
+        return all(s.depth <= shelf_size.depth for s in media_sizes) and sum(s.get_axis_size(axis) for s in media_sizes) <= capacity
+
     async def used_space(self) -> Decimal:
         """Return the amount of shelf space used up physical media."""
-        # If there are no physical media on the shelf, there's no used space
-        if not await self.physical_media_set.aexists():
-            return Decimal(0)
-
-        aggregation_field = f"dimensions__{self.stacking_axis}"
-        used: dict[str, Decimal] = await self.physical_media_set.select_related("dimensions").aaggregate(used_space=models.Sum(aggregation_field))
-        return used["used_space"]
+        # Read the maintained counter afresh by primary key, as this instance's copy may be stale
+        return await Shelf.objects.filter(pk=self.pk).values_list(f"used_{self.stacking_axis}", flat=True).aget()
 
     async def available_space(self) -> Decimal:
         """Return remaining space along stacking axis (height or width, depending on shelf orientation)."""
@@ -167,6 +416,63 @@ class Shelf(models.Model):
 
         return media_axis_size <= available_space
 
+    def has_room_for(self, media: "PhysicalMedia", replacing: "PhysicalMedia | None" = None) -> bool:
+        """Check as `can_accommodate` does, but against this instance's used space counters rather than reading them afresh.
+
+        Load the shelf with `select_for_update` inside the transaction placing the media, so its counters are current.
+
+        Args:
+            media: The media to place on the shelf.
+            replacing: The media as it was before being moved or resized, whose space is given back if it was on this shelf.
+
+        Returns:
+            bool: Whether the media fits.
+
+        """
+        return self.has_room_for_all([media], [] if replacing is None else [replacing])
+
+    def has_room_for_all(self, media: Iterable["PhysicalMedia"], replacing: Iterable["PhysicalMedia"] = ()) -> bool:
+        """Check as `has_room_for` does, for several media placed on this shelf together.
+
+        Args:
+            media: The media to place on the shelf.
+            replacing: The media as they were before being moved or resized, whose space is given back if they were on this shelf.
+
+        Returns:
+            bool: Whether all the media fit.
+
+        """
+        media = list(media)
+        if not all(self.can_fit_media(m) for m in media):
+            return False
+
+        axis = self.stacking_axis
+        available_space: Decimal = self.dimensions.get_axis_size(axis) - getattr(self, f"used_{axis}")
+        available_space += sum((r.dimensions.get_axis_size(axis) for r in replacing if r.shelf_id == self.id), Decimal(0))
+        return sum((m.dimensions.get_axis_size(axis) for m in media), Decimal(0)) <= available_space
+
+
+class BookcaseQuerySet(VersionedQuerySet["Bookcase"]):
+    """QuerySet loading whole bookcases at once."""
+
+    def with_tree(self) -> "BookcaseQuerySet":
+        """Prefetch every shelf, its media and their movies, with the dimensions and collections they refer to.
+
+        However many shelves and media there are, fetching bookcases costs four queries: the bookcases, their shelves
+        joined with their dimensions, the media on them joined with their dimensions and collections, and the movies.
+        """
+        return self.prefetch_related(
+            models.Prefetch("shelves", queryset=Shelf.objects.select_related("dimensions").order_by("position_from_top", "id")),
+            models.Prefetch(
+                "shelves__physical_media_set",
+                queryset=PhysicalMedia.objects.select_related("dimensions", "collection").order_by(
+                    models.F("position_on_shelf").asc(nulls_last=True),
+                    "id",
+                ),
+            ),
+            models.Prefetch("shelves__physical_media_set__movies", queryset=Movie.objects.order_by("id")),
+        )
+
 
 class Bookcase(models.Model):
     """Represents a physical bookcase/shelf where movies are stored."""
@@ -177,6 +483,8 @@ class Bookcase(models.Model):
     location = models.CharField(max_length=255)
     shelves: "RelatedManager['Shelf']"
 
+    objects = BookcaseQuerySet.as_manager()
+
     def __repr__(self) -> str:  # noqa: D105
         return f"<Bookcase: {self.name}>"
 
@@ -184,6 +492,82 @@ class Bookcase(models.Model):
         return self.name
 
 
+class MovieQuerySet(VersionedQuerySet["Movie"]):
+    """QuerySet with ranked title search for movies."""
+
+    def search(self, terms: str) -> "MovieQuerySet":
+        """Filter to movies whose title matches the search terms, best match first.
+
+        On PostgreSQL, titles match by full-text search on `search_vector` (web search syntax, e.g. `"the thing" -2011`)
+        or by trigram similarity, which tolerates typos. Both are served by GIN indexes, and results are ranked by text
+        rank then similarity. Other databases, such as the SQLite test backend, fall back to a case-insensitive substring
+        match in the default ordering, as `MovieFilter.title` does.
+        """
+        if connections[self.db].vendor != "postgresql":
+            return self.filter(title__icontains=terms)
+
+        query = SearchQuery(terms, config="english", search_type="websearch")
+        return (
+            self.filter(models.Q(search_vector=query) | models.Q(title__trigram_similar=terms))
+            .annotate(rank=SearchRank(models.F("search_vector"), query), similarity=TrigramSimilarity("title", terms))
+            .order_by("-rank", "-similarity", "id")
+        )
+
+    def upsert(self, movies: Sequence["Movie"], update_fields: Iterable[str]) -> list[tuple[int, bool]]:
+        """Insert the movies, or update the given fields of those already stored, with INSERT ... ON CONFLICT on `unique_movie`.
+
+        Each batch of movies is written by a single statement, so finding and then creating or updating a movie can't
+        race with other writers. Movies sharing a `unique_movie` key are written once, with the values of the last.
+
+        Args:
+            movies: The movies to insert or update.
+            update_fields: The fields to update on movies that already exist. With none, existing movies are left as they are.
+
+        Returns:
+            list[tuple[int, bool]]: The id of each movie in the order given, and whether it was created.
+
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        opts = Movie._meta  # noqa: SLF001
+        unique_fields = next(c for c in opts.constraints if isinstance(c, models.UniqueConstraint) and c.name == "unique_movie").fields
+        fields = [f for f in opts.concrete_fields if not f.primary_key and not f.generated]
+        columns = ", ".join(qn(f.column) for f in fields)
+        conflict = ", ".join(qn(opts.get_field(f).column) for f in unique_fields)
+        # Setting a key column to its own value leaves existing movies as they are, but still returns their ids
+        updates = ", ".join(f"{qn(column)} = EXCLUDED.{qn(column)}" for column in (opts.get_field(f).column for f in update_fields or unique_fields[:1]))
+
+        by_key = {tuple(getattr(m, f) for f in unique_fields): m for m in movies}
+        # Backends without a limit (e.g. PostgreSQL) take every movie in one statement
+        rows_per_statement = (connection.features.max_query_params or len(fields) * len(by_key)) // len(fields)
+        written: dict[tuple[Any, ...], tuple[int, bool]] = {}
+
+        with transaction.atomic(using=self.db), connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # Rows inserted, rather than updated, by the statement have no updating transaction in xmax
+                created_sql, created_params = "xmax = 0", []
+            else:
+                # Elsewhere (i.e. SQLite, whose writers are serialised) new rows are numbered past the highest id beforehand
+                created_sql, created_params = (
+                    f"{qn(opts.pk.column)} > %s",
+                    [Movie.objects.using(self.db).aggregate(max_id=Coalesce(models.Max("id"), 0))["max_id"]],
+                )
+
+            for batch in batched(by_key.items(), max(rows_per_statement, 1), strict=False):
+                values = ", ".join([f"({', '.join(['%s'] * len(fields))})"] * len(batch))
+                params = [f.get_db_prep_save(getattr(movie, f.attname), connection) for _, movie in batch for f in fields]
+                cursor.execute(
+                    f"INSERT INTO {qn(opts.db_table)} ({columns}) VALUES {values} "  # noqa: S608
+                    f"ON CONFLICT ({conflict}) DO UPDATE SET {updates} RETURNING {qn(opts.pk.column)}, {created_sql}",
+                    [*params, *created_params],
+                )
+                for (key, _), (pk, created) in zip(batch, cursor.fetchall(), strict=True):
+                    written[key] = (pk, bool(created))
+            bump_versions(Movie)
+
+        return [written[tuple(getattr(m, f) for f in unique_fields)] for m in movies]
+
+
 class Movie(models.Model):
     """Represents a movie linked to a TMDb profile."""
 
@@ -197,8 +581,15 @@ class Movie(models.Model):
     )
     letterboxd_uri = models.URLField()
     watched = models.BooleanField(default=False)
+    search_vector = models.GeneratedField(
+        expression=SearchVector("title", config="english"),
+        output_field=SearchVectorField(null=True),
+        db_persist=True,
+    )
     physical_media_set: "RelatedManager['PhysicalMedia']"
 
+    objects = MovieQuerySet.as_manager()
+
     class Meta:  # noqa: D106
         constraints = (
             models.UniqueConstraint(
@@ -214,6 +605,11 @@ class Movie(models.Model):
             "release_year",
             "title",
         )
+        indexes = (
+            models.Index(fields=["release_year", "title", "id"], name="movie_keyset_idx"),
+            GinIndex(fields=["search_vector"], name="movie_search_vector_idx"),
+            GinIndex(OpClass("title", name="gin_trgm_ops"), name="movie_title_trgm_idx"),
+        )
 
     def __lt__(self, other: "Movie") -> bool:  # noqa: D105
         return (self.release_year, self.title.lower()) < (other.release_year, other.title.lower())
@@ -251,6 +647,8 @@ class Collection(models.Model):
     name = models.CharField(max_length=255)
     physical_media_set: "RelatedManager['PhysicalMedia']"
 
+    objects = VersionedQuerySet["Collection"].as_manager()
+
     def __repr__(self) -> str:  # noqa: D105
         return f"<Collection: {self.name}>"
 
@@ -262,6 +660,91 @@ class Collection(models.Model):
         return Movie.objects.filter(physical_media_set__collection=self).distinct()
 
 
+ExpandableRelation = Literal["movies", "dimensions", "shelf", "collection"]
+
+
+class PhysicalMediaQuerySet(VersionedQuerySet["PhysicalMedia"]):
+    """QuerySet keeping the maintained Shelf used-space counters correct through bulk writes, which bypass signals."""
+
+    SPACE_FIELDS = frozenset({"shelf", "shelf_id", "dimensions", "dimensions_id"})
+
+    def expand(self, relations: Iterable[ExpandableRelation]) -> "PhysicalMediaQuerySet":
+        """Load the given relations up front, so listing many media costs a fixed number of queries.
+
+        Single-valued relations are joined in with `select_related`, and movies are fetched in one extra query with
+        `prefetch_related`, which `PhysicalMedia.__str__` also reuses instead of querying per media.
+        """
+        relations = set(relations)
+        queryset = self
+        # `select_related()` without arguments would follow every non-null foreign key
+        if joined := sorted(relations - {"movies"}):
+            queryset = queryset.select_related(*joined)
+        if "movies" in relations:
+            queryset = queryset.prefetch_related("movies")
+        return queryset
+
+    def _refresh_shelves(self, shelf_ids: Iterable[int | None]) -> None:
+        if shelf_ids := {shelf_id for shelf_id in shelf_ids if shelf_id is not None}:
+            Shelf.objects.using(self.db).filter(id__in=shelf_ids).refresh_used_space()
+
+    def update(self, **kwargs: Any) -> int:  # noqa: ANN401, D102
+        if self.SPACE_FIELDS.isdisjoint(kwargs):
+            return super().update(**kwargs)
+
+        with transaction.atomic(using=self.db):
+            before = dict(self.values_list("id", "shelf_id"))
+            rows = super().update(**kwargs)
+            after = PhysicalMedia.objects.using(self.db).filter(id__in=before).values_list("shelf_id", flat=True)
+            self._refresh_shelves([*before.values(), *after])
+        return rows
+
+    def bulk_update(self, objs: Iterable["PhysicalMedia"], fields: Sequence[str], batch_size: int | None = None) -> int:  # noqa: D102
+        if self.SPACE_FIELDS.isdisjoint(fields):
+            return super().bulk_update(objs, fields, batch_size=batch_size)
+
+        objs = list(objs)
+        with transaction.atomic(using=self.db):
+            before = list(PhysicalMedia.objects.using(self.db).filter(id__in=[o.id for o in objs]).values_list("shelf_id", flat=True))
+            rows = super().bulk_update(objs, fields, batch_size=batch_size)
+            self._refresh_shelves([*before, *(o.shelf_id for o in objs)])
+        return rows
+
+    def bulk_create(self, objs: Iterable["PhysicalMedia"], *args: Any, **kwargs: Any) -> list["PhysicalMedia"]:  # noqa: ANN401, D102
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            self._refresh_shelves(o.shelf_id for o in created)
+        return created
+
+    def bulk_create_with_movies(self, objs: Sequence[tuple["PhysicalMedia", Iterable[int]]], batch_size: int | None = None) -> list["PhysicalMedia"]:
+        """Create physical media along with the ids of their movies, inserting the media then their movie links in batches.
+
+        A movie id given more than once for a media is linked once.
+
+        Returns:
+            list[PhysicalMedia]: The media created, in the order given, with their ids set.
+
+        """
+        through = PhysicalMedia.movies.through
+        with transaction.atomic(using=self.db):
+            created = self.bulk_create([media for media, _ in objs], batch_size=batch_size)
+            links = [
+                through(physicalmedia_id=media.id, movie_id=movie_id)
+                for media, (_, movie_ids) in zip(created, objs, strict=True)
+                for movie_id in dict.fromkeys(movie_ids)
+            ]
+            through.objects.using(self.db).bulk_create(links, batch_size=batch_size)
+            # Bulk inserted links don't send m2m_changed
+            bump_versions(through, Movie)
+        return created
+
+    def delete_returning(self, *fields: str) -> list[tuple[Any, ...]]:  # noqa: D102
+        # Deletes don't send post_delete, which would otherwise free the media's space on their shelves
+        with transaction.atomic(using=self.db):
+            rows = super().delete_returning("shelf_id", *(fields or ("id",)))
+            self._refresh_shelves(shelf_id for shelf_id, *_ in rows)
+        return [tuple(row) for _, *row in rows]
+
+
 class PhysicalMedia(models.Model):
     """A physical copy of one or more movies (e.g., a DVD, Blu-ray)."""
 
@@ -296,7 +779,11 @@ class PhysicalMedia(models.Model):
     )
     notes = models.TextField(blank=True)
 
+    objects = PhysicalMediaQuerySet.as_manager()
+
     class Meta:  # noqa: D106
+        # Related managers (e.g. `shelf.physical_media_set.aadd()`) write through the base manager, so it must keep shelf counters up to date too
+        base_manager_name = "objects"
         ordering = ("shelf__position_from_top", "position_on_shelf")
         verbose_name = "Physical Media"
         verbose_name_plural = "Physical Media"
@@ -307,6 +794,7 @@ class PhysicalMedia(models.Model):
                 condition=~models.Q(position_on_shelf=None),
             ),
         )
+        indexes = (models.Index(fields=["shelf", "position_on_shelf", "id"], name="physical_media_keyset_idx"),)
 
     def __repr__(self) -> str:  # noqa: D105
         movie_titles = ", ".join(f"{m.title} ({m.release_year})" for m in self.movies.all())
@@ -314,3 +802,17 @@ class PhysicalMedia(models.Model):
 
     def __str__(self) -> str:  # noqa: D105
         return ", ".join(f"{m.title} ({m.release_year})" for m in self.movies.all())
+
+
+class IdempotencyKey(models.Model):
+    """A POST request sent with an `Idempotency-Key` header, and its response to replay if the request is retried."""
+
+    digest = models.CharField(primary_key=True, max_length=64, help_text="SHA-256 of the route and the key")
+    request_digest = models.CharField(max_length=64, help_text="SHA-256 of the request body, so a key reused for a different request is rejected")
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, help_text="Null while the request is still being handled")
+    content = models.BinaryField(default=b"")
+    content_type = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self) -> str:  # noqa: D105
+        return self.digest
@@ -0,0 +1,244 @@
+"""Automatic organisation of physical media onto shelves, based on shelf and case dimensions."""
+
+import math
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+from enum import StrEnum
+from typing import Literal
+
+from django.db.models import Q
+
+from movie_database.fixed_point import Size
+from movie_database.models import PhysicalMedia, Shelf
+from movie_database.positioning import Placement, apply_placements
+
+
+@dataclass(slots=True)
+class ShelfSpace:
+    """In-memory view of a shelf's capacity while media are being packed onto it, in hundredths of a mm."""
+
+    id: int
+    axis: Literal["height", "width"]
+    capacity: int
+    depth: int
+    used: int = 0
+    media_ids: list[int] = field(default_factory=list)
+
+    @classmethod
+    def from_shelf(cls, shelf: Shelf) -> "ShelfSpace":
+        """Build from a Shelf, which should have its `dimensions` already loaded."""
+        size = Size.of(shelf.dimensions)
+        return cls(id=shelf.id, axis=shelf.stacking_axis, capacity=size.get_axis_size(shelf.stacking_axis), depth=size.depth)
+
+    def try_place(self, media_id: int, size: Size) -> bool:
+        """Place a media case of the given size at the end of this shelf if it fits, mirroring `Shelf.can_accommodate`."""
+        axis_size = size.get_axis_size(self.axis)
+        if size.depth > self.depth or self.used + axis_size > self.capacity:
+            return False
+        self.used += axis_size
+        self.media_ids.append(media_id)
+        return True
+
+
+class ShelfOrganiser:
+    """Packs physical media onto shelves entirely in memory, using first-fit-decreasing.
+
+    Shelves are filled in bookcase and `position_from_top` order. Media are taken largest first, and each one goes
+    onto the first shelf with enough depth and enough room left along the shelf's stacking axis.
+    """
+
+    def __init__(self, shelves: Iterable[Shelf], media: Iterable[PhysicalMedia]) -> None:
+        """Initialise with shelves and media that already have their `dimensions` loaded."""
+        self.shelves = list(shelves)
+        self.media = {m.id: m for m in media}
+
+    @classmethod
+    def from_database(cls) -> "ShelfOrganiser":
+        """Load every shelf and physical media, along with their dimensions, in two queries."""
+        shelves = Shelf.objects.select_related("dimensions").order_by("bookcase_id", "position_from_top")
+        media = PhysicalMedia.objects.select_related("dimensions").order_by("id")
+        return cls(shelves, media)
+
+    def plan(self) -> list[Placement]:
+        """Return a placement for every physical media, without touching the database."""
+        spaces = [ShelfSpace.from_shelf(shelf) for shelf in self.shelves]
+
+        # Many media share the same case dimensions, so each case is only converted once
+        case_sizes: dict[int, Size] = {}
+        sizes: dict[int, Size] = {}
+        for media_id, media in self.media.items():
+            if (size := case_sizes.get(media.dimensions_id)) is None:
+                size = case_sizes[media.dimensions_id] = Size.of(media.dimensions)
+            sizes[media_id] = size
+        largest_first = sorted(sizes.items(), key=lambda item: (-max(item[1].height, item[1].width), -item[1].depth, item[0]))
+
+        unplaced = [
+            Placement(media_id=media_id, shelf_id=None, position_on_shelf=None)
+            for media_id, size in largest_first
+            if not any(space.try_place(media_id, size) for space in spaces)
+        ]
+
+        placed = [
+            Placement(media_id=media_id, shelf_id=space.id, position_on_shelf=position)
+            for space in spaces
+            for position, media_id in enumerate(space.media_ids, start=1)
+        ]
+        return placed + unplaced
+
+    def apply(self, placements: Iterable[Placement]) -> list[PhysicalMedia]:
+        """Write placements back to the database, returning the physical media that moved.
+
+        Only moved media are written, in a single transaction via `apply_placements`.
+        """
+        moves: list[Placement] = []
+        moved: list[PhysicalMedia] = []
+        for placement in placements:
+            media = self.media[placement.media_id]
+            if (media.shelf_id, media.position_on_shelf) != (placement.shelf_id, placement.position_on_shelf):
+                media.shelf_id = placement.shelf_id
+                media.position_on_shelf = placement.position_on_shelf
+                moves.append(placement)
+                moved.append(media)
+
+        apply_placements(moves)
+        return moved
+
+
+@dataclass(frozen=True, slots=True)
+class MediaChange:
+    """A single physical media added to, removed from or resized on a shelf, already saved to the database."""
+
+    class Kind(StrEnum):
+        """What happened to the physical media."""
+
+        ADDED = "added"
+        REMOVED = "removed"
+        RESIZED = "resized"
+
+    kind: Kind
+    media_id: int
+    shelf_id: int
+
+
+class NeighbourhoodOrganiser:
+    """Re-packs only the shelf affected by a single change, and the shelves directly above and below it in its bookcase.
+
+    Media keep their current order, by shelf then `position_on_shelf`, with an added media going at the end of its
+    shelf. Of every way of splitting that order across the shelves that fits, as in `Shelf.can_accommodate`, the one
+    moving the fewest media is chosen. Media on these shelves without a position stay put but still take up room.
+    The work depends only on how much these shelves hold, not on the size of the whole collection.
+    """
+
+    def __init__(self, shelves: Sequence[Shelf], media: Iterable[PhysicalMedia], change: MediaChange) -> None:
+        """Initialise with shelves in top to bottom order and the media on them, all with their `dimensions` loaded."""
+        self.shelves = list(shelves)
+        self.media = {m.id: m for m in media}
+        self.change = change
+
+    @classmethod
+    def from_database(cls, change: MediaChange) -> "NeighbourhoodOrganiser":
+        """Load the changed shelf, its neighbours and their media, along with their dimensions, in four queries."""
+        shelves = Shelf.objects.select_related("dimensions")
+        shelf = shelves.get(id=change.shelf_id)
+        siblings = shelves.filter(bookcase_id=shelf.bookcase_id)
+        above = siblings.filter(position_from_top__lt=shelf.position_from_top).order_by("-position_from_top").first()
+        below = siblings.filter(position_from_top__gt=shelf.position_from_top).order_by("position_from_top").first()
+        neighbourhood = [s for s in (above, shelf, below) if s is not None]
+
+        on_shelves = Q(shelf__in=neighbourhood)
+        if change.kind == MediaChange.Kind.ADDED:
+            on_shelves |= Q(id=change.media_id)
+        media = PhysicalMedia.objects.select_related("dimensions").filter(on_shelves).order_by("id")
+        return cls(neighbourhood, media, change)
+
+    def plan(self) -> list[Placement]:
+        """Return placements for only the media that need to move, without touching the database.
+
+        If the added or resized media can't fit anywhere in the neighbourhood, it alone is left unplaced instead.
+        """
+        shelf_ids = [s.id for s in self.shelves]
+        spaces = [ShelfSpace.from_shelf(shelf) for shelf in self.shelves]
+        sizes = {media_id: Size.of(media.dimensions) for media_id, media in self.media.items()}
+
+        changed = self.media.get(self.change.media_id)
+        appended = (
+            changed is not None
+            and self.change.kind == MediaChange.Kind.ADDED
+            and (changed.shelf_id != self.change.shelf_id or changed.position_on_shelf is None)
+        )
+
+        on_shelves = [m for m in self.media.values() if m.shelf_id in shelf_ids and not (appended and m.id == self.change.media_id)]
+        for media in on_shelves:
+            if media.position_on_shelf is None:
+                space = spaces[shelf_ids.index(media.shelf_id)]
+                space.used += sizes[media.id].get_axis_size(space.axis)
+        positioned = sorted((m for m in on_shelves if m.position_on_shelf is not None), key=lambda m: (shelf_ids.index(m.shelf_id), m.position_on_shelf))
+        ordered = [m.id for m in positioned]
+
+        if appended:
+            target = shelf_ids.index(self.change.shelf_id)
+            after = max((i + 1 for i, media_id in enumerate(ordered) if shelf_ids.index(self.media[media_id].shelf_id) <= target), default=0)
+            ordered.insert(after, self.change.media_id)
+
+        unplaced: list[Placement] = []
+        layout = self._pack(ordered, spaces, sizes)
+        if layout is None and changed is not None and self.change.kind != MediaChange.Kind.REMOVED:
+            unplaced = [Placement(media_id=changed.id, shelf_id=None, position_on_shelf=None)]
+            layout = self._pack([media_id for media_id in ordered if media_id != changed.id], spaces, sizes)
+        if layout is None:
+            return unplaced
+
+        return [
+            p for p in layout if (self.media[p.media_id].shelf_id, self.media[p.media_id].position_on_shelf) != (p.shelf_id, p.position_on_shelf)
+        ] + unplaced
+
+    def _pack(self, ordered: list[int], spaces: list[ShelfSpace], sizes: dict[int, Size]) -> list[Placement] | None:
+        """Split media across shelves in order, moving as few as possible, or return None if they can't all fit.
+
+        `best[s][start]` is the fewest moves needed to place `ordered[start:]` on shelves `s` onwards. Extending a
+        shelf's run one media at a time only adds to its used space and moves, so every split is scored in O(n^2).
+        """
+        count = len(ordered)
+        best = [[math.inf] * (count + 1) for _ in range(len(spaces) + 1)]
+        best[len(spaces)][count] = 0
+        ends = [[count] * (count + 1) for _ in range(len(spaces))]
+
+        for s in reversed(range(len(spaces))):
+            space = spaces[s]
+            for start in range(count + 1):
+                used, moves, position = space.used, 0, 0
+                for end in range(start, count + 1):
+                    if moves + best[s + 1][end] < best[s][start]:
+                        best[s][start], ends[s][start] = moves + best[s + 1][end], end
+                    if end == count:
+                        break
+                    size = sizes[ordered[end]]
+                    used += size.get_axis_size(space.axis)
+                    if size.depth > space.depth or used > space.capacity:
+                        break
+                    position, moved = self._position(ordered[end], space.id, position)
+                    moves += moved
+
+        if best[0][0] == math.inf:
+            return None
+
+        layout: list[Placement] = []
+        start = 0
+        for s, space in enumerate(spaces):
+            position = 0
+            for media_id in ordered[start : ends[s][start]]:
+                position, _ = self._position(media_id, space.id, position)
+                layout.append(Placement(media_id=media_id, shelf_id=space.id, position_on_shelf=position))
+            start = ends[s][start]
+        return layout
+
+    def _position(self, media_id: int, shelf_id: int, previous: int) -> tuple[int, bool]:
+        """Return where a media goes after the one at `previous` on a shelf, keeping its current position if it can, and whether it moved."""
+        media = self.media[media_id]
+        if media.shelf_id == shelf_id and media.position_on_shelf is not None and media.position_on_shelf > previous:
+            return media.position_on_shelf, False
+        return previous + 1, True
+
+    def apply(self, placements: Iterable[Placement]) -> None:
+        """Write the planned moves back to the database in a single transaction, via `apply_placements`."""
+        apply_placements(list(placements))
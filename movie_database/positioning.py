@@ -0,0 +1,89 @@
+"""Set-based writes of where physical media are stored (`shelf` and `position_on_shelf`)."""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from itertools import batched
+
+from django.db import connection, transaction
+from django.db.models import QuerySet
+
+from movie_database.models import PhysicalMedia, Shelf
+from movie_database.response_cache import bump_versions
+
+
+@dataclass(frozen=True, slots=True)
+class Placement:
+    """Where a single physical media should be stored. Unplaced media have no shelf or position."""
+
+    media_id: int
+    shelf_id: int | None
+    position_on_shelf: int | None
+
+
+def apply_placements(placements: Sequence[Placement]) -> None:
+    """Move physical media to their new shelves and positions in one transaction, with a single UPDATE ... FROM (VALUES ...).
+
+    `unique_position_on_shelf` is a partial unique constraint, which can't be deferred, and is checked row by row. So
+    positions are cleared first, letting media swap places within a shelf. The used space counters of every shelf that
+    media moved off or on to are then refreshed.
+    """
+    if not placements:
+        return
+
+    table = connection.ops.quote_name(PhysicalMedia._meta.db_table)  # noqa: SLF001
+    media_ids = [p.media_id for p in placements]
+    # Three parameters per row. Backends without a limit (e.g. PostgreSQL) take every row in one statement
+    rows_per_statement = (connection.features.max_query_params or 3 * len(placements)) // 3
+
+    with transaction.atomic():
+        previous_shelf_ids = set(PhysicalMedia.objects.filter(id__in=media_ids).values_list("shelf_id", flat=True))
+        PhysicalMedia.objects.filter(id__in=media_ids).update(position_on_shelf=None)
+
+        with connection.cursor() as cursor:
+            for batch in batched(placements, rows_per_statement, strict=False):
+                values = ", ".join(["(CAST(%s AS INTEGER), CAST(%s AS INTEGER), CAST(%s AS INTEGER))"] * len(batch))
+                params = [value for p in batch for value in (p.media_id, p.shelf_id, p.position_on_shelf)]
+                cursor.execute(
+                    f"UPDATE {table} SET shelf_id = placement.column2, position_on_shelf = placement.column3 "  # noqa: S608
+                    f"FROM (VALUES {values}) AS placement WHERE {table}.id = placement.column1",
+                    params,
+                )
+
+        shelf_ids = (previous_shelf_ids | {p.shelf_id for p in placements}) - {None}
+        Shelf.objects.filter(id__in=shelf_ids).refresh_used_space()
+
+
+def _renumber_statement(shelf_ids_sql: str, *, shift_above_current: bool) -> str:
+    """Build an UPDATE renumbering positions with ROW_NUMBER(), touching only media whose position changes."""
+    table = connection.ops.quote_name(PhysicalMedia._meta.db_table)  # noqa: SLF001
+    shift = "MAX(position_on_shelf) OVER (PARTITION BY shelf_id)" if shift_above_current else "0"
+    return (
+        f"UPDATE {table} SET position_on_shelf = ranked.new_position + ranked.shift "  # noqa: S608
+        "FROM ("
+        "SELECT id, position_on_shelf AS current_position, "
+        "ROW_NUMBER() OVER (PARTITION BY shelf_id ORDER BY position_on_shelf) AS new_position, "
+        f"{shift} AS shift "
+        f"FROM {table} WHERE position_on_shelf IS NOT NULL AND shelf_id IN ({shelf_ids_sql})"
+        ") AS ranked "
+        f"WHERE {table}.id = ranked.id AND ranked.current_position <> ranked.new_position"
+    )
+
+
+def compact_positions(shelves: QuerySet[Shelf]) -> int:
+    """Close the gaps in `position_on_shelf` on the given shelves, keeping media in the same order.
+
+    Media are renumbered 1, 2, 3... per shelf by a window-function UPDATE, without loading them. Only media after the
+    first gap on each shelf move, and they only ever move down. `unique_position_on_shelf` is checked row by row, so
+    they are first moved clear of every existing position on their shelf, then down into place, by the same statement.
+
+    Returns:
+        int: The number of physical media renumbered.
+
+    """
+    shelf_ids_sql, params = shelves.order_by().values("id").query.sql_with_params()
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        bump_versions(PhysicalMedia)
+        cursor.execute(_renumber_statement(shelf_ids_sql, shift_above_current=True), params)
+        cursor.execute(_renumber_statement(shelf_ids_sql, shift_above_current=False), params)
+        return cursor.rowcount
@@ -0,0 +1,148 @@
+"""Versioned response cache for read endpoints, invalidated exactly by writes to the models they read.
+
+Every model has a version number in the cache, bumped whenever its rows are written. Cached responses are keyed by
+route, query string and the current version of every model the route reads, so a write makes every stale response
+unreachable at once, without having to find and delete them, and they simply expire.
+
+The same key doubles as a strong ETag, so clients revalidating with `If-None-Match` get a `304 Not Modified` from the
+version lookup alone, without the response being queried, serialised or even read from the cache.
+
+Responses are only cached when `settings.RESPONSE_CACHE` is on, which by default it only is with a cache backend
+shared between processes. Works with any Django cache backend. With several worker processes it must be shared, for
+versions bumped by one worker to be seen by the others, and should increment atomically, e.g. Redis or Memcached.
+The file-based and database backends increment with a separate read and write, and the file-based one culls the
+version keys like any other entry.
+"""
+
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from functools import wraps
+from hashlib import sha256
+from http import HTTPStatus
+from typing import Any
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import models, transaction
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
+from django.http.response import HttpResponseBase
+from django.utils.http import parse_etags, quote_etag
+
+type Run = Callable[..., Awaitable[HttpResponseBase]]
+
+STATS = ("hits", "misses", "not_modified")
+
+
+def _version_key(model: type[models.Model]) -> str:
+    return f"movie_database:version:{model._meta.label_lower}"  # noqa: SLF001
+
+
+def _stats_key(stat: str) -> str:
+    return f"movie_database:response_cache:{stat}"
+
+
+def _initial_version() -> int:
+    # Start from the clock rather than 0, so a version evicted from the cache can't return to a value it held before
+    return time.time_ns()
+
+
+def bump_versions(*changed: type[models.Model]) -> None:
+    """Invalidate every cached response that read any of the given models, once the current transaction commits.
+
+    Bumping on commit stops a response read before the commit from being cached under the new version. Call it after
+    the write, in the same atomic block: outside one, it bumps straight away.
+    """
+
+    def bump() -> None:
+        for model in set(changed):
+            try:
+                cache.incr(_version_key(model))
+            except ValueError:
+                cache.add(_version_key(model), _initial_version(), timeout=None)
+
+    transaction.on_commit(bump)
+
+
+async def _versions(read: Iterable[type[models.Model]]) -> list[int]:
+    keys = [_version_key(model) for model in read]
+    versions = await cache.aget_many(keys)
+    if missing := [key for key in keys if key not in versions]:
+        for key in missing:
+            await cache.aadd(key, _initial_version(), timeout=None)
+        versions |= await cache.aget_many(missing)
+    return [versions[key] for key in keys]
+
+
+async def _response_digest(request: HttpRequest, read: Iterable[type[models.Model]]) -> str:
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    versions = ",".join(str(v) for v in await _versions(read))
+    return sha256(f"{request.path}?{query}|{versions}".encode()).hexdigest()
+
+
+async def _count(stat: str) -> None:
+    try:
+        await cache.aincr(_stats_key(stat))
+    except ValueError:
+        await cache.aadd(_stats_key(stat), 1, timeout=None)
+
+
+def response_cache_stats() -> dict[str, int]:
+    """Return the number of cache hits, misses and `304 Not Modified` responses across every cached route, since they were last reset."""
+    stats = cache.get_many([_stats_key(stat) for stat in STATS])
+    return {stat: stats.get(_stats_key(stat), 0) for stat in STATS}
+
+
+def reset_response_cache_stats() -> None:
+    """Reset every count to zero."""
+    cache.delete_many([_stats_key(stat) for stat in STATS])
+
+
+def cache_response(*read: type[models.Model], timeout: float | None = DEFAULT_TIMEOUT) -> Callable[[Run], Run]:
+    """Cache an async operation's successful GET responses until any of the models it reads is written to, and tag them with an ETag.
+
+    Apply with `ninja.decorators.decorate_view`, so the response is cached after pagination and serialisation.
+
+    Args:
+        read: Every model the operation's response is built from.
+        timeout: How long in seconds to keep responses, defaulting to the cache backend's own timeout.
+
+    Returns:
+        Callable: A view decorator.
+
+    """
+
+    def decorator(run: Run) -> Run:
+        @wraps(run)
+        async def cached_run(request: HttpRequest, *args: Any, **kwargs: Any) -> HttpResponseBase:  # noqa: ANN401
+            if request.method != "GET" or not settings.RESPONSE_CACHE:
+                return await run(request, *args, **kwargs)
+
+            # Versions are read before the response is built, so a write committed meanwhile can't be cached as current
+            digest = await _response_digest(request, read)
+            etag = quote_etag(digest)
+            if etag in parse_etags(request.headers.get("If-None-Match", "")):
+                await _count("not_modified")
+                response = HttpResponseNotModified()
+                response["ETag"] = etag
+                return response
+
+            key = f"movie_database:response:{digest}"
+            if (cached := await cache.aget(key)) is not None:
+                await _count("hits")
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response["ETag"] = etag
+                return response
+
+            await _count("misses")
+            response = await run(request, *args, **kwargs)
+            if response.status_code == HTTPStatus.OK and isinstance(response, HttpResponse):
+                await cache.aset(key, (response.content, response["Content-Type"]), timeout)
+                response["ETag"] = etag
+            return response
+
+        return cached_run
+
+    return decorator
@@ -1,6 +1,8 @@
-from typing import Annotated
+from decimal import Decimal
+from typing import Annotated, Any, Literal, Self
 
-from ninja import Field, FilterSchema, ModelSchema
+from ninja import Field, FilterSchema, ModelSchema, Schema
+from pydantic import create_model, field_validator, model_validator
 
 import movie_database.models as movie_models
 
@@ -49,6 +51,68 @@ class ShelfIn(ShelfBase):  # noqa: D101
     pass
 
 
+class ShelfOccupancyOut(ShelfOut):
+    """Space along a shelf's stacking axis, in mm."""
+
+    bookcase_id: int
+    capacity: Decimal
+    used_space: Decimal
+    available_space: Decimal
+
+
+class CandidateShelfOut(ShelfOut):
+    """A shelf that can take a physical media, with the space in mm left along its stacking axis once it has."""
+
+    bookcase_id: int
+    remaining_space: Decimal
+
+
+class ShelfLayoutIn(Schema):
+    """The physical media to store on a shelf, in order from position 1."""
+
+    physical_media_ids: list[int]
+
+    @field_validator("physical_media_ids")
+    @classmethod
+    def check_unique(cls, physical_media_ids: list[int]) -> list[int]:  # noqa: D102
+        if len(set(physical_media_ids)) != len(physical_media_ids):
+            msg = "Physical media can only appear once in a shelf layout"
+            raise ValueError(msg)
+        return physical_media_ids
+
+
+class ShelfLayoutOut(ShelfLayoutIn):
+    """A shelf's new layout, along with the physical media taken off it because they weren't in the layout."""
+
+    removed_physical_media_ids: list[int]
+
+
+class ShelvePhysicalMediaIn(Schema):
+    """The shelf to add a physical media to."""
+
+    shelf_id: int
+
+
+class PlacementOut(Schema):
+    """Where a physical media has been moved to."""
+
+    physical_media_id: int
+    shelf_id: int | None
+    position_on_shelf: int | None
+
+
+class ShelvePhysicalMediaOut(Schema):
+    """Every physical media moved to make room for one added to a shelf, including the added one itself."""
+
+    moves: list[PlacementOut]
+
+
+class CompactPositionsOut(Schema):
+    """The number of physical media renumbered to close gaps in their shelf positions."""
+
+    renumbered: int
+
+
 class MediaCaseDimensionBase(ModelSchema):  # noqa: D101
     class Meta:  # noqa: D106
         model = movie_models.MediaCaseDimension
@@ -63,6 +127,16 @@ class MediaCaseDimensionIn(MediaCaseDimensionBase):  # noqa: D101
     pass
 
 
+class MediaCaseCapacityOut(MediaCaseDimensionOut):
+    """A media case dimension, with how many more cases of it would fit on the shelves asked about."""
+
+    spare_capacity: int
+
+
+class MediaCaseCapacityFilter(FilterSchema):  # noqa: D101
+    media_format: Annotated[movie_models.MediaCaseDimension.Format | None, Field(None, alias="format")]
+
+
 class MediaCaseDimensionFilter(FilterSchema):  # noqa: D101
     title: IContainsField
     release_year: int | None = Field(None)
@@ -96,18 +170,244 @@ class MovieIn(MovieBase):  # noqa: D101
     pass
 
 
+class UpsertOptions(Schema):
+    """Which fields to update on movies that already exist, by default every field outside `unique_movie`, e.g. `?update=watched`."""
+
+    update: list[Literal["watched"]] = Field(default_factory=lambda: ["watched"])
+
+
+class UpsertOut(Schema):
+    """The ids of the movies upserted, in the order given, and how many were created and how many already existed."""
+
+    ids: list[int]
+    created: int
+    updated: int
+
+
 class PhysicalMediaBase(ModelSchema):  # noqa: D101
     class Meta:  # noqa: D106
         model = movie_models.PhysicalMedia
         fields = ("position_on_shelf", "notes")
 
 
-class PhysicalMediaOut(PhysicalMediaBase):  # noqa: D101
+class PhysicalMediaRow(PhysicalMediaBase):
+    """A physical media with the ids of its relations, serialisable straight from `.values()` rows."""
+
     id: int
+    shelf_id: int | None
+    dimensions_id: int
+    collection_id: int | None
 
 
-class PhysicalMediaIn(PhysicalMediaBase):  # noqa: D101
-    pass
+class PhysicalMediaOut(PhysicalMediaRow):
+    """A physical media with the ids of its relations, and those relations in full where they have been loaded up front."""
+
+    movies: list[MovieOut] | None = None
+    dimensions: MediaCaseDimensionOut | None = None
+    shelf: ShelfOut | None = None
+    collection: CollectionOut | None = None
+
+    # Relations are only serialised if they were loaded by `PhysicalMediaQuerySet.expand`, so serialising never queries
+    @staticmethod
+    def resolve_movies(obj: movie_models.PhysicalMedia) -> list[movie_models.Movie] | None:  # noqa: D102
+        return list(obj.movies.all()) if "movies" in getattr(obj, "_prefetched_objects_cache", {}) else None
+
+    @staticmethod
+    def resolve_dimensions(obj: movie_models.PhysicalMedia) -> movie_models.MediaCaseDimension | None:  # noqa: D102
+        return obj.dimensions if movie_models.PhysicalMedia.dimensions.field.is_cached(obj) else None
+
+    @staticmethod
+    def resolve_shelf(obj: movie_models.PhysicalMedia) -> movie_models.Shelf | None:  # noqa: D102
+        return obj.shelf if movie_models.PhysicalMedia.shelf.field.is_cached(obj) else None
+
+    @staticmethod
+    def resolve_collection(obj: movie_models.PhysicalMedia) -> movie_models.Collection | None:  # noqa: D102
+        return obj.collection if movie_models.PhysicalMedia.collection.field.is_cached(obj) else None
+
+
+class PhysicalMediaTreeOut(PhysicalMediaRow):
+    """A physical media in a bookcase tree, with its case dimensions, collection and movies."""
+
+    dimensions: MediaCaseDimensionOut
+    collection: CollectionOut | None
+    movies: list[MovieOut]
+
+    @staticmethod
+    def resolve_movies(obj: movie_models.PhysicalMedia) -> list[movie_models.Movie]:  # noqa: D102
+        return list(obj.movies.all())
+
+
+class ShelfTreeOut(ShelfOut):
+    """A shelf in a bookcase tree, with its dimensions and the physical media on it in order."""
+
+    dimensions: ShelfDimensionOut
+    physical_media: list[PhysicalMediaTreeOut]
+
+    @staticmethod
+    def resolve_physical_media(obj: movie_models.Shelf) -> list[movie_models.PhysicalMedia]:  # noqa: D102
+        return list(obj.physical_media_set.all())
+
+
+class BookcaseTreeOut(BookcaseOut):
+    """A whole bookcase: its shelves from the top down, the physical media on each, and the movies on each media."""
+
+    shelves: list[ShelfTreeOut]
+
+    @staticmethod
+    def resolve_shelves(obj: movie_models.Bookcase) -> list[movie_models.Shelf]:  # noqa: D102
+        return list(obj.shelves.all())
+
+
+class PhysicalMediaExpand(Schema):
+    """Relations of a physical media to include in full, e.g. `?expand=movies,shelf`."""
+
+    expand: set[movie_models.ExpandableRelation] = Field(default_factory=set)
+
+    @field_validator("expand", mode="before")
+    @classmethod
+    def split_commas(cls, value: str | list[str]) -> set[str]:  # noqa: D102
+        values = value if isinstance(value, list) else [value]
+        return {relation for v in values for relation in v.split(",") if relation}
+
+
+class BulkOptions(Schema):
+    """How to insert a bulk create, e.g. `?batch_size=200` rows per INSERT statement."""
+
+    batch_size: int = Field(500, gt=0, le=5000)
+
+
+class ExportOptions(Schema):
+    """How to stream an export, as newline-delimited JSON objects (the default) or CSV rows, e.g. `?format=csv`."""
+
+    format: Literal["ndjson", "csv"] = "ndjson"
+
+
+class BatchIds(Schema):
+    """Ids of objects to fetch in one request, in the order to return them, e.g. `?ids=3,1,2`."""
+
+    ids: Annotated[list[int], Field(max_length=100)] | None = None
+
+    @field_validator("ids", mode="before")
+    @classmethod
+    def split_commas(cls, value: str | list[str]) -> list[str]:  # noqa: D102
+        values = value if isinstance(value, list) else [value]
+        return [i for v in values for i in v.split(",") if i]
+
+
+class Fieldset(Schema):
+    """Fields to limit a response to, e.g. `?fields=id,title`. Every field is included by default."""
+
+    fields: set[str] = Field(default_factory=set)
+
+    @field_validator("fields", mode="before")
+    @classmethod
+    def split_commas(cls, value: str | list[str]) -> set[str]:  # noqa: D102
+        values = value if isinstance(value, list) else [value]
+        return {field for v in values for field in v.split(",") if field}
+
+
+def fieldset(schema: type[Schema]) -> type[Fieldset]:
+    """Build a `Fieldset` accepting only the names of the schema's fields, so unknown fields are rejected with a 422."""
+    names = Literal[tuple(schema.model_fields)]  # pyright: ignore[reportInvalidTypeForm]
+    return create_model(f"{schema.__name__}Fieldset", __base__=Fieldset, fields=(set[names], Field(default_factory=set)))
+
+
+def sparse(schema: type[Schema]) -> type[Schema]:
+    """Build a copy of the schema with every field optional, for responses limited by a `Fieldset` or partial updates.
+
+    Routes responding with it should set `exclude_unset=True`, so fields left out of the response are omitted rather than null.
+    """
+    fields = {name: (field.annotation | None, None) for name, field in schema.model_fields.items()}
+    return create_model(f"Sparse{schema.__name__}", __base__=Schema, **fields)  # pyright: ignore[reportCallIssue, reportArgumentType]
+
+
+BookcaseFieldset, SparseBookcaseOut = fieldset(BookcaseOut), sparse(BookcaseOut)
+CollectionFieldset, SparseCollectionOut = fieldset(CollectionOut), sparse(CollectionOut)
+MovieFieldset, SparseMovieOut = fieldset(MovieOut), sparse(MovieOut)
+ShelfFieldset, SparseShelfOut = fieldset(ShelfOut), sparse(ShelfOut)
+
+
+class PhysicalMediaIn(PhysicalMediaBase):
+    """A physical media to create, with its relations by id."""
+
+    dimensions_id: int
+    shelf_id: int | None = None
+    collection_id: int | None = None
+    movie_ids: list[int] = Field(default_factory=list)
+
+
+def partial(schema: type[Schema]) -> type[Schema]:
+    """Build a copy of an input schema with every field optional, for partial updates.
+
+    Unlike `sparse`, fields keep their types and constraints, so null is only accepted where the schema itself accepts
+    it. Dump with `exclude_unset=True` to get just the fields given.
+    """
+    # The empty `Field()` keeps `Annotated` valid for fields without any constraints
+    fields = {name: (Annotated[field.annotation, *field.metadata, Field()], None) for name, field in schema.model_fields.items()}
+    return create_model(f"Partial{schema.__name__}", __base__=Schema, **fields)  # pyright: ignore[reportCallIssue, reportArgumentType]
+
+
+PartialPhysicalMediaIn = partial(PhysicalMediaIn)
+
+
+class BatchOperationIn(Schema):
+    """One create, update or delete in a batch.
+
+    Creates can be named by `ref`, and later operations can then use `"$<ref>"` wherever an id is expected, as their
+    `id` or in the `*_id` and `*_ids` fields of their `data`, e.g.
+    `{"op": "create", "resource": "physical_media", "data": {"movie_ids": ["$alien"]}}`.
+    """
+
+    op: Literal["create", "update", "delete"]
+    resource: Literal["bookcase", "collection", "movie", "physical_media"]
+    ref: str | None = None
+    id: int | str | None = None
+    data: dict[str, Any] = Field(default_factory=dict)
+
+    @model_validator(mode="after")
+    def check_op_fields(self) -> Self:  # noqa: D102
+        if self.op == "create" and self.id is not None:
+            msg = "Creates can't take an id"
+            raise ValueError(msg)
+        if self.op != "create" and (self.id is None or self.ref is not None):
+            msg = "Updates and deletes take an id, and can't take a ref"
+            raise ValueError(msg)
+        return self
+
+
+class BatchIn(Schema):
+    """Operations to run in order in a single transaction. If any fails, none of them take effect."""
+
+    operations: list[BatchOperationIn] = Field(min_length=1, max_length=1000)
+
+
+class BatchOperationOut(Schema):
+    """The id of the object an operation created, updated or deleted."""
+
+    op: Literal["create", "update", "delete"]
+    resource: Literal["bookcase", "collection", "movie", "physical_media"]
+    id: int
+
+
+class BatchOut(Schema):
+    """The result of every operation in a batch, in order, and the ids of the objects created with a `ref`."""
+
+    results: list[BatchOperationOut]
+    refs: dict[str, int]
+
+
+class PhysicalMediaFilter(FilterSchema):
+    """Which physical media to act on, e.g. `?shelf=3`."""
+
+    shelf: Annotated[int | None, Field(None, q="shelf_id")]
+    collection: Annotated[int | None, Field(None, q="collection_id")]
+    dimensions: Annotated[int | None, Field(None, q="dimensions_id")]
+
+
+class ShelfFilter(FilterSchema):
+    """Which shelves to act on, e.g. `?bookcase=2`."""
+
+    bookcase: Annotated[int | None, Field(None, q="bookcase_id")]
 
 
 class MovieFilter(FilterSchema):  # noqa: D101
@@ -0,0 +1,110 @@
+"""Signal handlers keeping the denormalised `Shelf.used_height` and `Shelf.used_width` counters in step with writes.
+
+Writes to any model also invalidate the cached API responses that read it. Bulk writes bypass these signals, and are
+instead handled by `PhysicalMediaQuerySet` and `VersionedQuerySet`.
+"""
+
+from decimal import Decimal
+from typing import Any
+
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from movie_database.models import MediaCaseDimension, PhysicalMedia, PhysicalMediaQuerySet, Shelf
+from movie_database.response_cache import bump_versions
+
+# Attribute on a PhysicalMedia instance holding its (shelf_id, dimensions_id) as stored before the current save
+PREVIOUS_PLACEMENT_ATTR = "_previous_placement"
+
+
+def shift_used_space(shelf_id: int | None, dimensions_id: int, sign: int) -> None:
+    """Add (sign=1) or remove (sign=-1) one media case's size to/from a shelf's counters, in a single atomic UPDATE."""
+    if shelf_id is None:
+        return
+
+    case = MediaCaseDimension.objects.filter(pk=dimensions_id)
+    Shelf.objects.filter(pk=shelf_id).update(
+        used_height=models.F("used_height") + models.Subquery(case.values("height")) * Decimal(sign),
+        used_width=models.F("used_width") + models.Subquery(case.values("width")) * Decimal(sign),
+    )
+
+
+@receiver(pre_save, sender=PhysicalMedia)
+def remember_previous_placement(
+    sender: type[PhysicalMedia],  # noqa: ARG001
+    instance: PhysicalMedia,
+    raw: bool,  # noqa: FBT001
+    update_fields: frozenset[str] | None,
+    **kwargs: Any,  # noqa: ANN401, ARG001
+) -> None:
+    """Record which shelf and case a physical media had before it is saved, so its space can be moved on post_save."""
+    if raw or instance._state.adding:  # noqa: SLF001
+        previous = None
+    elif update_fields is not None and PhysicalMediaQuerySet.SPACE_FIELDS.isdisjoint(update_fields):
+        previous = (instance.shelf_id, instance.dimensions_id)
+    else:
+        previous = PhysicalMedia.objects.filter(pk=instance.pk).values_list("shelf_id", "dimensions_id").first()
+    setattr(instance, PREVIOUS_PLACEMENT_ATTR, previous)
+
+
+@receiver(post_save, sender=PhysicalMedia)
+def update_used_space_on_save(
+    sender: type[PhysicalMedia],  # noqa: ARG001
+    instance: PhysicalMedia,
+    raw: bool,  # noqa: FBT001
+    **kwargs: Any,  # noqa: ANN401, ARG001
+) -> None:
+    """Move a physical media's space from its previous shelf to its current one, if either shelf or case changed."""
+    previous: tuple[int | None, int] | None = getattr(instance, PREVIOUS_PLACEMENT_ATTR, None)
+    current = (instance.shelf_id, instance.dimensions_id)
+    if raw or previous == current:
+        return
+
+    with transaction.atomic():
+        if previous is not None:
+            shift_used_space(*previous, sign=-1)
+        shift_used_space(*current, sign=1)
+    setattr(instance, PREVIOUS_PLACEMENT_ATTR, current)
+
+
+@receiver(post_delete, sender=PhysicalMedia)
+def update_used_space_on_delete(sender: type[PhysicalMedia], instance: PhysicalMedia, **kwargs: Any) -> None:  # noqa: ANN401, ARG001
+    """Free a deleted physical media's space on its shelf."""
+    shift_used_space(instance.shelf_id, instance.dimensions_id, sign=-1)
+
+
+@receiver(post_save, sender=MediaCaseDimension)
+def refresh_used_space_on_dimension_change(
+    sender: type[MediaCaseDimension],  # noqa: ARG001
+    instance: MediaCaseDimension,
+    created: bool,  # noqa: FBT001
+    **kwargs: Any,  # noqa: ANN401, ARG001
+) -> None:
+    """Recompute the counters of every shelf holding media of a case size that has been edited."""
+    if not created:
+        Shelf.objects.filter(id__in=PhysicalMedia.objects.filter(dimensions=instance).values("shelf_id")).refresh_used_space()
+
+
+@receiver(post_save)
+def invalidate_cached_responses_on_save(sender: type[models.Model], **kwargs: Any) -> None:  # noqa: ANN401, ARG001
+    """Invalidate cached responses that read a model one of whose rows has been saved."""
+    if sender._meta.app_label == "movie_database":  # noqa: SLF001
+        bump_versions(sender)
+
+
+@receiver(post_delete)
+def invalidate_cached_responses_on_delete(sender: type[models.Model], **kwargs: Any) -> None:  # noqa: ANN401, ARG001
+    """Invalidate cached responses that read a model one of whose rows has been deleted, or any model pointing at it.
+
+    Rows pointing at the deleted row may have been updated by the database (e.g. SET_NULL) without sending signals.
+    """
+    if sender._meta.app_label == "movie_database":  # noqa: SLF001
+        bump_versions(sender, *(relation.related_model for relation in sender._meta.related_objects))  # noqa: SLF001
+
+
+@receiver(m2m_changed)
+def invalidate_cached_responses_on_m2m_change(sender: type[models.Model], instance: models.Model, model: type[models.Model], **kwargs: Any) -> None:  # noqa: ANN401, ARG001
+    """Invalidate cached responses that read either side of a many-to-many relation that has been changed."""
+    if sender._meta.app_label == "movie_database":  # noqa: SLF001
+        bump_versions(sender, type(instance), model)
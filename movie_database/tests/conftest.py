@@ -1,9 +1,14 @@
 import random
-from collections.abc import Awaitable, Sequence
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from contextlib import asynccontextmanager
 from decimal import Decimal
-from typing import Protocol
+from typing import Any, Protocol
 
+import pytest
 import pytest_asyncio
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connection
 
 from movie_database.models import Bookcase, Collection, MediaCaseDimension, Movie, PhysicalMedia, Shelf, ShelfDimension
 
@@ -77,6 +82,42 @@ class ShelfDimensionCreator(Protocol):  # noqa: D101
     ) -> Awaitable[ShelfDimension]: ...
 
 
+@pytest.fixture(autouse=True)
+def clear_cache() -> None:
+    """Start every test with an empty cache, so API responses cached by one test can't be served in another."""
+    cache.clear()
+
+
+@asynccontextmanager
+async def capture_queries() -> AsyncIterator[list[str]]:
+    """Record the SQL of every query the async ORM runs inside the block, e.g. while an async view handles a request.
+
+    Connections are per thread, and the async ORM runs queries on a single shared worker thread, so the recorder is
+    installed on that thread's connection. Unlike `django_assert_num_queries`, this works in async tests.
+
+    Yields:
+        list[str]: The SQL of each query, in order, filled in as they run.
+
+    """
+    queries: list[str] = []
+
+    def record(execute: Callable[..., Any], sql: str, params: Any, many: bool, context: dict[str, Any]) -> Any:  # noqa: ANN401, FBT001
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def install() -> None:
+        connection.execute_wrappers.append(record)
+
+    def uninstall() -> None:
+        connection.execute_wrappers.remove(record)
+
+    await sync_to_async(install)()
+    try:
+        yield queries
+    finally:
+        await sync_to_async(uninstall)()
+
+
 @pytest_asyncio.fixture
 async def make_bookcase() -> BookcaseCreator:
     """Make a bookcase.
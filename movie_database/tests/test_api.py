@@ -1,15 +1,31 @@
+import csv
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
 from typing import TYPE_CHECKING
 
 import pytest
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.http import StreamingHttpResponse
+from django.test import override_settings
 from django.test.client import AsyncClient
+from django.utils import timezone
+from ninja.renderers import JSONRenderer
 
-from movie_database.tests.conftest import MovieCreator
+from movie_database import response_cache
+from movie_database.api.pagination import KeysetPagination
+from movie_database.api.renderers import FastJSONRenderer
+from movie_database.idempotency import TTL
+from movie_database.models import Bookcase, Collection, IdempotencyKey, MediaCaseDimension, Movie, PhysicalMedia, Shelf
+from movie_database.response_cache import response_cache_stats
+from movie_database.tests.conftest import MovieCreator, capture_queries
+from movie_database.tests.test_models import abake
 
 if TYPE_CHECKING:
     from django.http import HttpResponse
 
-    from movie_database.models import Movie
-
 
 class TestListMovies:
     """Test the list_movies API endpoint."""
@@ -21,7 +37,7 @@ class TestListMovies:
         response: HttpResponse = await async_client.get("/api/v1/movie_database/movies/?limit=100&offset=0")
 
         assert response.status_code == 200
-        assert response.json() == {"items": [], "count": 0}
+        assert response.json() == {"items": [], "count": 0, "next_cursor": None}
 
     @pytest.mark.asyncio
     @pytest.mark.django_db(transaction=True)
@@ -46,4 +62,1298 @@ class TestListMovies:
                 {"id": movie5.pk, "title": "Movie 5", "release_year": 2025, "watched": movie5.watched, "letterboxd_uri": movie5.letterboxd_uri},
             ],
             "count": 5,
+            "next_cursor": None,
+        }
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_cursor_pages_follow_ordering_and_ignore_earlier_inserts(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """Following `next_cursor` walks movies by (release_year, title, id), unaffected by movies added before the cursor."""
+        await make_movie("B", "2020")
+        await make_movie("A", "2021")
+        await make_movie("A", "2020")
+        await make_movie("C", "2019")
+
+        first: HttpResponse = await async_client.get("/api/v1/movie_database/movies/?limit=2")
+        assert [(m["release_year"], m["title"]) for m in first.json()["items"]] == [(2019, "C"), (2020, "A")]
+
+        await make_movie("Z", "1990")
+        async with capture_queries() as queries:
+            second: HttpResponse = await async_client.get(f"/api/v1/movie_database/movies/?limit=2&cursor={first.json()['next_cursor']}")
+        assert [(m["release_year"], m["title"]) for m in second.json()["items"]] == [(2020, "B"), (2021, "A")]
+        assert second.json()["next_cursor"] is None
+        # Only the first page is counted
+        assert first.json()["count"] == 4
+        assert second.json()["count"] is None
+        assert not any("COUNT(" in sql for sql in queries)
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_search_falls_back_to_substring_match(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """Without PostgreSQL, search matches titles case-insensitively in the default ordering."""
+        await make_movie("The Godfather Part II", "1974")
+        await make_movie("The Godfather", "1972")
+        await make_movie("Goodfellas", "1990")
+
+        response: HttpResponse = await async_client.get("/api/v1/movie_database/movies/?search=godfather")
+
+        assert [m["title"] for m in response.json()["items"]] == ["The Godfather", "The Godfather Part II"]
+
+    @pytest.mark.skipif(connection.vendor != "postgresql", reason="Full-text and trigram search need PostgreSQL")
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_search_is_ranked_and_typo_tolerant(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """Full-text matches are ranked first, and a misspelt title still matches by trigram similarity."""
+        await make_movie("The Godfather Part II", "1974")
+        await make_movie("The Godfather", "1972")
+        await make_movie("Goodfellas", "1990")
+
+        exact: HttpResponse = await async_client.get("/api/v1/movie_database/movies/?search=godfather")
+        typo: HttpResponse = await async_client.get("/api/v1/movie_database/movies/?search=goodfelas")
+
+        assert exact.json()["items"][0]["title"] == "The Godfather"
+        assert [m["title"] for m in typo.json()["items"]] == ["Goodfellas"]
+
+    @pytest.mark.django_db
+    def test_sync_pages_match_async_pages(self):
+        """The sync path walks the same keyset pages, for use from sync views."""
+        Movie.objects.bulk_create(
+            Movie(title=title, release_year=year, letterboxd_uri="", watched=False) for title, year in [("B", 2020), ("A", 2021), ("C", 2019)]
+        )
+        paginator = KeysetPagination(ordering=("release_year", "title", "id"))
+        queryset = Movie.objects.all()
+
+        first = paginator.paginate_queryset(queryset, KeysetPagination.Input(limit=2, offset=0), None)  # pyright: ignore[reportArgumentType]
+        cursor = KeysetPagination.Input(limit=2, offset=0, cursor=first["next_cursor"])
+        second = paginator.paginate_queryset(queryset, cursor, None)  # pyright: ignore[reportArgumentType]
+
+        assert [m.title for m in first["items"]] == ["C", "B"]
+        assert (first["count"], second["count"]) == (3, None)
+        assert [m.title for m in second["items"]] == ["A"]
+        assert second["next_cursor"] is None
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_invalid_cursor_is_rejected(self, async_client: AsyncClient):
+        """A cursor that wasn't handed out by the API is a bad request."""
+        response: HttpResponse = await async_client.get("/api/v1/movie_database/movies/?cursor=not-a-cursor")
+
+        assert response.status_code == 400
+
+
+class TestBookcaseOccupancy:
+    """Test the bookcase occupancy API endpoints."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_occupancy_uses_stacking_axis_of_each_shelf(self, async_client: AsyncClient):
+        """Vertical shelves are measured by media height and horizontal shelves by media width."""
+        bookcase: Bookcase = await abake(Bookcase)
+        vertical: Shelf = await abake(
+            Shelf,
+            bookcase=bookcase,
+            position_from_top=1,
+            orientation=Shelf.Orientation.VERTICAL,
+            dimensions__height=300,
+            dimensions__width=200,
+        )
+        horizontal: Shelf = await abake(
+            Shelf,
+            bookcase=bookcase,
+            position_from_top=2,
+            orientation=Shelf.Orientation.HORIZONTAL,
+            dimensions__height=300,
+            dimensions__width=200,
+        )
+        await abake(PhysicalMedia, shelf=vertical, position_on_shelf=1, dimensions__height=Decimal("12.50"), dimensions__width=100)
+        await abake(PhysicalMedia, shelf=vertical, position_on_shelf=2, dimensions__height=Decimal("14.25"), dimensions__width=100)
+        await abake(PhysicalMedia, shelf=horizontal, position_on_shelf=1, dimensions__height=100, dimensions__width=Decimal("15.00"))
+
+        response: HttpResponse = await async_client.get(f"/api/v1/movie_database/bookcase/{bookcase.id}/occupancy")
+
+        assert response.status_code == 200
+        assert [(s["id"], Decimal(s["capacity"]), Decimal(s["used_space"]), Decimal(s["available_space"])) for s in response.json()["items"]] == [
+            (vertical.id, 300, Decimal("26.75"), Decimal("273.25")),
+            (horizontal.id, 200, 15, 185),
+        ]
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_empty_shelf_has_no_used_space(self, async_client: AsyncClient):
+        """A shelf without media reports its whole stacking axis as available."""
+        shelf: Shelf = await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=150)
+
+        response: HttpResponse = await async_client.get("/api/v1/movie_database/bookcase/occupancy")
+
+        assert response.status_code == 200
+        [occupancy] = response.json()["items"]
+        assert occupancy["id"] == shelf.id
+        assert occupancy["bookcase_id"] == shelf.bookcase_id
+        assert (Decimal(occupancy["capacity"]), Decimal(occupancy["used_space"]), Decimal(occupancy["available_space"])) == (150, 0, 150)
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_missing_bookcase_returns_404(self, async_client: AsyncClient):
+        """Requesting occupancy of a non-existent bookcase returns 404."""
+        response: HttpResponse = await async_client.get("/api/v1/movie_database/bookcase/999/occupancy")
+
+        assert response.status_code == 404
+
+
+class TestPhysicalMediaCandidateShelves:
+    """Test the physical media candidate shelves API endpoint."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_candidate_shelves_sorted_by_best_fit(self, async_client: AsyncClient):
+        """Only shelves with room are returned, tightest fit first."""
+        roomy: Shelf = await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=500, dimensions__depth=20)
+        snug: Shelf = await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=150, dimensions__depth=20)
+        await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=500, dimensions__depth=10)
+        media: PhysicalMedia = await abake(PhysicalMedia, shelf=None, dimensions__width=Decimal("128.50"), dimensions__depth=12)
+
+        response: HttpResponse = await async_client.get(f"/api/v1/movie_database/physical_media/{media.id}/candidate_shelves")
+
+        assert response.status_code == 200
+        assert [(s["id"], Decimal(s["remaining_space"])) for s in response.json()["items"]] == [
+            (snug.id, Decimal("21.50")),
+            (roomy.id, Decimal("371.50")),
+        ]
+
+
+class TestListShelves:
+    """Test the list_shelves API endpoint."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_shelves_are_listed_top_to_bottom(self, async_client: AsyncClient):
+        """Shelves follow their position from the top, as in `Shelf.Meta.ordering`, not the order they were added in."""
+        bookcase: Bookcase = await abake(Bookcase)
+        lower: Shelf = await abake(Shelf, bookcase=bookcase, position_from_top=2)
+        upper: Shelf = await abake(Shelf, bookcase=bookcase, position_from_top=1)
+
+        response: HttpResponse = await async_client.get("/api/v1/movie_database/shelves/")
+
+        assert [s["id"] for s in response.json()["items"]] == [upper.id, lower.id]
+
+
+class TestShelfLayout:
+    """Test the shelf layout API endpoint."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_layout_swaps_positions_and_removes_unlisted_media(self, async_client: AsyncClient):
+        """Media are renumbered in the given order, and media on the shelf but not in the layout are taken off it."""
+        shelf: Shelf = await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=500, dimensions__depth=20)
+        first: PhysicalMedia = await abake(PhysicalMedia, shelf=shelf, position_on_shelf=1, dimensions__width=100, dimensions__depth=14)
+        second: PhysicalMedia = await abake(PhysicalMedia, shelf=shelf, position_on_shelf=2, dimensions__width=100, dimensions__depth=14)
+        unlisted: PhysicalMedia = await abake(PhysicalMedia, shelf=shelf, position_on_shelf=3, dimensions__width=100, dimensions__depth=14)
+        incoming: PhysicalMedia = await abake(PhysicalMedia, shelf=None, dimensions__width=100, dimensions__depth=14)
+
+        response: HttpResponse = await async_client.post(
+            f"/api/v1/movie_database/shelves/{shelf.id}/layout",
+            {"physical_media_ids": [second.id, incoming.id, first.id]},
+            content_type="application/json",
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {"physical_media_ids": [second.id, incoming.id, first.id], "removed_physical_media_ids": [unlisted.id]}
+        layout = [(m.id, m.position_on_shelf) async for m in PhysicalMedia.objects.filter(shelf=shelf).order_by("position_on_shelf")]
+        assert layout == [(second.id, 1), (incoming.id, 2), (first.id, 3)]
+        await unlisted.arefresh_from_db()
+        assert (unlisted.shelf_id, unlisted.position_on_shelf) == (None, None)
+        await shelf.arefresh_from_db()
+        assert shelf.used_width == 300
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_layout_that_does_not_fit_is_rejected(self, async_client: AsyncClient):
+        """A layout wider than the shelf is rejected without moving anything."""
+        shelf: Shelf = await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=150, dimensions__depth=20)
+        media: list[PhysicalMedia] = await abake(PhysicalMedia, shelf=None, dimensions__width=100, dimensions__depth=14, _quantity=2)
+
+        response: HttpResponse = await async_client.post(
+            f"/api/v1/movie_database/shelves/{shelf.id}/layout",
+            {"physical_media_ids": [m.id for m in media]},
+            content_type="application/json",
+        )
+
+        assert response.status_code == 422
+        assert not await shelf.physical_media_set.aexists()
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_layout_with_duplicate_media_is_rejected(self, async_client: AsyncClient):
+        """The same physical media can't be in two positions."""
+        shelf: Shelf = await abake(Shelf)
+        media: PhysicalMedia = await abake(PhysicalMedia, shelf=None)
+
+        response: HttpResponse = await async_client.post(
+            f"/api/v1/movie_database/shelves/{shelf.id}/layout",
+            {"physical_media_ids": [media.id, media.id]},
+            content_type="application/json",
+        )
+
+        assert response.status_code == 422
+
+
+class TestCompactPositions:
+    """Test the shelf and bookcase compaction API endpoints."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_compact_shelf_closes_gaps_keeping_order(self, async_client: AsyncClient):
+        """Sparse positions are renumbered from 1 in their existing order."""
+        shelf: Shelf = await abake(Shelf)
+        media = [await abake(PhysicalMedia, shelf=shelf, position_on_shelf=position) for position in (2, 3, 5, 9)]
+        unpositioned: PhysicalMedia = await abake(PhysicalMedia, shelf=shelf, position_on_shelf=None)
+
+        response: HttpResponse = await async_client.post(f"/api/v1/movie_database/shelves/{shelf.id}/compact")
+
+        assert response.status_code == 200
+        assert response.json() == {"renumbered": 4}
+        layout = [
+            (m.id, m.position_on_shelf) async for m in PhysicalMedia.objects.filter(shelf=shelf).exclude(position_on_shelf=None).order_by("position_on_shelf")
+        ]
+        assert layout == [(m.id, position) for position, m in enumerate(media, start=1)]
+        await unpositioned.arefresh_from_db()
+        assert unpositioned.position_on_shelf is None
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_compact_bookcase_only_touches_its_shelves(self, async_client: AsyncClient):
+        """Every shelf in the bookcase is compacted independently, and other bookcases are left alone."""
+        bookcase: Bookcase = await abake(Bookcase)
+        top: Shelf = await abake(Shelf, bookcase=bookcase, position_from_top=1)
+        bottom: Shelf = await abake(Shelf, bookcase=bookcase, position_from_top=2)
+        elsewhere: Shelf = await abake(Shelf)
+        await abake(PhysicalMedia, shelf=top, position_on_shelf=4)
+        await abake(PhysicalMedia, shelf=bottom, position_on_shelf=1)
+        await abake(PhysicalMedia, shelf=bottom, position_on_shelf=7)
+        await abake(PhysicalMedia, shelf=elsewhere, position_on_shelf=3)
+
+        response: HttpResponse = await async_client.post(f"/api/v1/movie_database/bookcase/{bookcase.id}/compact")
+
+        assert response.json() == {"renumbered": 2}
+        positions = [(m.shelf_id, m.position_on_shelf) async for m in PhysicalMedia.objects.order_by("shelf_id", "position_on_shelf")]
+        assert positions == [(top.id, 1), (bottom.id, 1), (bottom.id, 2), (elsewhere.id, 3)]
+
+
+class TestShelvePhysicalMedia:
+    """Test the shelve_physical_media API endpoint."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_shelve_moves_only_what_is_needed(self, async_client: AsyncClient):
+        """A new media on a full shelf goes onto the next shelf down, and shelves further away are left alone."""
+        bookcase: Bookcase = await abake(Bookcase)
+        shelves: list[Shelf] = [
+            await abake(
+                Shelf,
+                bookcase=bookcase,
+                position_from_top=position,
+                orientation=Shelf.Orientation.HORIZONTAL,
+                dimensions__width=200,
+                dimensions__depth=20,
+            )
+            for position in (1, 2, 3)
+        ]
+        for shelf, position in ((shelves[0], 1), (shelves[0], 2), (shelves[1], 2)):
+            await abake(PhysicalMedia, shelf=shelf, position_on_shelf=position, dimensions__width=100, dimensions__depth=14)
+        incoming: PhysicalMedia = await abake(PhysicalMedia, shelf=None, dimensions__width=100, dimensions__depth=14)
+
+        response: HttpResponse = await async_client.post(
+            f"/api/v1/movie_database/physical_media/{incoming.id}/shelve",
+            {"shelf_id": shelves[0].id},
+            content_type="application/json",
+        )
+
+        assert response.status_code == 200
+        assert response.json() == {"moves": [{"physical_media_id": incoming.id, "shelf_id": shelves[1].id, "position_on_shelf": 1}]}
+        await shelves[1].arefresh_from_db()
+        assert shelves[1].used_width == 200
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_shelve_without_room_is_rejected(self, async_client: AsyncClient):
+        """A media that fits neither the shelf nor its neighbours is rejected, leaving it unplaced."""
+        shelf: Shelf = await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=150, dimensions__depth=20)
+        incoming: PhysicalMedia = await abake(PhysicalMedia, shelf=None, dimensions__width=200, dimensions__depth=14)
+
+        response: HttpResponse = await async_client.post(
+            f"/api/v1/movie_database/physical_media/{incoming.id}/shelve",
+            {"shelf_id": shelf.id},
+            content_type="application/json",
+        )
+
+        assert response.status_code == 422
+        await incoming.arefresh_from_db()
+        assert incoming.shelf_id is None
+
+
+class TestMediaCaseCapacity:
+    """Test the shelf, bookcase and library-wide media case capacity API endpoints."""
+
+    @pytest.fixture
+    async def library(self) -> dict[str, Shelf | MediaCaseDimension]:
+        """Two bookcases with a part-filled shelf each, and a Blu-ray and a deeper VHS case."""
+        bluray: MediaCaseDimension = await abake(MediaCaseDimension, media_format=MediaCaseDimension.Format.BLURAY, width="12.5", height="170", depth="135")
+        vhs: MediaCaseDimension = await abake(MediaCaseDimension, media_format=MediaCaseDimension.Format.VHS, width="25", height="200", depth="190")
+        # 100 - 12.5 leaves room for 7 more Blu-rays, but the shelf is too shallow for VHS
+        shallow: Shelf = await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=100, dimensions__depth=150)
+        await abake(PhysicalMedia, shelf=shallow, position_on_shelf=1, dimensions=bluray)
+        # Vertical shelves stack by height: 1000 - 200 leaves room for 4 VHS or 4 Blu-rays
+        tall: Shelf = await abake(Shelf, orientation=Shelf.Orientation.VERTICAL, dimensions__height=1000, dimensions__depth=200)
+        await abake(PhysicalMedia, shelf=tall, position_on_shelf=1, dimensions=vhs)
+        return {"bluray": bluray, "vhs": vhs, "shallow": shallow, "tall": tall}
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_shelf_capacity(self, async_client: AsyncClient, library: dict):
+        """Each case dimension is counted against the shelf's remaining space and depth."""
+        response: HttpResponse = await async_client.get(f"/api/v1/movie_database/shelves/{library['shallow'].id}/capacity")
+
+        assert response.status_code == 200
+        assert {item["id"]: item["spare_capacity"] for item in response.json()["items"]} == {library["bluray"].id: 7, library["vhs"].id: 0}
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_bookcase_capacity(self, async_client: AsyncClient, library: dict):
+        """Only the bookcase's own shelves are counted."""
+        response: HttpResponse = await async_client.get(f"/api/v1/movie_database/bookcase/{library['tall'].bookcase_id}/capacity")
+
+        assert {item["id"]: item["spare_capacity"] for item in response.json()["items"]} == {library["bluray"].id: 4, library["vhs"].id: 4}
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_library_capacity_filtered_by_format(self, async_client: AsyncClient, library: dict):
+        """Spare capacity is summed across every shelf, and `format` limits which case dimensions are returned."""
+        response: HttpResponse = await async_client.get("/api/v1/movie_database/shelves/capacity?format=BD")
+
+        assert response.status_code == 200
+        assert [(item["id"], item["spare_capacity"]) for item in response.json()["items"]] == [(library["bluray"].id, 11)]
+
+
+class TestListPhysicalMedia:
+    """Test the list_physical_medias API endpoint."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_cursor_pages_sort_unshelved_media_last(self, async_client: AsyncClient):
+        """Media are walked by shelf position from the top then position on shelf, with media not on a shelf at the end."""
+        bottom: Shelf = await abake(Shelf, position_from_top=2)
+        top: Shelf = await abake(Shelf, position_from_top=1)
+        expected = [
+            await abake(PhysicalMedia, shelf=top, position_on_shelf=1),
+            await abake(PhysicalMedia, shelf=top, position_on_shelf=2),
+            await abake(PhysicalMedia, shelf=bottom, position_on_shelf=1),
+            await abake(PhysicalMedia, shelf=bottom, position_on_shelf=None),
+            await abake(PhysicalMedia, shelf=None),
+            await abake(PhysicalMedia, shelf=None),
+        ]
+
+        seen: list[int] = []
+        url = "/api/v1/movie_database/physical_media/?limit=2"
+        while url:
+            page = (await async_client.get(url)).json()
+            seen += [m["id"] for m in page["items"]]
+            url = page["next_cursor"] and f"/api/v1/movie_database/physical_media/?limit=2&cursor={page['next_cursor']}"
+
+        assert seen == [m.id for m in expected]
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_expand_serves_a_page_in_constant_queries(self, async_client: AsyncClient):
+        """Expanding every relation costs the page, its count and one movies prefetch, however many media there are."""
+        shelf: Shelf = await abake(Shelf)
+        for position in range(1, 6):
+            media: PhysicalMedia = await abake(PhysicalMedia, shelf=shelf, position_on_shelf=position, collection=None)
+            await media.movies.aadd(*await abake(Movie, _quantity=2))
+
+        async with capture_queries() as queries:
+            response: HttpResponse = await async_client.get("/api/v1/movie_database/physical_media/?expand=movies,dimensions,shelf,collection")
+
+        assert len(queries) == 3
+        items = response.json()["items"]
+        assert len(items) == 5
+        assert all(len(item["movies"]) == 2 for item in items)
+        assert items[0]["shelf"] == {"id": shelf.id, "position_from_top": shelf.position_from_top, "orientation": shelf.orientation}
+        assert items[0]["dimensions"]["id"] == items[0]["dimensions_id"]
+        assert items[0]["collection"] is None
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_relations_are_not_expanded_by_default(self, async_client: AsyncClient):
+        """Without `expand` only the ids of relations are returned."""
+        media: PhysicalMedia = await abake(PhysicalMedia, shelf=None, collection=None)
+
+        response: HttpResponse = await async_client.get(f"/api/v1/movie_database/physical_media/{media.id}")
+
+        assert response.json() == {
+            "id": media.id,
+            "position_on_shelf": None,
+            "notes": media.notes,
+            "shelf_id": None,
+            "dimensions_id": media.dimensions_id,
+            "collection_id": None,
+            "movies": None,
+            "dimensions": None,
+            "shelf": None,
+            "collection": None,
+        }
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_unknown_expansion_is_rejected(self, async_client: AsyncClient):
+        """Only the relations of a physical media can be expanded."""
+        media: PhysicalMedia = await abake(PhysicalMedia)
+
+        response: HttpResponse = await async_client.get(f"/api/v1/movie_database/physical_media/{media.id}?expand=movies,owner")
+
+        assert response.status_code == 422
+
+
+class TestResponseCache:
+    """Test caching of read endpoint responses, and their invalidation by writes."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_repeated_request_is_served_without_queries(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """The second identical request is answered from the cache."""
+        await make_movie("Alien", "1979")
+        first: HttpResponse = await async_client.get("/api/v1/movie_database/movies/")
+
+        async with capture_queries() as queries:
+            second: HttpResponse = await async_client.get("/api/v1/movie_database/movies/")
+
+        assert queries == []
+        assert second.json() == first.json()
+        assert second["Content-Type"] == first["Content-Type"]
+        assert await sync_to_async(response_cache_stats)() == {"hits": 1, "misses": 1, "not_modified": 0}
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_query_parameters_are_part_of_the_key(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """Requests differing only in query parameters are cached separately, whatever order the parameters are in."""
+        await make_movie("Alien", "1979")
+        await make_movie("Aliens", "1986")
+
+        one: HttpResponse = await async_client.get("/api/v1/movie_database/movies/?limit=1&offset=0")
+        two: HttpResponse = await async_client.get("/api/v1/movie_database/movies/?limit=2")
+        reordered: HttpResponse = await async_client.get("/api/v1/movie_database/movies/?offset=0&limit=1")
+
+        assert len(one.json()["items"]) == 1
+        assert len(two.json()["items"]) == 2
+        assert reordered.json() == one.json()
+        assert await sync_to_async(response_cache_stats)() == {"hits": 1, "misses": 2, "not_modified": 0}
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_write_invalidates_cached_responses(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """Saving, relating or bulk updating a model invalidates every cached response that read it."""
+        movie = await make_movie("Alien", "1979")
+        media: PhysicalMedia = await abake(PhysicalMedia, shelf=None)
+        movie_url = f"/api/v1/movie_database/movies/{movie.id}"
+        media_url = f"/api/v1/movie_database/movies/{movie.id}/physical_media"
+        await async_client.get(movie_url)
+        assert (await async_client.get(media_url)).json()["items"] == []
+
+        movie.title = "Aliens"
+        await movie.asave()
+        await movie.physical_media_set.aadd(media)
+        assert (await async_client.get(movie_url)).json()["title"] == "Aliens"
+        assert [m["id"] for m in (await async_client.get(media_url)).json()["items"]] == [media.id]
+
+        await PhysicalMedia.objects.filter(id=media.id).aupdate(notes="Director's cut")
+        assert (await async_client.get(media_url)).json()["items"][0]["notes"] == "Director's cut"
+
+    @pytest.mark.django_db(transaction=True)
+    def test_bulk_writes_bump_versions_after_writing(self, monkeypatch: pytest.MonkeyPatch):
+        """In autocommit, a bulk write's rows are already visible when its version is bumped."""
+        seen: list[int] = []
+        version_key = response_cache._version_key  # noqa: SLF001
+        monkeypatch.setattr(response_cache, "_version_key", lambda model: seen.append(Movie.objects.count()) or version_key(model))
+
+        Movie.objects.bulk_create([Movie(title="Alien", release_year=1979, letterboxd_uri="", watched=False)])
+        Movie.objects.update(watched=True)
+
+        assert seen
+        assert set(seen) == {1}
+        assert Movie.objects.get().watched
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_disabled_cache_serves_every_request_afresh(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """With `RESPONSE_CACHE` off, e.g. for a per-process cache behind several workers, responses aren't cached or tagged."""
+        await make_movie("Alien", "1979")
+
+        with override_settings(RESPONSE_CACHE=False):
+            await async_client.get("/api/v1/movie_database/movies/")
+            async with capture_queries() as queries:
+                response: HttpResponse = await async_client.get("/api/v1/movie_database/movies/")
+
+        assert queries
+        assert "ETag" not in response
+        assert await sync_to_async(response_cache_stats)() == {"hits": 0, "misses": 0, "not_modified": 0}
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_errors_are_not_cached(self, async_client: AsyncClient):
+        """Only successful responses are cached."""
+        for _ in range(2):
+            response: HttpResponse = await async_client.get("/api/v1/movie_database/movies/1")
+            assert response.status_code == 404
+
+        assert await sync_to_async(response_cache_stats)() == {"hits": 0, "misses": 2, "not_modified": 0}
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_unchanged_response_is_not_modified(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """Revalidating with the response's ETag gets a 304 without running any queries, until the data changes."""
+        movie = await make_movie("Alien", "1979")
+        etag = (await async_client.get("/api/v1/movie_database/movies/"))["ETag"]
+
+        async with capture_queries() as queries:
+            response: HttpResponse = await async_client.get("/api/v1/movie_database/movies/", headers={"If-None-Match": etag})
+
+        assert queries == []
+        assert response.status_code == 304
+        assert response["ETag"] == etag
+
+        movie.watched = True
+        await movie.asave()
+        response = await async_client.get("/api/v1/movie_database/movies/", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+        assert response.json()["items"][0]["watched"] is True
+
+
+class TestExport:
+    """Test the streaming movie and physical media exports."""
+
+    @staticmethod
+    async def read(response: StreamingHttpResponse) -> str:  # noqa: D102
+        return b"".join([chunk async for chunk in response.streaming_content]).decode()
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_movies_stream_as_ndjson(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """Each movie is streamed as a JSON object on its own line, applying the same filters as the list endpoint."""
+        alien = await make_movie("Alien", "1979", watched=True)
+        aliens = await make_movie("Aliens", "1986")
+        await make_movie("The Thing", "1982")
+
+        response: StreamingHttpResponse = await async_client.get("/api/v1/movie_database/movies/export?title=alien")
+
+        assert response.streaming
+        assert response["Content-Type"] == "application/x-ndjson"
+        assert response["Content-Disposition"] == 'attachment; filename="movies.ndjson"'
+        assert [json.loads(line) for line in (await self.read(response)).splitlines()] == [
+            {"id": alien.id, "title": "Alien", "release_year": 1979, "letterboxd_uri": "", "watched": True},
+            {"id": aliens.id, "title": "Aliens", "release_year": 1986, "letterboxd_uri": "", "watched": False},
+        ]
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_physical_media_stream_as_csv(self, async_client: AsyncClient):
+        """Physical media are streamed as a CSV header then one row each, with the ids of their relations."""
+        shelf: Shelf = await abake(Shelf)
+        media: PhysicalMedia = await abake(PhysicalMedia, shelf=shelf, position_on_shelf=1, collection=None, notes="Signed")
+
+        response: StreamingHttpResponse = await async_client.get("/api/v1/movie_database/physical_media/export?format=csv")
+
+        assert response["Content-Type"] == "text/csv"
+        assert list(csv.reader(StringIO(await self.read(response)))) == [
+            ["position_on_shelf", "notes", "id", "shelf_id", "dimensions_id", "collection_id"],
+            ["1", "Signed", str(media.id), str(shelf.id), str(media.dimensions_id), ""],
+        ]
+
+
+class TestFastJSONRenderer:
+    """Test the API's JSON renderer."""
+
+    def test_renders_the_same_json_as_the_default_renderer(self):
+        """Decimals, dates and nested values come out as they would from Ninja's own renderer."""
+        data = {"width": Decimal("135.50"), "released": date(1979, 5, 25), "items": [{"id": 1, "notes": None}]}
+
+        rendered = FastJSONRenderer().render(None, data, response_status=200)  # pyright: ignore[reportArgumentType]
+
+        assert json.loads(rendered) == json.loads(JSONRenderer().render(None, data, response_status=200))  # pyright: ignore[reportArgumentType]
+
+
+class TestSparseFieldsets:
+    """Test limiting responses to the fields asked for with `?fields=`."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_list_selects_and_returns_only_the_requested_fields(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """Only the requested columns are selected, and only those fields are returned, across keyset pages."""
+        alien = await make_movie("Alien", "1979", letterboxd_uri="https://letterboxd.com/film/alien/")
+        aliens = await make_movie("Aliens", "1986", letterboxd_uri="https://letterboxd.com/film/aliens/")
+
+        async with capture_queries() as queries:
+            response: HttpResponse = await async_client.get("/api/v1/movie_database/movies/?fields=id,title&limit=1")
+        page = response.json()
+        assert page["items"] == [{"title": "Alien", "id": alien.id}]
+        assert not any("letterboxd_uri" in sql for sql in queries)
+
+        response = await async_client.get(f"/api/v1/movie_database/movies/?fields=id,title&limit=1&cursor={page['next_cursor']}")
+        assert response.json()["items"] == [{"title": "Aliens", "id": aliens.id}]
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_detail_returns_only_the_requested_fields(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """Detail endpoints take `fields` too, and still return every field without it."""
+        alien = await make_movie("Alien", "1979")
+
+        sparse: HttpResponse = await async_client.get(f"/api/v1/movie_database/movies/{alien.id}?fields=release_year")
+        full: HttpResponse = await async_client.get(f"/api/v1/movie_database/movies/{alien.id}")
+
+        assert sparse.json() == {"release_year": 1979}
+        assert full.json() == {"id": alien.id, "title": "Alien", "release_year": 1979, "letterboxd_uri": "", "watched": False}
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_unknown_field_is_rejected(self, async_client: AsyncClient):
+        """Only fields of the response schema can be asked for."""
+        bookcase: Bookcase = await abake(Bookcase)
+
+        response: HttpResponse = await async_client.get(f"/api/v1/movie_database/bookcase/{bookcase.id}?fields=id,shelves")
+
+        assert response.status_code == 422
+
+
+class TestBatchFetch:
+    """Test fetching many objects by id with `?ids=` on list endpoints."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_movies_are_returned_in_request_order_with_missing_ids(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """Movies come back in the order asked for, from one query, and ids that don't exist are reported."""
+        alien = await make_movie("Alien", "1979")
+        aliens = await make_movie("Aliens", "1986")
+        missing_id = aliens.id + 100
+
+        async with capture_queries() as queries:
+            response: HttpResponse = await async_client.get(f"/api/v1/movie_database/movies/?ids={aliens.id},{missing_id},{alien.id},{aliens.id}&fields=title")
+
+        assert len(queries) == 1
+        assert response.json() == {"items": [{"title": "Aliens"}, {"title": "Alien"}], "count": 2, "next_cursor": None, "missing_ids": [missing_id]}
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_physical_media_are_fetched_with_expansions(self, async_client: AsyncClient):
+        """Batches of physical media keep their expanded relations."""
+        first, second = await abake(PhysicalMedia, _quantity=2)
+
+        response: HttpResponse = await async_client.get(f"/api/v1/movie_database/physical_media/?ids={second.id},{first.id}&expand=dimensions")
+
+        items = response.json()["items"]
+        assert [item["id"] for item in items] == [second.id, first.id]
+        assert items[0]["dimensions"]["id"] == second.dimensions_id
+        assert response.json()["missing_ids"] == []
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_batches_are_limited_to_a_page(self, async_client: AsyncClient):
+        """At most 100 ids can be asked for at once."""
+        response: HttpResponse = await async_client.get(f"/api/v1/movie_database/shelves/?ids={','.join(map(str, range(1, 102)))}")
+
+        assert response.status_code == 422
+
+
+class TestBookcaseTree:
+    """Test the get_bookcase_tree API endpoint."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_whole_bookcase_is_served_in_four_queries(self, async_client: AsyncClient):
+        """Shelves, media and movies are nested in order, from four queries however many there are."""
+        bookcase: Bookcase = await abake(Bookcase)
+        bottom: Shelf = await abake(Shelf, bookcase=bookcase, position_from_top=2)
+        top: Shelf = await abake(Shelf, bookcase=bookcase, position_from_top=1)
+        collection: Collection = await abake(Collection)
+        for shelf in (top, bottom):
+            for position in (2, 1):
+                media: PhysicalMedia = await abake(PhysicalMedia, shelf=shelf, position_on_shelf=position, collection=collection)
+                await media.movies.aadd(*await abake(Movie, _quantity=2))
+
+        async with capture_queries() as queries:
+            response: HttpResponse = await async_client.get(f"/api/v1/movie_database/bookcase/{bookcase.id}/tree")
+
+        assert len(queries) == 4
+        tree = response.json()
+        assert tree["id"] == bookcase.id
+        assert [shelf["id"] for shelf in tree["shelves"]] == [top.id, bottom.id]
+        assert tree["shelves"][0]["dimensions"]["id"] == top.dimensions_id
+        media = tree["shelves"][0]["physical_media"]
+        assert [m["position_on_shelf"] for m in media] == [1, 2]
+        assert media[0]["dimensions"]["id"] == media[0]["dimensions_id"]
+        assert media[0]["collection"] == {"id": collection.id, "name": collection.name}
+        assert all(len(m["movies"]) == 2 for shelf in tree["shelves"] for m in shelf["physical_media"])
+
+
+class TestBulkCreate:
+    """Test the bulk create endpoints for movies and physical media."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_movies_are_inserted_in_batches_and_ids_returned_in_order(self, async_client: AsyncClient):
+        """Movies are inserted `batch_size` rows at a time, and their ids come back in the order they were given."""
+        payload = [{"title": f"Movie {i}", "release_year": 2000 + i, "letterboxd_uri": "", "watched": False} for i in range(5)]
+
+        async with capture_queries() as queries:
+            response: HttpResponse = await async_client.post("/api/v1/movie_database/movies/bulk?batch_size=2", payload, content_type="application/json")
+
+        assert sum(sql.startswith("INSERT") for sql in queries) == 3
+        ids = response.json()["ids"]
+        assert [await Movie.objects.filter(id=i).values_list("title", flat=True).aget() for i in ids] == [m["title"] for m in payload]
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_duplicate_movie_creates_nothing(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """A movie clashing with an existing one rejects the whole request."""
+        await make_movie("Alien", "1979")
+        payload = [
+            {"title": "Aliens", "release_year": 1986, "letterboxd_uri": "", "watched": False},
+            {"title": "Alien", "release_year": 1979, "letterboxd_uri": "", "watched": False},
+        ]
+
+        response: HttpResponse = await async_client.post("/api/v1/movie_database/movies/bulk", payload, content_type="application/json")
+
+        assert response.status_code == 409
+        assert await Movie.objects.acount() == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_physical_media_are_created_with_their_movies(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """Physical media are created in order with their movie links, and the shelf's used space is kept up to date."""
+        alien = await make_movie("Alien", "1979")
+        aliens = await make_movie("Aliens", "1986")
+        shelf: Shelf = await abake(Shelf, orientation=Shelf.Orientation.VERTICAL, dimensions__height=400, dimensions__depth=20)
+        case: MediaCaseDimension = await abake(MediaCaseDimension, width=Decimal(14), height=Decimal(190), depth=Decimal(14))
+        payload = [
+            {"dimensions_id": case.id, "shelf_id": shelf.id, "position_on_shelf": 1, "notes": "", "movie_ids": [alien.id, aliens.id]},
+            {"dimensions_id": case.id, "notes": "Box set", "movie_ids": [aliens.id]},
+        ]
+
+        response: HttpResponse = await async_client.post("/api/v1/movie_database/physical_media/bulk", payload, content_type="application/json")
+
+        first, second = response.json()["ids"]
+        assert {m.id async for m in Movie.objects.filter(physical_media_set=first)} == {alien.id, aliens.id}
+        assert [m.id async for m in Movie.objects.filter(physical_media_set=second)] == [aliens.id]
+        assert (await PhysicalMedia.objects.aget(id=second)).notes == "Box set"
+        await shelf.arefresh_from_db()
+        assert shelf.used_height == Decimal(190)
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_repeated_movie_ids_are_linked_once(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """A movie given twice for one physical media is linked to it once, rather than failing on the duplicate link."""
+        alien = await make_movie("Alien", "1979")
+        case: MediaCaseDimension = await abake(MediaCaseDimension)
+        payload = [{"dimensions_id": case.id, "notes": "", "movie_ids": [alien.id, alien.id]}]
+
+        response: HttpResponse = await async_client.post("/api/v1/movie_database/physical_media/bulk", payload, content_type="application/json")
+
+        assert response.status_code == 200
+        assert await PhysicalMedia.movies.through.objects.acount() == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_conflicting_positions_are_a_conflict(self, async_client: AsyncClient):
+        """Two physical media in the same place on a shelf reject the whole request with 409."""
+        shelf: Shelf = await abake(Shelf, orientation=Shelf.Orientation.VERTICAL, dimensions__height=400, dimensions__depth=20)
+        case: MediaCaseDimension = await abake(MediaCaseDimension, width=Decimal(14), height=Decimal(190), depth=Decimal(14))
+        payload = [{"dimensions_id": case.id, "shelf_id": shelf.id, "position_on_shelf": 1, "notes": "", "movie_ids": []}] * 2
+
+        response: HttpResponse = await async_client.post("/api/v1/movie_database/physical_media/bulk", payload, content_type="application/json")
+
+        assert response.status_code == 409
+        assert response.json() == {"detail": "Position already taken on shelf"}
+        assert await PhysicalMedia.objects.acount() == 0
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_media_overfilling_a_shelf_together_are_rejected(self, async_client: AsyncClient):
+        """Media that each fit on a shelf, but not all together alongside what is on it, create nothing."""
+        shelf: Shelf = await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=250, dimensions__depth=20)
+        await abake(PhysicalMedia, shelf=shelf, dimensions__width=100, dimensions__depth=14)
+        case: MediaCaseDimension = await abake(MediaCaseDimension, width=Decimal(100), depth=Decimal(14))
+        payload = [{"dimensions_id": case.id, "shelf_id": shelf.id, "notes": "", "movie_ids": []}] * 2
+
+        response: HttpResponse = await async_client.post("/api/v1/movie_database/physical_media/bulk", payload, content_type="application/json")
+
+        assert response.status_code == 422
+        assert response.json() == {"detail": f"Physical media do not fit on shelf {shelf.id}"}
+        assert await PhysicalMedia.objects.acount() == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_unknown_references_are_rejected_up_front(self, async_client: AsyncClient):
+        """Every referenced object must exist, or nothing is created."""
+        case: MediaCaseDimension = await abake(MediaCaseDimension)
+        payload = [{"dimensions_id": case.id, "notes": "", "movie_ids": [12345]}]
+
+        response: HttpResponse = await async_client.post("/api/v1/movie_database/physical_media/bulk", payload, content_type="application/json")
+
+        assert response.status_code == 404
+        assert response.json() == {"detail": "Movies not found: [12345]"}
+        assert await PhysicalMedia.objects.acount() == 0
+
+
+class TestBatchOperations:
+    """Test the atomic multi-operation batch endpoint."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_creates_refer_to_earlier_creates_and_are_batched(self, async_client: AsyncClient):
+        """Later operations can use ids created earlier in the batch, and consecutive creates of a resource share an INSERT."""
+        case: MediaCaseDimension = await abake(MediaCaseDimension)
+        operations = [
+            {"op": "create", "resource": "collection", "ref": "box", "data": {"name": "Alien Quadrilogy"}},
+            {"op": "create", "resource": "movie", "ref": "alien", "data": {"title": "Alien", "release_year": 1979, "letterboxd_uri": "", "watched": False}},
+            {"op": "create", "resource": "movie", "ref": "aliens", "data": {"title": "Aliens", "release_year": 1986, "letterboxd_uri": "", "watched": False}},
+            {
+                "op": "create",
+                "resource": "physical_media",
+                "ref": "disc",
+                "data": {"dimensions_id": case.id, "collection_id": "$box", "notes": "", "movie_ids": ["$alien", "$aliens"]},
+            },
+        ]
+
+        async with capture_queries() as queries:
+            response: HttpResponse = await async_client.post("/api/v1/movie_database/batch/", {"operations": operations}, content_type="application/json")
+
+        body = response.json()
+        refs = body["refs"]
+        assert [r["id"] for r in body["results"]] == [refs["box"], refs["alien"], refs["aliens"], refs["disc"]]
+        disc = await PhysicalMedia.objects.aget(id=refs["disc"])
+        assert disc.collection_id == refs["box"]
+        assert {m.id async for m in disc.movies.all()} == {refs["alien"], refs["aliens"]}
+        # Collection, movies, physical media and their movie links
+        assert sum(sql.startswith("INSERT") for sql in queries) == 4
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_updates_and_deletes_by_id_and_ref(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """Objects can be updated and deleted by id, or by the ref of an earlier create."""
+        alien = await make_movie("Alien", "1979")
+        operations = [
+            {"op": "create", "resource": "movie", "ref": "aliens", "data": {"title": "Aliens", "release_year": 1986, "letterboxd_uri": "", "watched": False}},
+            {"op": "update", "resource": "movie", "id": alien.id, "data": {"watched": True}},
+            {"op": "update", "resource": "movie", "id": "$aliens", "data": {"watched": True}},
+            {"op": "delete", "resource": "movie", "id": "$aliens"},
+        ]
+
+        response: HttpResponse = await async_client.post("/api/v1/movie_database/batch/", {"operations": operations}, content_type="application/json")
+
+        assert response.status_code == 200
+        assert [m async for m in Movie.objects.values_list("title", "watched")] == [("Alien", True)]
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_failing_operation_rolls_back_the_batch(self, async_client: AsyncClient):
+        """If any operation fails, none of the operations before it take effect."""
+        operations = [
+            {"op": "create", "resource": "movie", "data": {"title": "Alien", "release_year": 1979, "letterboxd_uri": "", "watched": False}},
+            {"op": "delete", "resource": "bookcase", "id": 12345},
+        ]
+
+        response: HttpResponse = await async_client.post("/api/v1/movie_database/batch/", {"operations": operations}, content_type="application/json")
+
+        assert response.status_code == 404
+        assert response.json() == {"detail": "Bookcases not found: [12345]"}
+        assert await Movie.objects.acount() == 0
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_physical_media_must_fit_their_shelves(self, async_client: AsyncClient):
+        """Creating media on a shelf, or moving them onto one, is rejected if the shelf can't hold them."""
+        shelf: Shelf = await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=250, dimensions__depth=20)
+        await abake(PhysicalMedia, shelf=shelf, dimensions__width=100, dimensions__depth=14)
+        elsewhere: PhysicalMedia = await abake(PhysicalMedia, dimensions__width=100, dimensions__depth=14)
+        case: MediaCaseDimension = await abake(MediaCaseDimension, width=Decimal(100), depth=Decimal(14))
+        create = {"op": "create", "resource": "physical_media", "data": {"dimensions_id": case.id, "shelf_id": shelf.id, "notes": "", "movie_ids": []}}
+        move = {"op": "update", "resource": "physical_media", "id": elsewhere.id, "data": {"shelf_id": shelf.id}}
+
+        responses: list[HttpResponse] = [
+            await async_client.post("/api/v1/movie_database/batch/", {"operations": operations}, content_type="application/json")
+            for operations in ([create, create], [create, move], [move])
+        ]
+
+        assert [r.status_code for r in responses] == [422, 422, 200]
+        await shelf.arefresh_from_db()
+        assert shelf.used_width == 200
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_update_to_null_is_rejected_as_invalid(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """Fields can be left out of an update, but only set to null where the create schema allows it."""
+        alien = await make_movie("Alien", "1979")
+        operations = [{"op": "update", "resource": "movie", "id": alien.id, "data": {"title": None}}]
+
+        response: HttpResponse = await async_client.post("/api/v1/movie_database/batch/", {"operations": operations}, content_type="application/json")
+
+        assert response.status_code == 422
+        assert response.json()["detail"].startswith("Operation 0: title:")
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_only_ids_are_references(self, async_client: AsyncClient):
+        """Values starting with "$" outside id fields are taken as they are."""
+        operations = [{"op": "create", "resource": "movie", "data": {"title": "$9.99", "release_year": 2008, "letterboxd_uri": "", "watched": False}}]
+
+        response: HttpResponse = await async_client.post("/api/v1/movie_database/batch/", {"operations": operations}, content_type="application/json")
+
+        assert response.status_code == 200
+        assert await Movie.objects.filter(title="$9.99").aexists()
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_missing_related_objects_are_not_found(self, async_client: AsyncClient):
+        """Referring to objects that don't exist is a 404 naming them, as on the physical media endpoints."""
+        physical_media: PhysicalMedia = await abake(PhysicalMedia, shelf=None)
+        case: MediaCaseDimension = await abake(MediaCaseDimension)
+        update = {"op": "update", "resource": "physical_media", "id": physical_media.id, "data": {"movie_ids": [9999]}}
+        create = {"op": "create", "resource": "physical_media", "data": {"dimensions_id": case.id, "shelf_id": 9999, "notes": "", "movie_ids": []}}
+
+        responses: list[HttpResponse] = [
+            await async_client.post("/api/v1/movie_database/batch/", {"operations": [operation]}, content_type="application/json")
+            for operation in (update, create)
+        ]
+
+        assert [(r.status_code, r.json()) for r in responses] == [
+            (404, {"detail": "Movies not found: [9999]"}),
+            (404, {"detail": "Shelves not found: [9999]"}),
+        ]
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_conflict_does_not_expose_database_errors(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """A batch clashing with existing data is a 409 with a fixed message, rather than the database's own."""
+        await make_movie("Alien", "1979")
+        operations = [{"op": "create", "resource": "movie", "data": ALIEN}]
+
+        response: HttpResponse = await async_client.post("/api/v1/movie_database/batch/", {"operations": operations}, content_type="application/json")
+
+        assert response.status_code == 409
+        assert response.json() == {"detail": "Batch conflicts with existing data, e.g. a duplicate movie or shelf position"}
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_unknown_reference_is_rejected(self, async_client: AsyncClient):
+        """A ref that no earlier operation created is rejected, naming the operation."""
+        operations = [{"op": "update", "resource": "movie", "id": "$alien", "data": {"watched": True}}]
+
+        response: HttpResponse = await async_client.post("/api/v1/movie_database/batch/", {"operations": operations}, content_type="application/json")
+
+        assert response.status_code == 422
+        assert response.json() == {"detail": "Operation 0: unknown reference $alien"}
+
+
+class TestPhysicalMediaWrites:
+    """Test creating and updating physical media with their relations."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_create_with_relations(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """A media is created with its movies, collection and shelf, taking up space on the shelf."""
+        alien = await make_movie("Alien", "1979")
+        aliens = await make_movie("Aliens", "1986")
+        collection: Collection = await abake(Collection)
+        shelf: Shelf = await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=200, dimensions__depth=20)
+        case: MediaCaseDimension = await abake(MediaCaseDimension, width=Decimal(14), depth=Decimal(14))
+        payload = {
+            "dimensions_id": case.id,
+            "shelf_id": shelf.id,
+            "collection_id": collection.id,
+            "position_on_shelf": 1,
+            "notes": "",
+            "movie_ids": [alien.id, aliens.id],
         }
+
+        async with capture_queries() as queries:
+            response: HttpResponse = await async_client.post("/api/v1/movie_database/physical_media/", payload, content_type="application/json")
+
+        physical_media = await PhysicalMedia.objects.aget(id=response.json()["id"])
+        assert (physical_media.shelf_id, physical_media.collection_id) == (shelf.id, collection.id)
+        assert {m.id async for m in physical_media.movies.all()} == {alien.id, aliens.id}
+        await shelf.arefresh_from_db()
+        assert shelf.used_width == Decimal(14)
+        # The media and all of its movie links
+        assert sum(sql.startswith("INSERT") for sql in queries) == 2
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_create_on_full_shelf_is_rejected(self, async_client: AsyncClient):
+        """A media without room on its shelf is not created."""
+        shelf: Shelf = await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=150, dimensions__depth=20)
+        await abake(PhysicalMedia, shelf=shelf, dimensions__width=100, dimensions__depth=14)
+        case: MediaCaseDimension = await abake(MediaCaseDimension, width=Decimal(100), depth=Decimal(14))
+        payload = {"dimensions_id": case.id, "shelf_id": shelf.id, "notes": "", "movie_ids": []}
+
+        response: HttpResponse = await async_client.post("/api/v1/movie_database/physical_media/", payload, content_type="application/json")
+
+        assert response.status_code == 422
+        assert await PhysicalMedia.objects.acount() == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_update_moves_shelf_and_replaces_movies(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """Moving a media carries its space to the new shelf, and `movie_ids` replaces its movies."""
+        alien = await make_movie("Alien", "1979")
+        aliens = await make_movie("Aliens", "1986")
+        source, target = [await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=200, dimensions__depth=20) for _ in range(2)]
+        physical_media: PhysicalMedia = await abake(PhysicalMedia, shelf=source, dimensions__width=100, dimensions__depth=14)
+        await physical_media.movies.aadd(alien)
+
+        response: HttpResponse = await async_client.patch(
+            f"/api/v1/movie_database/physical_media/{physical_media.id}",
+            {"shelf_id": target.id, "movie_ids": [aliens.id]},
+            content_type="application/json",
+        )
+
+        assert response.status_code == 200
+        assert [m.id async for m in physical_media.movies.all()] == [aliens.id]
+        await source.arefresh_from_db()
+        await target.arefresh_from_db()
+        assert (source.used_width, target.used_width) == (0, 100)
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_resize_counts_the_media_own_space_as_free(self, async_client: AsyncClient):
+        """A media resized on a full shelf only needs room for the difference in size."""
+        shelf: Shelf = await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=150, dimensions__depth=20)
+        physical_media: PhysicalMedia = await abake(PhysicalMedia, shelf=shelf, dimensions__width=100, dimensions__depth=14)
+        wider: MediaCaseDimension = await abake(MediaCaseDimension, width=Decimal(140), depth=Decimal(14))
+
+        response: HttpResponse = await async_client.patch(
+            f"/api/v1/movie_database/physical_media/{physical_media.id}",
+            {"dimensions_id": wider.id},
+            content_type="application/json",
+        )
+
+        assert response.status_code == 200
+        await shelf.arefresh_from_db()
+        assert shelf.used_width == 140
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_update_to_null_is_rejected_as_invalid(self, async_client: AsyncClient):
+        """Required relations can't be cleared by a PATCH, while optional ones can."""
+        shelf: Shelf = await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=200, dimensions__depth=20)
+        physical_media: PhysicalMedia = await abake(PhysicalMedia, shelf=shelf, dimensions__width=100, dimensions__depth=14)
+        url = f"/api/v1/movie_database/physical_media/{physical_media.id}"
+
+        cleared_dimensions: HttpResponse = await async_client.patch(url, {"dimensions_id": None}, content_type="application/json")
+        cleared_shelf: HttpResponse = await async_client.patch(url, {"shelf_id": None}, content_type="application/json")
+
+        assert (cleared_dimensions.status_code, cleared_shelf.status_code) == (422, 200)
+        await physical_media.arefresh_from_db()
+        assert physical_media.shelf_id is None
+
+
+ALIEN = {"title": "Alien", "release_year": 1979, "letterboxd_uri": "", "watched": False}
+
+
+class TestIdempotencyKeys:
+    """Test `Idempotency-Key` support on POST routes."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_retry_replays_response_without_writing_again(self, async_client: AsyncClient):
+        """A retry with the same key gets the first response back, and creates nothing more."""
+        first: HttpResponse = await async_client.post(
+            "/api/v1/movie_database/movies/",
+            ALIEN,
+            content_type="application/json",
+            headers={"Idempotency-Key": "a"},
+        )
+
+        async with capture_queries() as queries:
+            retry: HttpResponse = await async_client.post(
+                "/api/v1/movie_database/movies/",
+                ALIEN,
+                content_type="application/json",
+                headers={"Idempotency-Key": "a"},
+            )
+
+        assert (retry.status_code, retry.json()) == (first.status_code, first.json())
+        assert retry["Idempotent-Replayed"] == "true"
+        assert len(queries) == 1
+        assert await Movie.objects.acount() == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_request_racing_a_live_claim_is_rejected_and_leaves_the_claim(self, async_client: AsyncClient):
+        """A request arriving while another with the same key is running gets 409, without running or taking the key over."""
+        await async_client.post("/api/v1/movie_database/movies/", ALIEN, content_type="application/json", headers={"Idempotency-Key": "a"})
+        claim = await IdempotencyKey.objects.aget()
+        # As if the first request were still running
+        await IdempotencyKey.objects.filter(digest=claim.digest).aupdate(status_code=None, content=b"")
+
+        response: HttpResponse = await async_client.post(
+            "/api/v1/movie_database/movies/",
+            ALIEN,
+            content_type="application/json",
+            headers={"Idempotency-Key": "a"},
+        )
+
+        assert response.status_code == 409
+        assert await IdempotencyKey.objects.filter(digest=claim.digest, status_code=None).aexists()
+        assert await Movie.objects.acount() == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_expired_key_is_reclaimed(self, async_client: AsyncClient):
+        """Once a key has expired, a request with it runs again."""
+        await async_client.post(
+            "/api/v1/movie_database/collection/",
+            {"name": "Alien Quadrilogy"},
+            content_type="application/json",
+            headers={"Idempotency-Key": "a"},
+        )
+        await IdempotencyKey.objects.aupdate(created_at=timezone.now() - TTL - timedelta(minutes=1))
+
+        response: HttpResponse = await async_client.post(
+            "/api/v1/movie_database/collection/",
+            {"name": "Alien Quadrilogy"},
+            content_type="application/json",
+            headers={"Idempotency-Key": "a"},
+        )
+
+        assert "Idempotent-Replayed" not in response
+        assert await Collection.objects.acount() == 2
+        assert await IdempotencyKey.objects.acount() == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_key_reused_for_different_request_is_rejected(self, async_client: AsyncClient):
+        """A key can't be reused with a different request body."""
+        await async_client.post("/api/v1/movie_database/movies/", ALIEN, content_type="application/json", headers={"Idempotency-Key": "a"})
+
+        response: HttpResponse = await async_client.post(
+            "/api/v1/movie_database/movies/",
+            {**ALIEN, "title": "Aliens"},
+            content_type="application/json",
+            headers={"Idempotency-Key": "a"},
+        )
+
+        assert response.status_code == 422
+        assert await Movie.objects.acount() == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_requests_without_key_or_with_different_keys_both_run(self, async_client: AsyncClient):
+        """Keys only deduplicate requests that share one, and requests without a key run as usual."""
+        collections = [{"name": "Alien Quadrilogy"}, {"name": "Alien Anthology"}, {"name": "Alien Trilogy"}]
+        await async_client.post("/api/v1/movie_database/collection/", collections[0], content_type="application/json")
+        for key, collection in zip("ab", collections[1:], strict=True):
+            await async_client.post("/api/v1/movie_database/collection/", collection, content_type="application/json", headers={"Idempotency-Key": key})
+
+        assert await Collection.objects.acount() == 3
+
+
+class TestDeletes:
+    """Test single-statement and filtered bulk deletes."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_bookcase_delete_cascades_without_loading_rows(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """A bookcase's shelves go with it and its media are unshelved, without any row being loaded, and cached responses are invalidated."""
+        bookcase: Bookcase = await abake(Bookcase)
+        shelf: Shelf = await abake(Shelf, bookcase=bookcase)
+        physical_media: PhysicalMedia = await abake(PhysicalMedia, shelf=shelf)
+        await physical_media.movies.aadd(await make_movie("Alien", "1979"))
+        assert len((await async_client.get("/api/v1/movie_database/shelves/")).json()["items"]) == 1
+
+        async with capture_queries() as queries:
+            response: HttpResponse = await async_client.delete(f"/api/v1/movie_database/bookcase/{bookcase.id}")
+
+        assert response.json() == {"success": True}
+        assert not any(sql.startswith("SELECT") for sql in queries)
+        assert not await Shelf.objects.aexists()
+        await physical_media.arefresh_from_db()
+        assert physical_media.shelf_id is None
+        assert await physical_media.movies.acount() == 1
+        assert (await async_client.get("/api/v1/movie_database/shelves/")).json()["items"] == []
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_missing_object_returns_404(self, async_client: AsyncClient):
+        """Deleting an object that doesn't exist returns 404."""
+        response: HttpResponse = await async_client.delete("/api/v1/movie_database/collection/12345")
+
+        assert response.status_code == 404
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_filtered_delete_reports_count_and_frees_shelf_space(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """Media matching the filters are deleted with their movie links, and their shelf's used space is freed."""
+        shelf: Shelf = await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL)
+        on_shelf: list[PhysicalMedia] = [await abake(PhysicalMedia, shelf=shelf, dimensions__width=10) for _ in range(2)]
+        elsewhere: PhysicalMedia = await abake(PhysicalMedia, shelf=None)
+        await on_shelf[0].movies.aadd(await make_movie("Alien", "1979"))
+
+        response: HttpResponse = await async_client.delete(f"/api/v1/movie_database/physical_media/?shelf={shelf.id}")
+
+        assert response.json() == {"deleted": 2}
+        assert [m.id async for m in PhysicalMedia.objects.all()] == [elsewhere.id]
+        assert not await PhysicalMedia.movies.through.objects.aexists()
+        await shelf.arefresh_from_db()
+        assert shelf.used_width == 0
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_filtered_delete_requires_a_filter(self, async_client: AsyncClient):
+        """A bulk delete without filters is rejected rather than deleting everything."""
+        await abake(Shelf)
+
+        response: HttpResponse = await async_client.delete("/api/v1/movie_database/shelves/")
+
+        assert response.status_code == 422
+        assert await Shelf.objects.acount() == 1
+
+
+class TestUpsertMovies:
+    """Test the movie upsert endpoint."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_single_movie_is_created(self, async_client: AsyncClient):
+        """A single movie, rather than a list, is accepted and created."""
+        response: HttpResponse = await async_client.put("/api/v1/movie_database/movies/upsert", ALIEN, content_type="application/json")
+
+        movie = await Movie.objects.aget()
+        assert response.json() == {"ids": [movie.id], "created": 1, "updated": 0}
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_existing_movies_are_updated_in_one_statement(self, async_client: AsyncClient, make_movie: MovieCreator):
+        """Movies matching `unique_movie` have the chosen fields updated, new ones are created, and all in one INSERT."""
+        alien = await make_movie("Alien", "1979")
+        payload = [
+            {"title": "Alien", "release_year": 1979, "letterboxd_uri": alien.letterboxd_uri, "watched": True},
+            {"title": "Aliens", "release_year": 1986, "letterboxd_uri": "", "watched": True},
+        ]
+
+        async with capture_queries() as queries:
+            response: HttpResponse = await async_client.put("/api/v1/movie_database/movies/upsert?update=watched", payload, content_type="application/json")
+
+        body = response.json()
+        assert (body["ids"][0], body["created"], body["updated"]) == (alien.id, 1, 1)
+        assert [m async for m in Movie.objects.order_by("release_year").values_list("title", "watched")] == [("Alien", True), ("Aliens", True)]
+        assert sum(sql.startswith("INSERT") for sql in queries) == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.django_db(transaction=True)
+    async def test_repeated_movie_is_written_once(self, async_client: AsyncClient):
+        """A movie given twice is written and counted once, with the values given last, and both get its id."""
+        payload = [ALIEN, {**ALIEN, "watched": True}]
+
+        response: HttpResponse = await async_client.put("/api/v1/movie_database/movies/upsert", payload, content_type="application/json")
+
+        movie = await Movie.objects.aget()
+        assert movie.watched
+        assert response.json() == {"ids": [movie.id, movie.id], "created": 1, "updated": 0}
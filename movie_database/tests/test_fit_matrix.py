@@ -0,0 +1,47 @@
+from decimal import Decimal
+
+from movie_database.fit_matrix import FitMatrix
+from movie_database.models import Shelf
+from movie_database.tests.test_organiser import make_media, make_shelf
+
+
+class TestFitMatrix:
+    """Test class for the vectorised FitMatrix."""
+
+    def test_fits_matches_can_fit_media_for_every_pair(self):
+        """Feasibility of empty shelves agrees with Shelf.can_fit_media for every (media, shelf) pair."""
+        shelves = [
+            make_shelf(1, Shelf.Orientation.VERTICAL, width="300", height="150", depth="14"),
+            make_shelf(2, Shelf.Orientation.HORIZONTAL, width="130", height="300", depth="20"),
+            make_shelf(3, Shelf.Orientation.HORIZONTAL, width="128.49", height="300", depth="20"),
+        ]
+        media = [make_media(1, width="128.50", height="148.00", depth="12"), make_media(2, width="130", height="184", depth="14.01")]
+
+        fit_matrix = FitMatrix(media, shelves)
+
+        assert fit_matrix.fits.tolist() == [[shelf.can_fit_media(m) for shelf in shelves] for m in media]
+
+    def test_candidate_shelves_are_sorted_by_tightest_fit(self):
+        """Candidates leave the least remaining space first, and exclude shelves without enough room left."""
+        shelves = [
+            make_shelf(1, Shelf.Orientation.HORIZONTAL, width="500", height="300", depth="20"),
+            make_shelf(2, Shelf.Orientation.HORIZONTAL, width="200", height="300", depth="20"),
+            make_shelf(3, Shelf.Orientation.HORIZONTAL, width="500", height="300", depth="20"),
+        ]
+        shelves[2].used_width = Decimal("450.00")
+        media = make_media(1, width="128.50", height="148.00")
+
+        candidates = FitMatrix([media], shelves).candidate_shelves(media.id)
+
+        assert [(shelf.id, remaining) for shelf, remaining in candidates] == [(2, Decimal("71.50")), (1, Decimal("371.50"))]
+
+    def test_media_does_not_count_against_its_own_shelf(self):
+        """A media already on a full shelf can still stay there."""
+        shelf = make_shelf(1, Shelf.Orientation.HORIZONTAL, width="130", height="300", depth="20")
+        shelf.used_width = Decimal("130.00")
+        media = make_media(1, width="130", height="184")
+        media.shelf_id = shelf.id
+
+        candidates = FitMatrix([media], [shelf]).candidate_shelves(media.id)
+
+        assert [(s.id, remaining) for s, remaining in candidates] == [(1, Decimal(0))]
@@ -0,0 +1,32 @@
+from decimal import Decimal
+from itertools import product
+
+import pytest
+
+from movie_database.fixed_point import Size, from_hundredths, to_hundredths
+from movie_database.models import Shelf
+from movie_database.tests.test_organiser import make_media, make_shelf
+
+
+@pytest.mark.parametrize("value", ["0", "0.01", "127.27", "148.00", "999.99"])
+def test_round_trip_is_exact(value: str):
+    assert from_hundredths(to_hundredths(Decimal(value))) == Decimal(value)
+
+
+def test_values_more_precise_than_hundredths_are_rejected():
+    with pytest.raises(ValueError, match="more precise"):
+        to_hundredths(Decimal("127.00001"))
+
+
+def test_size_comparisons_match_decimal_can_fit_media():
+    """Fixed-point fit checks give exactly the same answers as Shelf.can_fit_media on two decimal place values."""
+    values = ["127.99", "128.00", "128.01"]
+    for orientation, (media_width, shelf_width), (media_depth, shelf_depth) in product(Shelf.Orientation, product(values, values), product(values, values)):
+        shelf = make_shelf(1, orientation, width=shelf_width, height=shelf_width, depth=shelf_depth)
+        media = make_media(1, width=media_width, height=media_width, depth=media_depth)
+        shelf_size, media_size = Size.of(shelf.dimensions), Size.of(media.dimensions)
+        axis = shelf.stacking_axis
+
+        fits = media_size.get_axis_size(axis) <= shelf_size.get_axis_size(axis) and media_size.depth <= shelf_size.depth
+
+        assert fits == shelf.can_fit_media(media)
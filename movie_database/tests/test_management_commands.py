@@ -1,14 +1,21 @@
 import csv
+from datetime import timedelta
+from io import StringIO
 from pathlib import Path
 
 import pytest
 from asgiref.sync import sync_to_async
 from django.core.management import call_command
+from django.test.client import AsyncClient
+from django.utils import timezone
 from logot import Logot, logged
 from pydantic import ValidationError
 
-from movie_database.models import Movie
+from movie_database.idempotency import TTL
+from movie_database.models import Bookcase, IdempotencyKey, Movie, PhysicalMedia, Shelf
+from movie_database.response_cache import response_cache_stats
 from movie_database.tests.conftest import MovieCreator
+from movie_database.tests.test_models import abake
 
 
 @pytest.fixture
@@ -175,3 +182,121 @@ async def test_importing_movies_updates_watched_status(watched_csv_file: Path, m
     await sync_to_async(call_command)("import_movies", watched_csv_file)
     await movie.arefresh_from_db()
     assert movie.watched
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_organise_shelves_swaps_positions_without_breaking_unique_constraint():
+    shelf: Shelf = await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=300, dimensions__depth=20)
+    small: PhysicalMedia = await abake(PhysicalMedia, shelf=shelf, position_on_shelf=1, dimensions__width=100, dimensions__height=100, dimensions__depth=14)
+    large: PhysicalMedia = await abake(PhysicalMedia, shelf=shelf, position_on_shelf=2, dimensions__width=150, dimensions__height=100, dimensions__depth=14)
+
+    await sync_to_async(call_command)("organise_shelves")
+
+    await small.arefresh_from_db()
+    await large.arefresh_from_db()
+    assert (large.shelf_id, large.position_on_shelf) == (shelf.id, 1)
+    assert (small.shelf_id, small.position_on_shelf) == (shelf.id, 2)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_organise_shelves_dry_run_does_not_move_media():
+    shelf: Shelf = await abake(Shelf, orientation=Shelf.Orientation.HORIZONTAL, dimensions__width=300, dimensions__depth=20)
+    media: PhysicalMedia = await abake(PhysicalMedia, shelf=None, position_on_shelf=None, dimensions__width=100, dimensions__depth=14)
+
+    await sync_to_async(call_command)("organise_shelves", "--dry-run")
+
+    await media.arefresh_from_db()
+    assert media.shelf_id is None
+    assert await shelf.physical_media_set.acount() == 0
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_reconcile_shelf_space_corrects_drift():
+    shelf: Shelf = await abake(Shelf)
+    await abake(PhysicalMedia, shelf=shelf, dimensions__height=15, dimensions__width=130)
+    await Shelf.objects.filter(pk=shelf.pk).aupdate(used_height=999, used_width=0)
+
+    await sync_to_async(call_command)("reconcile_shelf_space")
+
+    await shelf.arefresh_from_db()
+    assert (shelf.used_height, shelf.used_width) == (15, 130)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_reconcile_shelf_space_dry_run_only_reports_drift():
+    shelf: Shelf = await abake(Shelf)
+    await Shelf.objects.filter(pk=shelf.pk).aupdate(used_height=10)
+    stdout = StringIO()
+
+    await sync_to_async(call_command)("reconcile_shelf_space", "--dry-run", stdout=stdout)
+
+    assert f"{shelf}: height 10.00 -> 0" in stdout.getvalue()
+    await shelf.arefresh_from_db()
+    assert shelf.used_height == 10
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_compact_shelves_renumbers_every_shelf():
+    shelves: list[Shelf] = await abake(Shelf, _quantity=2)
+    for shelf in shelves:
+        await abake(PhysicalMedia, shelf=shelf, position_on_shelf=3)
+        await abake(PhysicalMedia, shelf=shelf, position_on_shelf=6)
+
+    await sync_to_async(call_command)("compact_shelves")
+
+    positions = [(m.shelf_id, m.position_on_shelf) async for m in PhysicalMedia.objects.order_by("shelf_id", "position_on_shelf")]
+    assert positions == [(shelves[0].id, 1), (shelves[0].id, 2), (shelves[1].id, 1), (shelves[1].id, 2)]
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_response_cache_stats_reports_and_resets_hit_rate(async_client: AsyncClient):
+    for _ in range(4):
+        await async_client.get("/api/v1/movie_database/movies/")
+    stdout = StringIO()
+
+    await sync_to_async(call_command)("response_cache_stats", "--reset", stdout=stdout)
+
+    assert "Hits: 3, misses: 1, hit rate: 75.0%, not modified: 0" in stdout.getvalue()
+    assert await sync_to_async(response_cache_stats)() == {"hits": 0, "misses": 0, "not_modified": 0}
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_benchmark_rendering_reports_every_path_and_leaves_no_movies():
+    stdout = StringIO()
+
+    await sync_to_async(call_command)("benchmark_rendering", "--rows", "20", "--repeat", "1", stdout=stdout)
+
+    assert stdout.getvalue().count("ms per 1000 rows") == 3
+    assert await Movie.objects.acount() == 0
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_benchmark_bookcase_tree_reports_both_ways_and_leaves_no_bookcase():
+    stdout = StringIO()
+
+    await sync_to_async(call_command)("benchmark_bookcase_tree", "--discs", "20", "--shelves", "2", "--repeat", "1", stdout=stdout)
+
+    assert "with_tree             4 queries" in stdout.getvalue()
+    assert await Bookcase.objects.acount() == 0
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.asyncio
+async def test_prune_idempotency_keys_deletes_only_expired_keys():
+    await IdempotencyKey.objects.acreate(digest="fresh", request_digest="")
+    await IdempotencyKey.objects.acreate(digest="expired", request_digest="")
+    await IdempotencyKey.objects.filter(digest="expired").aupdate(created_at=timezone.now() - TTL - timedelta(minutes=1))
+    stdout = StringIO()
+
+    await sync_to_async(call_command)("prune_idempotency_keys", stdout=stdout)
+
+    assert "Deleted 1 expired idempotency keys." in stdout.getvalue()
+    assert [k.digest async for k in IdempotencyKey.objects.all()] == ["fresh"]
@@ -234,6 +234,83 @@ class TestShelfAccommodation:
         assert await shelf.used_space() == expected_used_space
 
 
+class TestShelfUsedSpaceCounters:
+    """Test class for the used space counters maintained on Shelf."""
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.asyncio
+    async def test_creating_and_deleting_media_updates_counters(self):
+        """Creating media adds its case size to the shelf, and deleting it removes it again."""
+        shelf: Shelf = await abake(Shelf)
+        media: PhysicalMedia = await abake(PhysicalMedia, shelf=shelf, dimensions__height=Decimal("14.50"), dimensions__width=Decimal("135.00"))
+
+        await shelf.arefresh_from_db()
+        assert (shelf.used_height, shelf.used_width) == (Decimal("14.50"), Decimal("135.00"))
+
+        await media.adelete()
+
+        await shelf.arefresh_from_db()
+        assert (shelf.used_height, shelf.used_width) == (0, 0)
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.asyncio
+    async def test_moving_media_moves_its_space_between_shelves(self):
+        """Saving media onto a different shelf frees space on the old shelf and uses it on the new one."""
+        old_shelf: Shelf = await abake(Shelf)
+        new_shelf: Shelf = await abake(Shelf)
+        media: PhysicalMedia = await abake(PhysicalMedia, shelf=old_shelf, dimensions__height=15, dimensions__width=130)
+
+        media.shelf = new_shelf
+        await media.asave()
+
+        await old_shelf.arefresh_from_db()
+        await new_shelf.arefresh_from_db()
+        assert (old_shelf.used_height, old_shelf.used_width) == (0, 0)
+        assert (new_shelf.used_height, new_shelf.used_width) == (15, 130)
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.asyncio
+    async def test_changing_media_case_updates_counters(self):
+        """Swapping media onto a different case size, or resizing the case itself, updates the shelf."""
+        shelf: Shelf = await abake(Shelf)
+        media: PhysicalMedia = await abake(PhysicalMedia, shelf=shelf, dimensions__height=15, dimensions__width=130)
+
+        media.dimensions = await abake(MediaCaseDimension, height=20, width=140)
+        await media.asave()
+        await shelf.arefresh_from_db()
+        assert (shelf.used_height, shelf.used_width) == (20, 140)
+
+        media.dimensions.height = Decimal(25)
+        await media.dimensions.asave()
+        await shelf.arefresh_from_db()
+        assert (shelf.used_height, shelf.used_width) == (25, 140)
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.asyncio
+    async def test_bulk_updates_refresh_counters(self):
+        """Queryset updates, which bypass signals, still keep the counters correct."""
+        shelf: Shelf = await abake(Shelf)
+        await abake(PhysicalMedia, shelf=shelf, dimensions__height=15, dimensions__width=130, _quantity=3)
+
+        await PhysicalMedia.objects.filter(shelf=shelf).aupdate(shelf=None)
+
+        await shelf.arefresh_from_db()
+        assert (shelf.used_height, shelf.used_width) == (0, 0)
+
+    @pytest.mark.django_db(transaction=True)
+    @pytest.mark.asyncio
+    async def test_saving_a_stale_shelf_keeps_counters(self):
+        """Saving a shelf loaded before media were added to it doesn't write its stale counters back."""
+        shelf: Shelf = await abake(Shelf, position_from_top=1)
+        await abake(PhysicalMedia, shelf=shelf, dimensions__height=15, dimensions__width=130)
+
+        shelf.position_from_top = 2
+        await shelf.asave()
+
+        await shelf.arefresh_from_db()
+        assert (shelf.position_from_top, shelf.used_height, shelf.used_width) == (2, 15, 130)
+
+
 class TestMediaCaseDimension:
     """Test class for the MediaCaseDimension model."""
 
@@ -0,0 +1,141 @@
+from decimal import Decimal
+
+from movie_database.models import MediaCaseDimension, PhysicalMedia, Shelf, ShelfDimension
+from movie_database.organiser import MediaChange, NeighbourhoodOrganiser, Placement, ShelfOrganiser
+
+
+def make_shelf(shelf_id: int, orientation: Shelf.Orientation, width: str, height: str, depth: str) -> Shelf:
+    """Build an unsaved Shelf with its dimensions attached."""
+    dimensions = ShelfDimension(width=Decimal(width), height=Decimal(height), depth=Decimal(depth))
+    return Shelf(id=shelf_id, position_from_top=shelf_id, orientation=orientation, dimensions=dimensions)
+
+
+def make_media(media_id: int, width: str, height: str, depth: str = "14") -> PhysicalMedia:
+    """Build an unsaved PhysicalMedia with its own case dimensions attached."""
+    dimensions = MediaCaseDimension(id=media_id, width=Decimal(width), height=Decimal(height), depth=Decimal(depth))
+    return PhysicalMedia(id=media_id, dimensions=dimensions)
+
+
+def shelve(media: PhysicalMedia, shelf_id: int | None, position_on_shelf: int | None) -> PhysicalMedia:
+    """Put an unsaved PhysicalMedia at the given position on a shelf."""
+    media.shelf_id = shelf_id
+    media.position_on_shelf = position_on_shelf
+    return media
+
+
+class TestShelfOrganiser:
+    """Test class for the in-memory ShelfOrganiser."""
+
+    def test_largest_media_are_placed_first(self):
+        """Media are packed largest first, so the big case still fits when it comes last in the input."""
+        shelf = make_shelf(1, Shelf.Orientation.HORIZONTAL, width="300", height="200", depth="20")
+        media = [make_media(1, width="100", height="100"), make_media(2, width="100", height="100"), make_media(3, width="200", height="100")]
+
+        placements = ShelfOrganiser([shelf], media).plan()
+
+        assert placements == [
+            Placement(media_id=3, shelf_id=1, position_on_shelf=1),
+            Placement(media_id=1, shelf_id=1, position_on_shelf=2),
+            Placement(media_id=2, shelf_id=None, position_on_shelf=None),
+        ]
+
+    def test_media_overflow_onto_next_shelf(self):
+        """Once a shelf is full, media continue onto the next shelf."""
+        shelves = [
+            make_shelf(1, Shelf.Orientation.VERTICAL, width="200", height="30", depth="20"),
+            make_shelf(2, Shelf.Orientation.VERTICAL, width="200", height="30", depth="20"),
+        ]
+        media = [make_media(i, width="10", height="14") for i in range(1, 5)]
+
+        placements = ShelfOrganiser(shelves, media).plan()
+
+        assert [(p.media_id, p.shelf_id, p.position_on_shelf) for p in placements] == [(1, 1, 1), (2, 1, 2), (3, 2, 1), (4, 2, 2)]
+
+    def test_stacking_axis_follows_shelf_orientation(self):
+        """A vertical shelf is filled by media height and a horizontal one by media width."""
+        shelves = [
+            make_shelf(1, Shelf.Orientation.VERTICAL, width="1000", height="100", depth="20"),
+            make_shelf(2, Shelf.Orientation.HORIZONTAL, width="100", height="1000", depth="20"),
+        ]
+        media = [make_media(1, width="50", height="120"), make_media(2, width="50", height="120")]
+
+        placements = ShelfOrganiser(shelves, media).plan()
+
+        assert {p.media_id: p.shelf_id for p in placements} == {1: 2, 2: 2}
+
+    def test_media_too_deep_for_any_shelf_are_left_unplaced(self):
+        """Media deeper than every shelf cannot be placed."""
+        shelf = make_shelf(1, Shelf.Orientation.HORIZONTAL, width="300", height="200", depth="10")
+
+        placements = ShelfOrganiser([shelf], [make_media(1, width="100", height="100", depth="14")]).plan()
+
+        assert placements == [Placement(media_id=1, shelf_id=None, position_on_shelf=None)]
+
+
+class TestNeighbourhoodOrganiser:
+    """Test class for incremental re-planning with NeighbourhoodOrganiser."""
+
+    def test_added_media_goes_on_the_end_of_a_shelf_with_room(self):
+        """Only the added media moves when its shelf has room for it."""
+        shelf = make_shelf(1, Shelf.Orientation.VERTICAL, width="100", height="40", depth="20")
+        media = [
+            shelve(make_media(1, width="10", height="10"), 1, 1),
+            shelve(make_media(2, width="10", height="10"), 1, 4),
+            make_media(3, width="10", height="10"),
+        ]
+
+        moves = NeighbourhoodOrganiser([shelf], media, MediaChange(MediaChange.Kind.ADDED, media_id=3, shelf_id=1)).plan()
+
+        assert moves == [Placement(media_id=3, shelf_id=1, position_on_shelf=5)]
+
+    def test_added_media_overflows_onto_the_shelf_below(self):
+        """When the shelf is full the added media flows onto the start of the next shelf, which keeps the gaps it can."""
+        shelves = [
+            make_shelf(1, Shelf.Orientation.VERTICAL, width="100", height="30", depth="20"),
+            make_shelf(2, Shelf.Orientation.VERTICAL, width="100", height="30", depth="20"),
+        ]
+        media = [shelve(make_media(i, width="10", height="10"), 1, i) for i in range(1, 4)]
+        media += [shelve(make_media(4, width="10", height="10"), 2, 3), make_media(5, width="10", height="10")]
+
+        moves = NeighbourhoodOrganiser(shelves, media, MediaChange(MediaChange.Kind.ADDED, media_id=5, shelf_id=1)).plan()
+
+        assert moves == [Placement(media_id=5, shelf_id=2, position_on_shelf=1)]
+
+    def test_resized_media_pushes_the_cheapest_neighbour_out(self):
+        """A case that grows moves whichever media costs the fewest moves, here onto the end of the shelf above."""
+        shelves = [
+            make_shelf(1, Shelf.Orientation.VERTICAL, width="100", height="30", depth="20"),
+            make_shelf(2, Shelf.Orientation.VERTICAL, width="100", height="30", depth="20"),
+            make_shelf(3, Shelf.Orientation.VERTICAL, width="100", height="30", depth="20"),
+        ]
+        media = [
+            shelve(make_media(1, width="10", height="10"), 1, 1),
+            shelve(make_media(2, width="10", height="10"), 2, 1),
+            shelve(make_media(3, width="10", height="15"), 2, 2),
+            shelve(make_media(4, width="10", height="10"), 2, 3),
+            shelve(make_media(5, width="10", height="10"), 3, 1),
+        ]
+
+        moves = NeighbourhoodOrganiser(shelves, media, MediaChange(MediaChange.Kind.RESIZED, media_id=3, shelf_id=2)).plan()
+
+        assert moves == [Placement(media_id=2, shelf_id=1, position_on_shelf=2)]
+
+    def test_removed_media_moves_nothing(self):
+        """Taking a media off a shelf only frees up space."""
+        shelf = make_shelf(1, Shelf.Orientation.VERTICAL, width="100", height="30", depth="20")
+        media = [shelve(make_media(1, width="10", height="10"), 1, 1), shelve(make_media(3, width="10", height="10"), 1, 3)]
+
+        assert NeighbourhoodOrganiser([shelf], media, MediaChange(MediaChange.Kind.REMOVED, media_id=2, shelf_id=1)).plan() == []
+
+    def test_media_that_does_not_fit_is_left_unplaced(self):
+        """An added media with no room on the shelf or its neighbours is left unplaced, and nothing else moves."""
+        shelf = make_shelf(1, Shelf.Orientation.VERTICAL, width="100", height="20", depth="20")
+        media = [
+            shelve(make_media(1, width="10", height="10"), 1, 1),
+            shelve(make_media(2, width="10", height="10"), 1, 2),
+            make_media(3, width="10", height="10"),
+        ]
+
+        moves = NeighbourhoodOrganiser([shelf], media, MediaChange(MediaChange.Kind.ADDED, media_id=3, shelf_id=1)).plan()
+
+        assert moves == [Placement(media_id=3, shelf_id=None, position_on_shelf=None)]